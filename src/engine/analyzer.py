@@ -0,0 +1,292 @@
+"""
+A static analyzer for stories: the blocks, variables and commands that no
+playthrough can reach, and a pass that strips them.
+
+Usage:
+    $ IFAnalyze story.yaml
+    $ IFAnalyze story.yaml --strip live.yaml
+
+    >>> from engine.analyzer import analyze, strip
+    >>> analysis = analyze(doc)
+    >>> analysis.unreachable
+    ['/unused_block']
+    >>> live = strip(doc, analysis)
+
+One pass over the Document links it, then reads each block once to build the
+block control-flow graph: an edge from a block to every block a goto or gosub
+in it can jump to, in its content, If branches and Choice effects. The start
+block is the one the compiler starts at, and the blocks reachable from it are
+live. Where the explorer plays every playthrough, the analyzer only reads the
+story, so it is fast on any story, and takes every branch and every choice to
+be possible.
+
+Findings:
+    unreachable: Blocks that no goto, gosub or start reaches.
+    unused_variables: Declared variables that no live command names.
+    dead_code: Commands after a goto, return or error in the same list, or
+        after an If whose branches all end that way. They never run.
+
+strip removes all three, so the story it returns compiles to the same
+playthroughs from smaller source. An unreachable block with live blocks
+nested in it keeps its name and nested blocks, but not its content.
+"""
+
+import argparse
+import ast
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from engine.expressions import LITERALS
+from engine.linker import Links, link
+from engine.nodes import Block, Document, Error, GoSub, GoTo, If, Return, Var
+from engine.syntax import Expression, Map, Node, Sequence
+
+# Keys whose value is an expression over variables, or a variable name
+EXPRESSIONS = ("if", "add", "subtract", "multiply", "divide", "set")
+NAMES = ("modify", "switch", "gain", "pay")
+
+
+@dataclass(slots=True)
+class DeadCode:
+    """Commands that never run.
+
+    Attributes:
+        block: The path of the block they are in.
+        after: The command that ends the list before them.
+        commands: How many commands never run.
+    """
+
+    block: str
+    after: str
+    commands: int
+
+
+@dataclass
+class Analysis:
+    """What analyzing a story found.
+
+    Attributes:
+        entry: The path of the start block, if the story has blocks.
+        graph: The blocks each block can jump to, by path.
+        unreachable: The paths of the blocks no playthrough reaches.
+        unused_variables: The variables no live command names.
+        dead_code: The commands that never run, in live blocks.
+    """
+
+    entry: str | None = None
+    graph: dict[str, set[str]] = field(default_factory=dict)
+    unreachable: list[str] = field(default_factory=list)
+    unused_variables: list[str] = field(default_factory=list)
+    dead_code: list[DeadCode] = field(default_factory=list)
+
+
+class Analyzer:
+    """Read a linked story once, building its graph and finding dead nodes.
+
+    Public Methods:
+        analyze: Analyze the story.
+    """
+
+    def __init__(self, links: Links):
+        self.links = links
+        self.names: dict[str, set[str]] = {}  # Variables named, by block
+        self.dead_code: dict[str, list[DeadCode]] = {}
+
+    def analyze(self) -> Analysis:
+        """Analyze the story."""
+        links, result = self.links, Analysis()
+        for block, path in zip(links.blocks, links.paths):
+            result.graph[path] = set()
+            self.names[path] = set()
+            self.dead_code[path] = []
+            if block["content"] is not None:
+                self._walk(block["content"], path, result.graph[path])
+
+        starts = [
+            path
+            for block, path in zip(links.blocks, links.paths)
+            if block["start"] is not None and block["start"].data
+        ]
+        result.entry = starts[0] if starts else next(iter(links.paths), None)
+
+        live, frontier = set(), [result.entry] if result.entry else []
+        while frontier:
+            path = frontier.pop()
+            if path not in live:
+                live.add(path)
+                frontier.extend(result.graph[path])
+        result.unreachable = [path for path in links.paths if path not in live]
+
+        named = set().union(*(self.names[path] for path in live))
+        result.unused_variables = [
+            name for name in declared(links.doc) if name not in named
+        ]
+        result.dead_code = [
+            dead
+            for path in links.paths
+            if path in live
+            for dead in self.dead_code[path]
+        ]
+        return result
+
+    def _walk(self, node: Node, path: str, targets: set[str]):
+        match node:
+            case Block():
+                return  # Nested blocks are read on their own
+            case GoTo() | GoSub():
+                address = node["goto"] if isinstance(node, GoTo) else node["gosub"]
+                targets.add(self.links.paths[self.links.resolve(address.data, path)])
+            case Sequence():
+                live = live_items(node)
+                for item in live:
+                    self._walk(item, path, targets)
+                if len(live) < len(node.data):
+                    dead = len(node.data) - len(live)
+                    after = describe(live[-1])
+                    self.dead_code[path].append(DeadCode(path, after, dead))
+            case Map():
+                for key, child in node.data.items():
+                    if isinstance(child, Expression) and key in EXPRESSIONS:
+                        self.names[path] |= names(child.data)
+                    elif isinstance(child, Expression) and key in NAMES:
+                        self.names[path].add(child.data)
+                    else:
+                        self._walk(child, path, targets)
+
+
+def terminates(node: Node) -> bool:
+    """Whether a command never lets the list it is in go on."""
+    match node:
+        case GoTo() | Return() | Error():
+            return True
+        case If() if node["else"] is not None:
+            return any(map(terminates, node["then"].data)) and any(
+                map(terminates, node["else"].data)
+            )
+        case Sequence():
+            return any(map(terminates, node.data))
+    return False
+
+
+def live_items(sequence: Sequence) -> list[Node]:
+    """The items of a list up to, and with, the first one that terminates."""
+    for index, item in enumerate(sequence.data):
+        if terminates(item):
+            return sequence.data[: index + 1]
+    return sequence.data
+
+
+def describe(node: Node) -> str:
+    if isinstance(node, Map) and node.data:
+        key, value = next(iter(node.data.items()))
+        data = value.data if isinstance(value, Expression) else ""
+        return f"{key}: {data}".strip()
+    return node.type
+
+
+def names(source: str) -> set[str]:
+    """The variable names an expression reads."""
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError:
+        return set()  # The compiler reports it
+    return {
+        node.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and node.id not in LITERALS
+    }
+
+
+def declared(doc: Node) -> list[str]:
+    if not isinstance(doc, Document) or doc["vars"] is None:
+        return []
+    return [var["name"].data for var in doc["vars"].data if isinstance(var, Var)]
+
+
+def analyze(doc: Node, links: Links = None) -> Analysis:
+    """Analyze a parsed story.
+
+    Args:
+        doc (Node): A parsed story.
+        links (Links, optional): The story's links. Defaults to linking it.
+
+    Returns:
+        Analysis: The story's graph, and what is dead in it.
+
+    Raises:
+        BadAddress: If the story has unresolved addresses.
+    """
+    return Analyzer(links or link(doc)).analyze()
+
+
+def strip(doc: Node, analysis: Analysis = None) -> Node:
+    """Strip the unreachable blocks, unused variables and dead code of a story.
+
+    Args:
+        doc (Node): A parsed story. It is not modified.
+        analysis (Analysis, optional): The story's analysis. Defaults to
+            analyzing it.
+
+    Returns:
+        Node: The story, with only its live nodes.
+    """
+    if not isinstance(doc, Document):
+        return doc
+    analysis = analysis or analyze(doc)
+    unreachable, unused = set(analysis.unreachable), set(analysis.unused_variables)
+
+    def prune(node: Node, scope: str) -> Node | None:
+        match node:
+            case Block():
+                path = f"{scope}/{node['name'].data}"
+                data = {
+                    key: prune(child, path)
+                    for key, child in node.data.items()
+                    if path not in unreachable or key not in ("content", "start")
+                }
+                if data.get("blocks") is not None and not data["blocks"].data:
+                    del data["blocks"]
+                if "content" not in data and "blocks" not in data:
+                    return None
+                return type(node)(data)
+            case Var() if node["name"].data in unused:
+                return None
+            case Sequence():
+                items = (prune(item, scope) for item in live_items(node))
+                return type(node)([item for item in items if item is not None])
+            case Map():
+                return type(node)(
+                    {key: prune(child, scope) for key, child in node.data.items()}
+                )
+        return node
+
+    return prune(doc, "")
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="IFAnalyze", description=__doc__)
+    args.add_argument("story", type=Path, help="The story file (YAML) to analyze.")
+    args.add_argument("--strip", type=Path, help="Write the live story here.")
+    args = args.parse_args(argv)
+
+    from engine.parser import Parser  # After argparse, so --help stays fast
+
+    parser = Parser()
+    doc = parser.parse(args.story)
+    result = analyze(doc)
+
+    print(f"{len(result.graph)} blocks, starting at {result.entry}")
+    for path in result.unreachable:
+        print(f"unreachable block: {path}")
+    for name in result.unused_variables:
+        print(f"unused variable: {name}")
+    for dead in result.dead_code:
+        print(f"dead code: {dead.block}: {dead.commands} after {dead.after}")
+
+    if args.strip:
+        parser.dump(strip(doc, result), args.strip)
+        print(f"Wrote the live story to {args.strip}")
+
+
+if __name__ == "__main__":
+    main()
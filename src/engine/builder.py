@@ -0,0 +1,285 @@
+"""
+A one-pass YAML to AST builder.
+
+The default Parser path loads the whole document into plain Python objects and
+then walks them a second time to build Nodes. The ASTBuilder builds Nodes
+straight from the YAML event stream instead, using libyaml when it is
+installed, so only the AST is ever held in memory.
+
+Usage:
+    >>> from engine.parser import Parser
+    >>> parser = Parser(one_pass=True)
+    >>> doc = parser.parse(Path("story.yaml"))
+
+Documents using anchors, aliases, merge keys or explicit tags are handed back
+to the default path, which produces the same AST for everything else.
+"""
+
+from typing import TYPE_CHECKING, Iterator
+
+import yaml
+from yaml.events import (
+    AliasEvent,
+    CollectionStartEvent,
+    DocumentEndEvent,
+    DocumentStartEvent,
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+    StreamStartEvent,
+)
+
+from engine.exceptions import NotRecognized
+from engine.syntax import (
+    Expression,
+    Map,
+    MapType,
+    Node,
+    NodeType,
+    Null,
+    Sequence,
+    Value,
+)
+
+if TYPE_CHECKING:
+    from engine.parser import Parser, PoPo
+
+# Use the libyaml event parser when PyYAML was built with it
+EventLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+STR_TAG = "tag:yaml.org,2002:str"
+NULL_TAG = "tag:yaml.org,2002:null"
+
+
+class Fallback(Exception):
+    """Raised when a document needs the default parse path."""
+
+    ...
+
+
+class Failed:
+    """A mapping value that failed to build, raised only if the value is kept."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+SKIPPED = object()
+
+
+class ASTBuilder:
+    """Build an AST from a YAML event stream in a single pass.
+
+    Mapping values are built as their key's node type as soon as they are read.
+    When Maps disagree on a key's type, the value is loaded as a PoPo and
+    parsed once the enclosing Map is recognized. Keys no Map declares are
+    skipped without being loaded.
+
+    Public Methods:
+        build: Build an AST Node from a YAML string.
+    """
+
+    def __init__(self, parser: "Parser"):
+        self.parser = parser
+        self.grammar = parser.syntax.grammar
+        self.resolver = yaml.resolver.Resolver()
+        self.constructor = yaml.constructor.FullConstructor()
+        self.events: Iterator[Event] = iter(())
+        self.depth = 0
+
+    def build(self, data: str) -> Node:
+        """Build an AST Node from a YAML string.
+
+        Args:
+            data (str): The YAML data string.
+
+        Returns:
+            Node: The same AST Node the default parse path returns.
+
+        Raises:
+            NotRecognized: If the data is not recognized.
+        """
+        try:
+            return self._build_document(data)
+        except Fallback:
+            return self.parser._parse(
+                yaml.load(data, Loader=yaml.FullLoader), node_type=None
+            )
+        finally:
+            self.events = iter(())
+
+    def _build_document(self, data: str) -> Node:
+        self.events = yaml.parse(data, Loader=EventLoader)
+        self.depth = 0
+        self._expect(StreamStartEvent)
+
+        event = self._next()
+        if isinstance(event, StreamEndEvent):
+            return self.parser._parse(None, node_type=None)
+        if not isinstance(event, DocumentStartEvent):
+            raise Fallback
+
+        node = self._build(self._next(), node_type=None)
+        self._expect(DocumentEndEvent)
+        self._expect(StreamEndEvent)  # Let the loader report extra documents
+        return node
+
+    def _build(self, event: Event, node_type: NodeType) -> Node:
+        kind = self.grammar.kind(node_type)
+
+        match event:
+            case ScalarEvent():
+                data = self._scalar(event)
+                if isinstance(data, str) and kind is Expression:
+                    return node_type(data)
+                if isinstance(data, bool | int | float | str) and kind is Value:
+                    return node_type(data)
+                if data is None and kind is Null:
+                    return Null()
+
+            case SequenceStartEvent() if kind is Sequence:
+                self._check_collection(event)
+                items = []
+                while not isinstance(event := self._next(), SequenceEndEvent):
+                    items.append(self._build(event, None))
+                return Sequence(items)
+
+            case MappingStartEvent() if kind is None or kind is Map:
+                self._check_collection(event)
+                return self._build_map(node_type)
+
+            case _:
+                data = self._raw(event)
+
+        raise TypeError(f"Data: {data} does not match node {node_type}")
+
+    def _build_map(self, node_type: MapType | None) -> Map:
+        if node_type is None:
+            tag_types = self.grammar.tag_types
+        else:
+            tag_types = {tag.key: tag.type for tag in node_type.spec}
+
+        values = {}
+        while not isinstance(event := self._next(), MappingEndEvent):
+            key = self._key(event)
+            value_event = self._next()
+            if key not in tag_types:
+                self._skip(value_event)
+                values[key] = SKIPPED
+            elif (tag_type := tag_types[key]) is None:
+                values[key] = self._raw(value_event)
+            else:
+                values[key] = self._build_value(value_event, tag_type)
+
+        node = self._recognize(values, node_type)
+        result = {}
+        for tag in node.spec:
+            if tag.key not in values:
+                continue
+            value = values[tag.key]
+            if isinstance(value, Failed):
+                raise value.error
+            if not isinstance(value, Node):
+                value = self.parser._parse(value, tag.type)
+            result[tag.key] = value
+        return node(result)
+
+    def _recognize(self, values: dict, node_type: MapType | None) -> MapType:
+        if node_type is None:
+            node = self.grammar.recognize(values)
+        elif self.grammar.accepts(node_type, values):
+            node = node_type
+        else:
+            node = None
+
+        if node is None:
+            data = {k: ... if v is SKIPPED else v for k, v in values.items()}
+            raise NotRecognized(f"Unrecognized map: {data}")
+        return node
+
+    def _build_value(self, event: Event, node_type: NodeType) -> Node | Failed:
+        # The enclosing Map decides whether this value is kept, so a failure
+        # is held until then and the rest of the value is skipped.
+        depth = self.depth - isinstance(event, CollectionStartEvent)
+        try:
+            return self._build(event, node_type)
+        except (TypeError, NotRecognized) as e:
+            while self.depth > depth:
+                self._next()
+            return Failed(e)
+
+    def _raw(self, event: Event) -> "PoPo":
+        match event:
+            case ScalarEvent():
+                return self._scalar(event)
+            case SequenceStartEvent():
+                self._check_collection(event)
+                items = []
+                while not isinstance(event := self._next(), SequenceEndEvent):
+                    items.append(self._raw(event))
+                return items
+            case MappingStartEvent():
+                self._check_collection(event)
+                data = {}
+                while not isinstance(event := self._next(), MappingEndEvent):
+                    key = self._key(event)
+                    data[key] = self._raw(self._next())
+                return data
+            case _:
+                raise Fallback
+
+    def _skip(self, event: Event):
+        if isinstance(event, AliasEvent) or getattr(event, "anchor", None):
+            raise Fallback
+        if isinstance(event, CollectionStartEvent):
+            depth = self.depth - 1
+            while self.depth > depth:
+                self._skip(self._next())
+
+    def _key(self, event: Event):
+        if not isinstance(event, ScalarEvent):
+            raise Fallback
+        return self._scalar(event)  # Merge keys have no constructor: Fallback
+
+    def _scalar(self, event: ScalarEvent):
+        if event.anchor is not None or event.tag not in (None, "!"):
+            raise Fallback
+
+        tag = self._resolve(event)
+        if tag == STR_TAG:
+            return event.value
+        if tag == NULL_TAG:
+            return None
+
+        construct = self.constructor.yaml_constructors.get(tag)
+        if construct is None:
+            raise Fallback
+        node = yaml.ScalarNode(tag, event.value, style=event.style)
+        return construct(self.constructor, node)
+
+    def _resolve(self, event: ScalarEvent) -> str:
+        if event.tag == "!":
+            return STR_TAG
+        return self.resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+
+    def _check_collection(self, event: CollectionStartEvent):
+        if event.anchor is not None or event.tag not in (None, "!"):
+            raise Fallback
+
+    def _expect(self, event_type: type[Event]):
+        if not isinstance(self._next(), event_type):
+            raise Fallback
+
+    def _next(self) -> Event:
+        event = next(self.events)
+        if isinstance(event, CollectionStartEvent):
+            self.depth += 1
+        elif isinstance(event, (SequenceEndEvent, MappingEndEvent)):
+            self.depth -= 1
+        return event
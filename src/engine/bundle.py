@@ -0,0 +1,74 @@
+"""
+Precompiled story bundles: a compiled Program, ready to play without parsing.
+
+Usage:
+    $ build --stories stories/ --output dist/
+
+    >>> from engine.bundle import dumps, load
+    >>> data = dumps(compile_story(parse(Path("game.yaml"))))
+    >>> program = load(Path("dist/game.story"))
+
+A bundle is the Program as compact JSON, compressed with zlib and tagged with
+a format version. Loading one needs neither YAML nor the parser, which makes
+it the fast way to start a story where parsing is slow, as in the browser
+under Pyodide. Conditions are kept as source and compiled on first use, as
+in any Program.
+"""
+
+import json
+import zlib
+from pathlib import Path
+
+from engine.compiler import ChoiceInfo, Op, Program
+from engine.exceptions import BadBundle
+
+# Bump when the bundle format, or the instruction set, changes
+BUNDLE_VERSION = 1
+
+SUFFIX = ".story"
+
+
+def dumps(program: Program) -> bytes:
+    """Serialize a Program as a bundle."""
+    fields = {
+        "version": BUNDLE_VERSION,
+        "code": program.code,
+        "entry": program.entry,
+        "blocks": program.blocks,
+        "choices": [(c.id, c.text, c.effects, c.reusable) for c in program.choices],
+        "scopes": program.scopes,
+        "variables": program.variables,
+        "defaults": program.defaults,
+        "conditions": program.conditions,
+    }
+    text = json.dumps(fields, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(text.encode(), 9)
+
+
+def loads(data: bytes) -> Program:
+    """Deserialize a Program from a bundle.
+
+    Raises:
+        BadBundle: If the data is not a bundle of this version.
+    """
+    try:
+        fields = json.loads(zlib.decompress(data))
+        if fields.pop("version") != BUNDLE_VERSION:
+            raise BadBundle("Unsupported bundle version.")
+        fields["code"] = [
+            (Op(op), tuple(arg) if op == Op.BRANCH else arg)
+            for op, arg in fields["code"]
+        ]
+        fields["choices"] = [ChoiceInfo(*choice) for choice in fields["choices"]]
+        return Program(**fields)
+    except (zlib.error, ValueError, TypeError, KeyError, AttributeError) as e:
+        raise BadBundle(f"Not a story bundle: {e}")
+
+
+def load(path: Path) -> Program:
+    """Load a Program from a bundle file.
+
+    Raises:
+        BadBundle: If the file is not a bundle of this version.
+    """
+    return loads(path.read_bytes())
@@ -0,0 +1,148 @@
+"""
+An on-disk cache of parsed ASTs.
+
+Usage:
+    >>> from engine.cache import ASTCache
+    >>> from engine.parser import Parser
+    >>> parser = Parser(cache=ASTCache())
+    >>> doc = parser.parse(Path("story.yaml"))  # Parsed and stored
+    >>> doc = parser.parse(Path("story.yaml"))  # Loaded from the cache
+
+Entries are keyed by a hash of the YAML source and of the syntax that parsed
+it, so an edited story or a changed grammar never hits a stale entry. Entries
+are pickles: only point the cache at a directory you trust.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+from engine.syntax import Node, Syntax
+
+log = logging.getLogger("Cache")
+
+# Bump when the pickled layout of nodes changes
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = Path(".ast_cache")
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+
+class ASTCache:
+    """A size-bounded directory of pickled AST Nodes, evicted least recently used.
+
+    Public Methods:
+        key: Compute the cache key for a source and syntax.
+        load: Load the Node stored under a key.
+        store: Store a Node under a key.
+        clear: Delete every entry.
+    """
+
+    suffix = ".ast"
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR, max_bytes: int = None):
+        """Initialize the cache in a directory, creating it if needed.
+
+        Args:
+            directory (Path, optional): Where entries are stored.
+                Defaults to DEFAULT_CACHE_DIR.
+            max_bytes (int, optional): The total entry size to evict down to.
+                Defaults to DEFAULT_MAX_BYTES.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, source: str | bytes, syntax: Syntax) -> str:
+        """Compute the cache key for a YAML source parsed with a syntax.
+
+        Args:
+            source (str | bytes): The YAML source.
+            syntax (Syntax): The syntax the source is parsed with.
+
+        Returns:
+            str: A hex digest naming the entry.
+        """
+        if isinstance(source, str):
+            source = source.encode()
+        digest = hashlib.sha256(source)
+        digest.update(syntax.grammar.fingerprint.encode())
+        digest.update(f"{CACHE_VERSION}:{pickle.HIGHEST_PROTOCOL}".encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Node | None:
+        """Load the Node stored under a key.
+
+        Unreadable entries are deleted and treated as misses.
+
+        Returns:
+            Node | None: The cached Node, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with path.open("rb") as file:
+                node = pickle.load(file)
+        except FileNotFoundError:
+            log.debug(f"Cache miss: {key}")
+            return None
+        except Exception as e:
+            log.warning(f"Discarding unreadable cache entry {key}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        if not isinstance(node, Node):
+            log.warning(f"Discarding cache entry {key}: not a Node")
+            path.unlink(missing_ok=True)
+            return None
+
+        log.debug(f"Cache hit: {key}")
+        os.utime(path)  # Mark as recently used
+        return node
+
+    def store(self, key: str, node: Node):
+        """Store a Node under a key, then evict old entries over the size limit.
+
+        The entry is written to a temporary file and moved into place, so a
+        reader never sees a partial entry.
+        """
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(node, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self._path(key))
+        except BaseException:
+            Path(temp).unlink(missing_ok=True)
+            raise
+        log.debug(f"Cache store: {key}")
+        self._evict()
+
+    def clear(self):
+        """Delete every entry."""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def _entries(self) -> list[Path]:
+        return list(self.directory.glob(f"*{self.suffix}"))
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                continue  # Evicted by another process
+
+        total = sum(stat.st_size for stat, _ in entries)
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        for stat, path in entries:
+            if total <= self.max_bytes:
+                break
+            log.debug(f"Cache evict: {path.name}")
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
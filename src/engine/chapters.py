@@ -0,0 +1,594 @@
+"""
+Lazy loading for large and multi-file stories, one chapter at a time.
+
+Usage:
+    >>> from engine.chapters import open_story
+    >>> program = open_story(Path("story/"), budget=1_000_000)
+    >>> Interpreter(program).run()
+
+A chapter is a top level block, with the blocks nested in it. A story is a
+YAML file, or a directory of them, each with its own blocks and vars.
+Opening a story scans its files without loading them: the YAML events give
+the file and byte span of every chapter, and the address of every block and
+jump, so bad addresses are still reported before the story runs. The index
+can be saved, and is reused until a file changes. Only the vars are parsed
+up front; a chapter is parsed and compiled the first time it is reached.
+
+Layout:
+    A LazyProgram reserves all of its code up front: pc 0 ends the story, then
+    there is one stub per block, then a range per chapter, sized from the
+    number of maps in its source, since no map compiles to more than two
+    instructions. Unloaded code is LOAD instructions, which load their
+    chapter and run the same pc again. A loaded chapter's stubs jump to its
+    blocks, or with a budget, are LOADs that mark the chapter as used and
+    jump. Chapters always compile to the same range, so pcs, and snapshots,
+    do not depend on the order chapters are loaded in.
+
+Budget:
+    With a budget, in bytes of chapter source, loading a chapter evicts the
+    least recently used ones until the rest fit. A chapter is used when it is
+    loaded, and whenever the story jumps into it from another chapter. The
+    code of evicted chapters goes back to LOAD instructions, so a jump, a
+    return or a choice that reaches an evicted chapter loads it again.
+    Choices and conditions are kept.
+
+    Choices are placed the same way, in a range per chapter. Until their
+    chapter is loaded, they are UnloadedChoices, which load it when read.
+"""
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from itertools import repeat
+from pathlib import Path
+
+import yaml
+from yaml.events import (
+    AliasEvent,
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+
+from engine.compiler import Compiler, Op, Program, compile_story
+from engine.exceptions import BadAddress, BadNode, NotRecognized
+from engine.linker import Links, candidates
+from engine.nodes import Document, Vars
+from engine.parser import Parser
+
+# Scan with the libyaml parser when PyYAML was built with it
+EventLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+JUMPS = ("goto", "gosub")
+
+BlockInfo = tuple[str, bool, list, list]  # name, start, children, jumps
+
+
+@dataclass(slots=True)
+class Chapter:
+    """Where a top level block's source is, and how big it is.
+
+    Attributes:
+        path: The block's address.
+        file: The index of its file in StoryIndex.files.
+        start: The byte offset of the block's map in the file.
+        end: The byte offset of the end of the block's map.
+        column: The column the block's map starts at.
+        maps: The number of maps in the block's source.
+        choices: The number of choices in the block's source.
+    """
+
+    path: str
+    file: int
+    start: int
+    end: int
+    column: int
+    maps: int
+    choices: int
+
+
+@dataclass
+class StoryIndex:
+    """The chapters and block addresses of a story, scanned from its files.
+
+    Attributes:
+        files: The story files.
+        stamps: The size and modification time of each file, when scanned.
+        digest: A hash of the files' contents.
+        headers: The byte span of each file's blocks list, if it has one.
+        chapters: Every chapter, in story order.
+        blocks: The chapter of every block, by path, in story order.
+        starts: The paths of the blocks marked as a start, in story order.
+
+    Public Methods:
+        scan: Index the story in some files.
+        load: Load a saved index.
+        save: Save the index as JSON.
+        fresh: Whether the files are unchanged since the scan.
+        resolve: Resolve an address to a block path.
+        header: Read a file without its blocks.
+        source: Read a chapter's source.
+    """
+
+    files: list[str]
+    stamps: list[list[int]]
+    digest: str
+    headers: list[list[int] | None]
+    chapters: list[Chapter]
+    blocks: dict[str, int]
+    starts: list[str]
+
+    @classmethod
+    def scan(cls, files: list[Path]) -> "StoryIndex":
+        """Index the story in some files, without loading them.
+
+        Raises:
+            NotRecognized: If a file is not a story map, a block has no name,
+                or a file has a YAML alias.
+            BadAddress: Listing every duplicate block and unresolved address.
+        """
+        index = cls([str(file) for file in files], [], "", [], [], {}, [])
+        digest, jumps, errors = hashlib.sha256(), [], []
+        for number, file in enumerate(files):
+            source = file.read_bytes()
+            digest.update(source)
+            index.stamps.append(stamp(file))
+
+            scanner = Scanner(source.decode())
+            header, chapters = scanner.scan()
+            index.headers.append(header)
+            for chapter, info in chapters:
+                chapter.file = number
+                index.chapters.append(chapter)
+                for path, start, addresses in flatten(info, ""):
+                    if path in index.blocks:
+                        errors.append(f"Duplicate block address: {path}")
+                    index.blocks.setdefault(path, len(index.chapters) - 1)
+                    if start:
+                        index.starts.append(path)
+                    jumps.extend((path, address) for address in addresses)
+        index.digest = digest.hexdigest()
+
+        for scope, address in jumps:
+            try:
+                index.resolve(address, scope)
+            except BadAddress as e:
+                errors.append(str(e))
+        if errors:
+            raise BadAddress("Unable to link story:\n" + "\n".join(errors))
+        return index
+
+    @classmethod
+    def load(cls, path: Path) -> "StoryIndex":
+        """Load an index saved as JSON."""
+        data = json.loads(path.read_text())
+        data["chapters"] = [Chapter(**chapter) for chapter in data["chapters"]]
+        return cls(**data)
+
+    def save(self, path: Path):
+        """Save the index as JSON."""
+        path.write_text(json.dumps(asdict(self)))
+
+    def fresh(self) -> bool:
+        """Whether every file is unchanged since the index was scanned."""
+        try:
+            return self.stamps == [stamp(Path(file)) for file in self.files]
+        except OSError:
+            return False
+
+    def resolve(self, address: str, scope: str = "") -> str:
+        """Resolve an address to the path of its block. See Links.resolve.
+
+        Raises:
+            BadAddress: If no block has the address.
+        """
+        for candidate in candidates(address, scope):
+            if candidate in self.blocks:
+                return candidate
+
+        where = f"in block {scope}" if scope else "at the top level"
+        raise BadAddress(f"No block at address {address} ({where}).")
+
+    def header(self, file: int) -> str:
+        """Read a file with its blocks list emptied."""
+        source = Path(self.files[file]).read_bytes()
+        if self.headers[file] is None:
+            return source.decode()
+        start, end = self.headers[file]
+        return (source[:start] + b" []\n" + source[end:]).decode()
+
+    def source(self, chapter: int) -> str:
+        """Read a chapter's source, as a story with just that block."""
+        info = self.chapters[chapter]
+        with open(self.files[info.file], "rb") as file:
+            file.seek(info.start)
+            text = file.read(info.end - info.start).decode()
+        # The block's map, as the only item of a blocks list, at its column
+        return f"blocks:\n{' ' * max(info.column - 2, 0)}- {text}"
+
+
+class Scanner:
+    """Index the blocks of a story's source from its YAML events.
+
+    Public Methods:
+        scan: Scan the source.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.events = yaml.parse(text, Loader=EventLoader)
+        self.event: Event = None
+        self.maps = 0
+        self.choices = 0
+        self._offset = 0, 0  # A char index, and its byte offset
+
+    def scan(self) -> tuple[list[int] | None, list[tuple[Chapter, BlockInfo]]]:
+        """Scan the source.
+
+        Returns:
+            tuple: The byte span of the blocks list, if there is one, and each
+                top level block's Chapter, with its name, start flag, nested
+                blocks and jumps.
+
+        Raises:
+            NotRecognized: If the source is not a map, a block has no name, or
+                the source has a YAML alias.
+        """
+        self._next()  # Stream start
+        self._next()  # Document start
+        if not isinstance(self._next(), MappingStartEvent):
+            raise NotRecognized("Expected a story map.")
+
+        header, chapters = None, []
+        while not isinstance(key := self._next(), MappingEndEvent):
+            value = self._next()
+            if _key(key) != "blocks" or not isinstance(value, SequenceStartEvent):
+                self._skip(key)
+                self._skip(value)
+                continue
+
+            start = self._byte(value.start_mark.index)
+            while not isinstance(item := self._next(), SequenceEndEvent):
+                maps, choices = self.maps, self.choices
+                column = item.start_mark.column
+                chapter_start = self._byte(item.start_mark.index)
+                info = self._block(item)
+                if info is None:
+                    continue
+                end = self._byte(self.event.end_mark.index)
+                chapter = Chapter(
+                    f"/{info[0]}",
+                    0,
+                    chapter_start,
+                    end,
+                    column,
+                    self.maps - maps + 1,
+                    self.choices - choices,
+                )
+                chapters.append((chapter, info))
+            header = [start, self._byte(item.end_mark.index)]
+        return header, chapters
+
+    def _next(self) -> Event:
+        self.event = next(self.events)
+        if isinstance(self.event, MappingStartEvent):
+            self.maps += 1
+        elif isinstance(self.event, AliasEvent):
+            # A chapter is parsed on its own, and sized from its own events
+            line = self.event.start_mark.line + 1
+            raise NotRecognized(
+                f"YAML alias *{self.event.anchor} at line {line}: stories with "
+                "aliases cannot be loaded lazily. Parse and compile them instead."
+            )
+        return self.event
+
+    def _byte(self, index: int) -> int:
+        # Offsets are asked for in order, so each char is only encoded once
+        char, byte = self._offset
+        byte += len(self.text[char:index].encode())
+        self._offset = index, byte
+        return byte
+
+    def _block(self, event: Event) -> BlockInfo | None:
+        if not isinstance(event, MappingStartEvent):
+            self._skip(event)
+            return None
+
+        name, start, children, jumps = None, False, [], []
+        while not isinstance(key := self._next(), MappingEndEvent):
+            value = self._next()
+            match _key(key), value:
+                case "name", ScalarEvent():
+                    name = value.value
+                case "start", ScalarEvent(implicit=(True, _)):
+                    start = yaml.safe_load(value.value) is True
+                case "blocks", SequenceStartEvent():
+                    while not isinstance(item := self._next(), SequenceEndEvent):
+                        child = self._block(item)
+                        if child is not None:
+                            children.append(child)
+                case _:
+                    self._skip(key)
+                    self._skip(value, jumps)
+        if name is None:
+            line = event.start_mark.line + 1
+            raise NotRecognized(f"Block without a name, at line {line}.")
+        return name, start, children, jumps
+
+    def _skip(self, event: Event, jumps: list[str] = None):
+        """Skip a node, collecting the addresses of the jumps in it."""
+        if isinstance(event, SequenceStartEvent):
+            while not isinstance(item := self._next(), SequenceEndEvent):
+                self._skip(item, jumps)
+        elif isinstance(event, MappingStartEvent):
+            while not isinstance(key := self._next(), MappingEndEvent):
+                value = self._next()
+                self.choices += _key(key) == "choice"
+                if jumps is not None and _key(key) in JUMPS:
+                    if isinstance(value, ScalarEvent):
+                        jumps.append(value.value)
+                        continue
+                self._skip(key)
+                self._skip(value, jumps)
+
+
+def _key(event: Event) -> str | None:
+    return event.value if isinstance(event, ScalarEvent) else None
+
+
+def flatten(info: BlockInfo, scope: str):
+    """Yield the path, start flag and jumps of a block and its nested blocks."""
+    name, start, children, jumps = info
+    path = f"{scope}/{name}"
+    yield path, start, jumps
+    for child in children:
+        yield from flatten(child, path)
+
+
+def stamp(file: Path) -> list[int]:
+    stat = file.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ChapterCompiler(Compiler):
+    """Compile a chapter, as if it started at pc 0, for a LazyProgram to place.
+
+    Jumps to blocks in other chapters go to their stubs, and are listed in
+    external, so placing the code leaves them alone.
+    """
+
+    def __init__(self, links: Links, lazy: "LazyProgram"):
+        super().__init__(links)
+        self.lazy = lazy
+        self.program.variables = lazy.variables
+        self.external: set[int] = set()
+
+    def _emit_block_ref(self, op: Op, address: str, path: str):
+        target = self.lazy.index.resolve(address, path)
+        if target in self.links.index:
+            self.block_refs.append(self._emit(op, self.links.index[target], path))
+        else:
+            self.external.add(self._emit(op, self.lazy.blocks[target], path))
+
+
+class UnloadedChoice:
+    """The place of a choice in a chapter that is not loaded.
+
+    Reading any of its attributes loads the chapter, so a restored state may
+    name choices from any chapter.
+    """
+
+    __slots__ = ("program", "chapter", "index")
+
+    def __init__(self, program: "LazyProgram", chapter: int, index: int):
+        self.program, self.chapter, self.index = program, chapter, index
+
+    def __getattr__(self, name: str):
+        self.program.load(self.chapter)
+        choice = self.program.choices[self.index]
+        if choice is self:
+            raise AttributeError(f"No choice at index {self.index}")
+        return getattr(choice, name)
+
+
+class LazyProgram(Program):
+    """A Program that parses and compiles its chapters as they are reached.
+
+    Attributes:
+        index: The story's index.
+        budget: The most chapter source to keep loaded, in bytes, or None.
+        loaded: The size of each loaded chapter, least recently used first.
+
+    Public Methods:
+        load: Load or use a chapter, evicting others over the budget.
+        unload: Evict a chapter.
+    """
+
+    def __init__(self, index: StoryIndex, budget: int = None, parser: Parser = None):
+        super().__init__()
+        self.index = index
+        self.budget = budget
+        self.parser = parser or Parser()
+        self.loaded: dict[int, int] = {}
+        self.bases: list[int] = []
+        self.choice_bases: list[int] = []
+        self.stubs: list[list[int]] = [[] for _ in index.chapters]
+        self._evaluators = []
+        self._condition_index: dict[str, int] = {}
+        self._declare()
+        self._reserve()
+
+    @property
+    def fingerprint(self) -> str:
+        return self.index.digest
+
+    def load(self, chapter: int):
+        """Load a chapter, if it is not loaded, evicting others over the budget.
+
+        A loaded chapter is only marked as the most recently used.
+
+        Raises:
+            NotRecognized: If the chapter cannot be parsed.
+            BadNode: If the chapter contains a node that cannot be compiled.
+            BadExpression: If a condition is not valid.
+        """
+        if chapter in self.loaded:
+            self.loaded[chapter] = self.loaded.pop(chapter)  # Most recently used
+            return
+
+        info = self.index.chapters[chapter]
+        doc = self.parser.parse(self.index.source(chapter))
+        compiler = ChapterCompiler(Links(doc), self)
+        self._place(chapter, compiler.compile(), compiler.external)
+        self.loaded[chapter] = info.end - info.start
+
+        while self.budget is not None and len(self.loaded) > 1:
+            if sum(self.loaded.values()) <= self.budget:
+                break
+            self.unload(next(iter(self.loaded)))
+
+    def unload(self, chapter: int):
+        """Evict a chapter: it is loaded again when it is next reached."""
+        if self.loaded.pop(chapter, None) is None:
+            return
+        placeholder = Op.LOAD, chapter
+        base, size = self.bases[chapter], 2 * self.index.chapters[chapter].maps
+        self.code[base : base + size] = repeat(placeholder, size)
+        for pc in self.stubs[chapter]:
+            self.code[pc] = placeholder
+
+    def _declare(self):
+        variables = []
+        for file in range(len(self.index.files)):
+            doc = self.parser.parse(self.index.header(file))
+            if isinstance(doc, Document) and doc["vars"] is not None:
+                variables += doc["vars"].data
+        declared = compile_story(Document({"vars": Vars(variables)}))
+        self.variables, self.defaults = declared.variables, declared.defaults
+
+    def _reserve(self):
+        code, scopes, chapters = self.code, self.scopes, self.index.chapters
+        code.append((Op.RET, True))
+        scopes.append("")
+
+        for path, chapter in self.index.blocks.items():
+            self.blocks[path] = len(code)
+            self.stubs[chapter].append(len(code))
+            code.append((Op.LOAD, chapter))
+            scopes.append(path)
+
+        for number, chapter in enumerate(chapters):
+            self.bases.append(len(code))
+            code.extend(repeat((Op.LOAD, number), 2 * chapter.maps))
+            scopes.extend(repeat(chapter.path, 2 * chapter.maps))
+            self.choice_bases.append(len(self.choices))
+            self.choices += [
+                UnloadedChoice(self, number, index)
+                for index in range(
+                    len(self.choices), len(self.choices) + chapter.choices
+                )
+            ]
+
+        starts = self.index.starts or list(self.index.blocks)[:1]
+        self.entry = self.blocks[starts[0]] if starts else 0
+
+    def _place(self, chapter: int, segment: Program, external: set[int]):
+        info = self.index.chapters[chapter]
+        base, size = self.bases[chapter], 2 * info.maps
+        if len(segment.code) > size or len(segment.choices) > info.choices:
+            raise BadNode(f"Chapter {info.path} does not fit the space reserved for it")
+
+        conditions = [
+            self._condition(source, evaluator)
+            for source, evaluator in zip(segment.conditions, segment.evaluators)
+        ]
+        code = []
+        for pc, (op, arg) in enumerate(segment.code):
+            if (
+                op in (Op.JUMP, Op.WAIT)
+                or op in (Op.GOTO, Op.CALL)
+                and pc not in external
+            ):
+                arg += base
+            elif op is Op.BRANCH:
+                arg = conditions[arg[0]], arg[1] + base
+            elif op is Op.CHOICE:
+                arg += self.choice_bases[chapter]
+            code.append((op, arg))
+        unused = Op.ERROR, f"Reached the end of chapter {info.path}"
+        code.extend(repeat(unused, size - len(code)))
+        self.code[base : base + size] = code
+        self.scopes[base : base + len(segment.scopes)] = segment.scopes
+
+        choice_base = self.choice_bases[chapter]
+        for number, choice in enumerate(segment.choices):
+            choice.effects += base
+            self.choices[choice_base + number] = choice
+        for path, pc in segment.blocks.items():
+            if self.budget is None:
+                self.code[self.blocks[path]] = Op.JUMP, base + pc
+            else:  # Entering the chapter marks it as used, for eviction
+                self.code[self.blocks[path]] = Op.LOAD, (chapter, base + pc)
+
+    def _condition(self, source: str, evaluator) -> int:
+        if source not in self._condition_index:
+            self._condition_index[source] = len(self.conditions)
+            self.conditions.append(source)
+            self._evaluators.append(evaluator)
+        return self._condition_index[source]
+
+
+def story_files(story: Path | list[Path]) -> list[Path]:
+    """The files of a story: a file, a directory of YAML files, or a list."""
+    if isinstance(story, list):
+        return story
+    if story.is_dir():
+        return sorted(story.glob("*.yaml"))
+    return [story]
+
+
+def open_story(
+    story: Path | list[Path],
+    budget: int = None,
+    index: Path = None,
+    parser: Parser = None,
+) -> LazyProgram:
+    """Open a story to play, loading its chapters as they are reached.
+
+    Args:
+        story (Path | list[Path]): A story file, a directory of story files,
+            or a list of them, played in order.
+        budget (int, optional): The most chapter source to keep loaded, in
+            bytes. Defaults to None, which keeps every chapter once loaded.
+        index (Path, optional): Where to save the story's index, and to load
+            it from while the story is unchanged. Defaults to scanning the
+            story every time.
+        parser (Parser, optional): The parser for the chapters.
+
+    Returns:
+        LazyProgram: The story, with only its variables loaded.
+
+    Raises:
+        NotRecognized: If a file is not a story, cannot be parsed, or has a
+            YAML alias, which chapters parsed on their own cannot resolve.
+        BadAddress: If the story has duplicate blocks or unresolved addresses.
+    """
+    files = story_files(story)
+    story_index = None
+    if index is not None and index.exists():
+        try:
+            story_index = StoryIndex.load(index)
+        except (ValueError, TypeError, KeyError):
+            story_index = None
+    if (
+        story_index is None
+        or story_index.files != [str(file) for file in files]
+        or not story_index.fresh()
+    ):
+        story_index = StoryIndex.scan(files)
+        if index is not None:
+            story_index.save(index)
+    return LazyProgram(story_index, budget, parser)
@@ -0,0 +1,300 @@
+"""
+A compiler from parsed stories to flat programs.
+
+Usage:
+    >>> from engine.compiler import compile_story
+    >>> program = compile_story(parse(Path("story.yaml")))
+    >>> Interpreter(program).run()
+
+A Program is a flat list of (Op, argument) instructions with every jump
+target resolved to an instruction index, so the Interpreter plays a story by
+advancing a program counter instead of recursing through the AST.
+
+Layout:
+    Each block compiles to its content followed by WAIT, which offers any
+    pending choices until none are left, and RET, which returns from a gosub
+    or ends the story. Choice effects are compiled after all the blocks, each
+    ending in its own RET.
+
+Variables:
+    Declared variables live in numbered slots, starting at their declared
+    value or their type's default. Conditions are kept as source in the
+    Program, and compiled once per Program into functions of the slot values.
+
+Frames:
+    CALL pushes the return address of a gosub. Making a choice pushes the
+    WAIT's resume address as an effects frame, stored as -(pc + 1) so both
+    kinds of frame share one stack of ints. GOTO leaves the current block: it
+    drops the pending choices and any effects frames above the innermost gosub.
+"""
+
+import hashlib
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import cached_property
+from typing import Any
+
+from engine.exceptions import BadAddress, BadExpression, BadNode
+from engine.expressions import Condition, compile_condition
+from engine.linker import Links, link
+from engine.nodes import (
+    Choice,
+    Document,
+    Error,
+    GoSub,
+    GoTo,
+    If,
+    Print,
+    Return,
+    Var,
+    Wait,
+)
+from engine.syntax import Node, Sequence
+
+# The errors compile_story raises for a story that cannot be compiled
+COMPILE_ERRORS = (BadAddress, BadNode, BadExpression)
+
+
+class Op(IntEnum):
+    PRINT = 0  # text: Print the text
+    CHOICE = 1  # index: Offer Program.choices[index] at the next WAIT
+    JUMP = 2  # pc: Continue at pc
+    GOTO = 3  # pc: Leave the current block for the block at pc
+    CALL = 4  # pc: Run the block at pc as a subroutine
+    RET = 5  # unwind: Return from the top frame, or (unwind) from a gosub
+    BRANCH = 6  # (condition, pc): Continue at pc unless conditions[condition] holds
+    WAIT = 7  # pc: Offer the pending choices, continuing at pc after one is made
+    ERROR = 8  # message: Raise a StoryError
+    LOAD = 9  # chapter: Load a chapter of a LazyProgram, then run pc again, or
+    # (chapter, pc): Mark a loaded chapter as used, then continue at pc
+
+
+Instruction = tuple[Op, Any]
+
+DEFAULT_VALUES = {
+    "string": "",
+    "str": "",
+    "number": 0,
+    "int": 0,
+    "uint": 0,
+    "float": 0.0,
+    "bool": False,
+}
+
+
+@dataclass(slots=True)
+class ChoiceInfo:
+    id: str
+    text: str
+    effects: int = -1
+    reusable: bool = False
+
+
+@dataclass
+class Program:
+    """A compiled story.
+
+    Attributes:
+        code: The instructions.
+        entry: The pc of the start block.
+        blocks: The entry pc of each block, by path.
+        choices: Every choice in the story, indexed by CHOICE instructions.
+        scopes: The path of the block each instruction belongs to.
+        variables: The variable names, in slot order.
+        defaults: The initial variable values, in slot order.
+        conditions: The source of every condition, indexed by BRANCH.
+    """
+
+    code: list[Instruction] = field(default_factory=list)
+    entry: int = 0
+    blocks: dict[str, int] = field(default_factory=dict)
+    choices: list[ChoiceInfo] = field(default_factory=list)
+    scopes: list[str] = field(default_factory=list)
+    variables: list[str] = field(default_factory=list)
+    defaults: list[Any] = field(default_factory=list)
+    conditions: list[str] = field(default_factory=list)
+    _evaluators: list[Condition] = field(default=None, repr=False, compare=False)
+
+    @property
+    def evaluators(self) -> list[Condition]:
+        """The compiled conditions, indexed like conditions."""
+        if self._evaluators is None:
+            self._evaluators = [
+                compile_condition(source, self.variables) for source in self.conditions
+            ]
+        return self._evaluators
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """A hash of the program, identifying the story a snapshot is from."""
+        story = (self.code, self.entry, self.choices, self.variables, self.conditions)
+        return hashlib.sha256(repr(story).encode()).hexdigest()
+
+    def __getstate__(self):
+        # Compiled conditions are functions: rebuild them after unpickling
+        return {**self.__dict__, "_evaluators": None}
+
+
+class Compiler:
+    """Lower a linked story into a Program.
+
+    Public Methods:
+        compile: Compile the story.
+    """
+
+    def __init__(self, links: Links):
+        self.links = links
+        self.program = Program()
+        self.effects: deque[tuple[int, Sequence, str]] = deque()
+        self.block_refs: list[int] = []  # pcs whose argument is a block index
+        self.condition_index: dict[str, int] = {}
+
+    def compile(self) -> Program:
+        """Compile the story.
+
+        Returns:
+            Program: The compiled story.
+
+        Raises:
+            BadNode: If the story contains a node that cannot be compiled.
+            BadExpression: If a condition is not valid.
+        """
+        program = self.program
+        if isinstance(self.links.doc, Document) and self.links.doc["vars"] is not None:
+            self._declare(self.links.doc["vars"])
+
+        entries = []
+        for block, path in zip(self.links.blocks, self.links.paths):
+            entries.append(len(program.code))
+            program.blocks[path] = len(program.code)
+            if block["content"] is not None:
+                self._content(block["content"], path)
+            self._emit(Op.WAIT, len(program.code), path)
+            self._emit(Op.RET, True, path)
+
+        if not entries:
+            self._emit(Op.RET, True, "")
+
+        while self.effects:
+            index, effects, path = self.effects.popleft()
+            program.choices[index].effects = len(program.code)
+            self._content(effects, path)
+            self._emit(Op.RET, False, path)
+
+        for pc in self.block_refs:
+            op, block_index = program.code[pc]
+            program.code[pc] = op, entries[block_index]
+
+        starts = [
+            entry
+            for entry, block in zip(entries, self.links.blocks)
+            if block["start"] is not None and block["start"].data
+        ]
+        program.entry = starts[0] if starts else 0
+        program.evaluators  # Compile every condition, reporting errors now
+        return program
+
+    def _declare(self, variables: Sequence):
+        for var in variables.data:
+            if not isinstance(var, Var):
+                raise BadNode(f"Expected a variable declaration, got: {var}")
+            name, data_type = var["name"].data, var["type"].data
+            if name in self.program.variables:
+                raise BadNode(f"Variable {name} is declared twice.")
+            if data_type not in DEFAULT_VALUES:
+                raise BadNode(f"Variable {name} has unknown type: {data_type}")
+
+            value = var["value"]
+            self.program.variables.append(name)
+            self.program.defaults.append(
+                DEFAULT_VALUES[data_type] if value is None else value.data
+            )
+
+    def _content(self, content: Sequence, path: str):
+        for node in content.data:
+            self._command(node, path)
+
+    def _command(self, node: Node, path: str):
+        match node:
+            case Print():
+                self._emit(Op.PRINT, node["print"].data, path)
+            case GoTo():
+                self._emit_block_ref(Op.GOTO, node["goto"].data, path)
+            case GoSub():
+                self._emit_block_ref(Op.CALL, node["gosub"].data, path)
+            case If():
+                self._if(node, path)
+            case Choice():
+                self._choice(node, path)
+            case Error():
+                self._emit(Op.ERROR, f"Reached an error in block {path}", path)
+            case Return():
+                self._emit(Op.RET, True, path)
+            case Wait():
+                self._emit(Op.WAIT, len(self.program.code) + 1, path)
+            case Sequence():
+                self._content(node, path)
+            case _:
+                raise BadNode(f"Cannot compile {node.type} node in {path}: {node}")
+
+    def _if(self, node: If, path: str):
+        code = self.program.code
+        condition = self._condition(node["if"].data)
+
+        branch = self._emit(Op.BRANCH, None, path)
+        self._content(node["then"], path)
+        if node["else"] is None:
+            code[branch] = Op.BRANCH, (condition, len(code))
+            return
+
+        jump = self._emit(Op.JUMP, None, path)
+        code[branch] = Op.BRANCH, (condition, len(code))
+        self._content(node["else"], path)
+        code[jump] = Op.JUMP, len(code)
+
+    def _condition(self, source: str) -> int:
+        if source not in self.condition_index:
+            self.condition_index[source] = len(self.program.conditions)
+            self.program.conditions.append(source)
+        return self.condition_index[source]
+
+    def _choice(self, node: Choice, path: str):
+        choice_id = node["choice"].data
+        if node["shown_effects"] is not None:
+            raise BadNode(
+                f"Cannot compile shown effects of choice {choice_id} in {path}"
+            )
+        text = node["text"].data if node["text"] is not None else choice_id
+        reusable = node["reusable"] is not None and node["reusable"].data
+        index = len(self.program.choices)
+        self.program.choices.append(ChoiceInfo(choice_id, text, reusable=reusable))
+        self.effects.append((index, node["effects"], path))
+        self._emit(Op.CHOICE, index, path)
+
+    def _emit_block_ref(self, op: Op, address: str, path: str):
+        target = self.links.resolve(address, path)
+        self.block_refs.append(self._emit(op, target, path))
+
+    def _emit(self, op: Op, arg: Any, path: str) -> int:
+        self.program.code.append((op, arg))
+        self.program.scopes.append(path)
+        return len(self.program.code) - 1
+
+
+def compile_story(doc: Node, links: Links = None) -> Program:
+    """Compile a parsed story into a Program.
+
+    Args:
+        doc (Node): A parsed story.
+        links (Links, optional): The story's links. Defaults to linking it.
+
+    Returns:
+        Program: The compiled story.
+
+    Raises:
+        BadAddress: If the story has unresolved addresses.
+        BadNode: If the story contains a node that cannot be compiled.
+        BadExpression: If a condition is not valid.
+    """
+    return Compiler(links or link(doc)).compile()
@@ -14,3 +14,51 @@ class BadAddress(Exception):
     """Raised when there is no node at the given address."""
 
     ...
+
+
+class StoryError(Exception):
+    """Raised when a running story reaches an error node."""
+
+    ...
+
+
+class BadChoice(Exception):
+    """Raised when a choice is made that is not on offer."""
+
+    ...
+
+
+class BadExpression(Exception):
+    """Raised when a story expression is not valid."""
+
+    ...
+
+
+class BadSnapshot(Exception):
+    """Raised when a snapshot cannot be read or restored."""
+
+    ...
+
+
+class BadStory(Exception):
+    """Raised when a story cannot be parsed or compiled."""
+
+    ...
+
+
+class BadSession(Exception):
+    """Raised when a play session or its story does not exist."""
+
+    ...
+
+
+class BadBundle(Exception):
+    """Raised when a story bundle cannot be read."""
+
+    ...
+
+
+class BadRecording(Exception):
+    """Raised when a recorded session cannot be read or replayed."""
+
+    ...
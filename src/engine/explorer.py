@@ -0,0 +1,355 @@
+"""
+An exhaustive explorer of every playthrough of a story.
+
+Usage:
+    $ IFExplore story.yaml
+    $ IFExplore story.yaml --workers 8 --max-states 5000000
+
+    >>> from engine.explorer import explore
+    >>> exploration = explore(Path("story.yaml"))
+    >>> exploration.errors
+    [Finding(block='/start', message='Reached an error in block /start', ...)]
+
+The explorer plays the story from its start block and tries every choice at
+every point it waits, breadth first. Playthroughs that arrive at the same
+interpreter state (position, call stack, variables and pending choices) play
+the same from there on, so each state is expanded once: the explorer keeps a
+16 byte digest per visited state, and the frontier of one level at a time,
+however many paths lead to them.
+
+Findings:
+    errors: Choices that lead to an error node, or to a condition that raises.
+    dead_ends: Choices after which the story runs without end and without
+        offering a choice (it is stopped after a step limit).
+    unreachable_choices: Choices that are never offered.
+
+Each finding comes with the shortest script that reproduces it, which can be
+replayed with engine.runner.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from engine import logs
+from engine.compiler import Op, Program, compile_story
+from engine.exceptions import StoryError
+from engine.expressions import EVAL_ERRORS
+from engine.interpreter import Status
+from engine.parser import parse
+from engine.runner import DEFAULT_STEP_LIMIT, SilentInterpreter
+
+log = logging.getLogger("Explorer")
+
+DEFAULT_MAX_STATES = 10_000_000
+
+# Frontiers smaller than this are expanded in process
+PARALLEL_THRESHOLD = 256
+
+# Errors a playthrough can stop on: error nodes, and conditions that raise
+FAILURES = (StoryError, *EVAL_ERRORS)
+
+Digest = bytes
+State = tuple
+
+
+@dataclass(slots=True)
+class Finding:
+    """Something the explorer found, and a script that reaches it.
+
+    Attributes:
+        block: The path of the block it happened in.
+        message: What happened.
+        script: The choices that lead to it, from the start of the story.
+    """
+
+    block: str
+    message: str
+    script: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Exploration:
+    """What exploring a story found.
+
+    Attributes:
+        states: The number of distinct states the story waited in.
+        endings: The number of transitions that end the story.
+        errors: Choices that reach an error node, or a condition that
+            raises, one per error node or condition.
+        dead_ends: Choices after which the story never ends or waits, one per
+            block the story was stuck in.
+        unreachable_choices: "id in /block" for every choice never offered.
+        complete: False if exploration stopped at max_states.
+    """
+
+    states: int = 0
+    endings: int = 0
+    errors: list[Finding] = field(default_factory=list)
+    dead_ends: list[Finding] = field(default_factory=list)
+    unreachable_choices: list[str] = field(default_factory=list)
+    complete: bool = True
+
+
+@dataclass
+class Expansion:
+    """The outcome of expanding part of a frontier.
+
+    Transitions are (parent digest, choice index) pairs. Children are new
+    waiting states, errors and dead ends are (transition, pc, message).
+    """
+
+    children: list[tuple[Digest, int, Digest, State]] = field(default_factory=list)
+    errors: list[tuple[Digest, int, int, str]] = field(default_factory=list)
+    dead_ends: list[tuple[Digest, int, int, str]] = field(default_factory=list)
+    offered: set[int] = field(default_factory=set)
+    endings: int = 0
+
+
+def digest(state: State) -> Digest:
+    """A compact digest of an interpreter state."""
+    return hashlib.blake2b(repr(state).encode(), digest_size=16).digest()
+
+
+def failure(error: Exception) -> str:
+    """Describe an error a playthrough stopped on."""
+    if isinstance(error, StoryError):
+        return str(error)
+    return f"{type(error).__name__} in a condition: {error}"
+
+
+def expand(
+    program: Program, frontier: list[tuple[Digest, State]], limit: int
+) -> Expansion:
+    """Make every offered choice in every state of a frontier.
+
+    Args:
+        program (Program): A compiled story.
+        frontier (list[tuple[Digest, State]]): Waiting states and their digests.
+        limit (int): The most instructions to run after a choice.
+
+    Returns:
+        Expansion: The resulting states and findings.
+    """
+    interpreter = SilentInterpreter(program)
+    expansion = Expansion()
+    for parent, state in frontier:
+        for choice in state[3]:
+            interpreter.state = state
+            interpreter.choose(program.choices[choice].id)
+            try:
+                status = interpreter.run(limit)
+            except FAILURES as e:
+                error = (parent, choice, interpreter.pc - 1, failure(e))
+                expansion.errors.append(error)
+                continue
+
+            if status is Status.ENDED:
+                expansion.endings += 1
+            elif status is Status.RUNNING:
+                message = f"No choice or ending after {limit} steps"
+                expansion.dead_ends.append((parent, choice, interpreter.pc, message))
+            else:
+                child = interpreter.state
+                expansion.offered.update(child[3])
+                expansion.children.append((parent, choice, digest(child), child))
+    return expansion
+
+
+# Worker processes -----------------------------------------------------------
+
+_program: Program = None
+_limit: int = DEFAULT_STEP_LIMIT
+
+
+def _init_worker(program: Program, limit: int):
+    global _program, _limit
+    _program, _limit = program, limit
+
+
+def _expand(frontier: list[tuple[Digest, State]]) -> Expansion:
+    return expand(_program, frontier, _limit)
+
+
+class Explorer:
+    """Explore every reachable state of a Program, breadth first.
+
+    Public Methods:
+        explore: Run the exploration.
+    """
+
+    def __init__(
+        self,
+        program: Program,
+        workers: int = 1,
+        limit: int = DEFAULT_STEP_LIMIT,
+        max_states: int = DEFAULT_MAX_STATES,
+    ):
+        self.program = program
+        self.workers = workers
+        self.limit = limit
+        self.max_states = max_states
+        # Visited state digests -> the transition that first reached them
+        self.parents: dict[Digest, tuple[Digest, int] | None] = {}
+        self.offered: set[int] = set()
+        self.result = Exploration()
+        self._found: set[tuple[str, int]] = set()
+
+    def explore(self) -> Exploration:
+        """Explore the story.
+
+        Returns:
+            Exploration: What was found.
+        """
+        frontier = self._start()
+        pool = None
+        if self.workers > 1:
+            from concurrent.futures import ProcessPoolExecutor  # Only pools need it
+
+            pool = ProcessPoolExecutor(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.program, self.limit),
+            )
+        try:
+            while frontier:
+                log.debug(f"Exploring {len(frontier)} states.")
+                frontier = self._visit(self._expand(frontier, pool))
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        choices, scopes = self.program.choices, self.program.scopes
+        self.result.unreachable_choices = [
+            f"{choices[index].id} in {scopes[pc]}"
+            for pc, index in self._choice_sites()
+            if index not in self.offered
+        ]
+        self.result.states = len(self.parents)
+        return self.result
+
+    def _start(self) -> list[tuple[Digest, State]]:
+        interpreter = SilentInterpreter(self.program)
+        try:
+            status = interpreter.run(self.limit)
+        except FAILURES as e:
+            self._report("errors", None, interpreter.pc - 1, failure(e))
+            return []
+
+        if status is Status.ENDED:
+            self.result.endings += 1
+            return []
+        if status is Status.RUNNING:
+            message = f"No choice or ending after {self.limit} steps"
+            self._report("dead_ends", None, interpreter.pc, message)
+            return []
+
+        state = interpreter.state
+        root = digest(state)
+        self.parents[root] = None
+        self.offered.update(state[3])
+        return [(root, state)]
+
+    def _expand(self, frontier, pool) -> list[Expansion]:
+        if pool is None or len(frontier) < PARALLEL_THRESHOLD:
+            return [expand(self.program, frontier, self.limit)]
+        size = -(-len(frontier) // (self.workers * 4))
+        chunks = [frontier[i : i + size] for i in range(0, len(frontier), size)]
+        return list(pool.map(_expand, chunks))
+
+    def _visit(self, expansions: list[Expansion]) -> list[tuple[Digest, State]]:
+        frontier = []
+        for expansion in expansions:
+            self.result.endings += expansion.endings
+            self.offered |= expansion.offered
+            for parent, choice, pc, message in expansion.errors:
+                self._report("errors", (parent, choice), pc, message)
+            for parent, choice, pc, message in expansion.dead_ends:
+                self._report("dead_ends", (parent, choice), pc, message)
+
+            for parent, choice, child, state in expansion.children:
+                if child in self.parents:
+                    continue
+                if len(self.parents) >= self.max_states:
+                    self.result.complete = False
+                    return []
+                self.parents[child] = parent, choice
+                frontier.append((child, state))
+        return frontier
+
+    def _report(self, kind: str, transition, pc: int, message: str):
+        block = self.program.scopes[pc]
+        # Breadth first, so the first finding at a site has the shortest script
+        site = (kind, pc if kind == "errors" else block)
+        if site in self._found:
+            return
+        self._found.add(site)
+        getattr(self.result, kind).append(
+            Finding(block, message, self._script(transition))
+        )
+
+    def _script(self, transition: tuple[Digest, int] | None) -> list[str]:
+        script = []
+        while transition is not None:
+            parent, choice = transition
+            script.append(self.program.choices[choice].id)
+            transition = self.parents[parent]
+        return script[::-1]
+
+    def _choice_sites(self):
+        for pc, (op, arg) in enumerate(self.program.code):
+            if op is Op.CHOICE:
+                yield pc, arg
+
+
+def explore(
+    story: Path | Program,
+    workers: int = 1,
+    limit: int = DEFAULT_STEP_LIMIT,
+    max_states: int = DEFAULT_MAX_STATES,
+) -> Exploration:
+    """Explore every playthrough of a story.
+
+    Args:
+        story (Path | Program): A story file, or a compiled story.
+        workers (int, optional): Worker processes to expand large frontiers
+            with. Defaults to 1, exploring in this process.
+        limit (int, optional): The most instructions to run after a choice.
+        max_states (int, optional): Stop after visiting this many states.
+
+    Returns:
+        Exploration: What was found.
+    """
+    program = story if isinstance(story, Program) else compile_story(parse(story))
+    return Explorer(program, workers, limit, max_states).explore()
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="IFExplore", description=__doc__)
+    args.add_argument("story", type=Path, help="The story file (YAML) to explore.")
+    args.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args.add_argument("--limit", type=int, default=DEFAULT_STEP_LIMIT)
+    args.add_argument("--max-states", type=int, default=DEFAULT_MAX_STATES)
+    args = args.parse_args(argv)
+    logs.configure()
+
+    result = explore(args.story, args.workers, args.limit, args.max_states)
+
+    scope = "all" if result.complete else "the first"
+    print(f"Explored {scope} {result.states} states, {result.endings} endings")
+    for kind in ("errors", "dead_ends"):
+        for finding in getattr(result, kind):
+            script = " ".join(finding.script) or "(no choices)"
+            print(f"{kind[:-1]}: {finding.block}: {finding.message} <- {script}")
+    for choice in result.unreachable_choices:
+        print(f"unreachable choice: {choice}")
+
+    failed = result.errors or result.dead_ends or not result.complete
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
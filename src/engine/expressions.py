@@ -0,0 +1,123 @@
+"""
+Compiled story expressions.
+
+Usage:
+    >>> condition = compile_condition("gold >= 10 and not cursed", ["gold", "cursed"])
+    >>> condition([12, False])
+    True
+
+Conditions are Python expressions over story variables, limited to literals,
+variable names, arithmetic, comparisons and boolean logic. YAML spellings of
+the literals (true, false, null) are accepted too. Each condition is checked
+and compiled once into a function of the variable values, with every name
+resolved to its variable slot up front, so evaluating a condition never
+touches its source again.
+"""
+
+import ast
+from typing import Any, Callable
+
+from engine.exceptions import BadExpression
+
+Condition = Callable[[list], Any]
+
+# The errors a valid condition can raise for the values it is given
+EVAL_ERRORS = (TypeError, ValueError, ArithmeticError, NameError)
+
+LITERALS = {"true": True, "false": False, "null": None}
+
+ALLOWED_NODES = (
+    # Structure
+    ast.Expression,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Tuple,
+    ast.List,
+    # Boolean logic
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.USub,
+    ast.UAdd,
+    # Arithmetic
+    ast.BinOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    # Comparisons
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+)
+
+
+class ResolveNames(ast.NodeTransformer):
+    """Replace variable names with reads of their slot in `values`."""
+
+    def __init__(self, slots: dict[str, int], source: str):
+        self.slots = slots
+        self.source = source
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        if node.id in LITERALS:
+            return ast.copy_location(ast.Constant(LITERALS[node.id]), node)
+        if node.id not in self.slots:
+            raise BadExpression(f"Unknown variable {node.id} in: {self.source}")
+        read = ast.Subscript(
+            value=ast.Name("values", ast.Load()),
+            slice=ast.Constant(self.slots[node.id]),
+            ctx=ast.Load(),
+        )
+        return ast.copy_location(read, node)
+
+
+def compile_condition(source: str, variables: list[str]) -> Condition:
+    """Compile a condition into a function of the variable values.
+
+    Args:
+        source (str): The condition, such as "gold >= 10".
+        variables (list[str]): The story's variable names, in slot order.
+
+    Returns:
+        Condition: A function taking the list of variable values.
+
+    Raises:
+        BadExpression: If the condition is malformed, uses anything outside
+            the allowed subset, or names an undeclared variable.
+    """
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise BadExpression(f"Invalid expression: {source} ({e.msg})")
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            name = type(node).__name__
+            raise BadExpression(f"{name} is not allowed in expression: {source}")
+
+    slots = {name: slot for slot, name in enumerate(variables)}
+    body = ResolveNames(slots, source).visit(tree.body)
+    arguments = ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg("values")],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+    function = ast.Expression(ast.Lambda(arguments, body))
+    ast.fix_missing_locations(function)
+
+    code = compile(function, f"<condition: {source.strip()}>", "eval")
+    return eval(code, {"__builtins__": {}})
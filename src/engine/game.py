@@ -1,20 +1,26 @@
 import logging
-
-from pydispatch import dispatcher
+from pathlib import Path
 
 import engine.parser
-from engine.interpreter import Interpreter
-from engine.view import View
+from engine.compiler import Program, compile_story
+from engine.interpreter import AsyncInterpreter, Interpreter, Status
+from engine.view import AsyncView, View
 
 log = logging.getLogger("Game")
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, story: Path | Program = None, view: View = None):
+        from pydispatch import dispatcher  # Only the signal game loop needs it
+
+        program = story
+        if isinstance(story, Path):
+            log.debug(f"Compiling story: {story}")
+            program = compile_story(engine.parser.parse(story))
         log.debug("Inializing Interpreter.")
-        self.interpreter = Interpreter()
+        self.interpreter = Interpreter(program)
         log.debug("Initializing View.")
-        self.view = View()
+        self.view = view or View()
         log.debug("Connecting signals.")
         dispatcher.connect(self.handle_exit, signal="Exit_Game")
 
@@ -22,12 +28,61 @@ class Game:
         """Run the interpreter until Exit_Game is dispatched."""
         log.debug("Game loop running.")
         step_count = 0
-        while True:
-            log.debug(f"==================== Step {step_count}  ====================")
-            self.interpreter.step()
-            step_count += 1
+        try:
+            while True:
+                log.debug(
+                    "==================== Step %s  ====================", step_count
+                )
+                self.interpreter.step()
+                step_count += 1
+        finally:
+            self.view.flush()  # Show the text before a StoryError too
 
     def handle_exit(self):
         """Handle an Exit_Game event, cleanup and exit the game."""
         log.debug("Received Exit_Game signal. Exiting game.")
         exit()
+
+
+class AsyncGame:
+    """A game loop for asyncio: one event loop can run many AsyncGames.
+
+    Usage:
+        >>> game = AsyncGame(Path("story.yaml"), AsyncView(QueueInput()))
+        >>> status = await game.run()
+    """
+
+    def __init__(self, story: Path | Program = None, view: AsyncView = None):
+        program = story
+        if isinstance(story, Path):
+            log.debug(f"Compiling story: {story}")
+            program = compile_story(engine.parser.parse(story))
+        self.interpreter = AsyncInterpreter(program)
+        self.view = view or AsyncView()
+
+    async def run(self) -> Status:
+        """Play the story until it ends or the player exits.
+
+        Returns:
+            Status: ENDED, or WAITING if the player exited.
+        """
+        interpreter, view = self.interpreter, self.view
+        try:
+            while True:
+                status = await interpreter.advance()
+                for text in interpreter.drain():
+                    await view.put_text(text)
+
+                if status is Status.ENDED:
+                    await view.end()
+                    return status
+
+                choice = await view.show_choices(interpreter.offer)
+                if choice is None:
+                    log.debug("Player exited the game.")
+                    return status
+                interpreter.choose(choice)
+        finally:
+            for text in interpreter.drain():  # Left over if the story failed
+                await view.put_text(text)
+            view.flush()
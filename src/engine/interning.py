@@ -0,0 +1,120 @@
+"""
+Hash-consing of AST nodes: one shared instance for every distinct subtree.
+
+Usage:
+    >>> from engine.parser import Parser
+    >>> parser = Parser(intern=True)
+    >>> doc = parser.parse(Path("story.yaml"))
+    >>> parser.parse(Path("story.yaml")) is doc
+    True
+
+Generated stories repeat the same Print, Choice and effects subtrees many
+times over. An Interner rebuilds a tree bottom up, hashing every subtree from
+its class, its own data and the cached hashes of its already interned children.
+A subtree of the same class and data as a node in the table, whose children are
+the same instances, is that node, so equal subtrees are stored once. Node.__eq__
+compares the cached hashes before walking any data: two interned trees compare
+equal by identity, and unequal by hash, in one step.
+
+Interned nodes are shared: they must not be edited in place. Build new nodes
+instead, as engine.analyzer.strip does. An Interner keeps every node it has
+interned for as long as it lives, so that later trees share them too.
+"""
+
+from operator import is_
+
+from engine.syntax import Map, Node, Sequence
+
+
+class Interner:
+    """A table of interned nodes, keyed by their structural hash.
+
+    Public Methods:
+        intern: Intern a tree, returning its shared instance.
+        clear: Forget every interned node.
+    """
+
+    def __init__(self):
+        # A node by hash, or a list of nodes in the rare case that hashes collide
+        self.nodes: dict[int, Node | list[Node]] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def intern(self, node: Node) -> Node:
+        """Intern a tree, returning its shared instance.
+
+        Args:
+            node (Node): The root of the tree. It is not modified, but it and
+                its subtrees may become the shared instances.
+
+        Returns:
+            Node: An equal tree, made of the shared instance of every subtree.
+        """
+        if node._hash is not None and self._find(node, node._hash) is node:
+            return node  # Interned already, children and all
+
+        match node:
+            case Map():
+                data = {key: self.intern(child) for key, child in node.data.items()}
+                # Key order does not matter to Map equality, so not to its hash
+                hashed = frozenset((k, child._hash) for k, child in data.items())
+                same = all(map(is_, node.data.values(), data.values()))
+            case Sequence():
+                data = [self.intern(item) for item in node.data]
+                hashed = tuple(item._hash for item in data)
+                same = all(map(is_, node.data, data))
+            case _:
+                data = hashed = node.data
+                same = True
+
+        candidate = node if same else type(node)(data)
+        hash_ = hash((type(node), hashed))
+        shared = self._find(candidate, hash_)
+        if shared is None:
+            shared = candidate
+            shared._hash = hash_
+            self._add(shared)
+        return shared
+
+    def clear(self):
+        """Forget every interned node, so later trees do not share them."""
+        self.nodes.clear()
+        self.count = 0
+
+    def _find(self, node: Node, hash_: int) -> Node | None:
+        bucket = self.nodes.get(hash_)
+        if type(bucket) is list:
+            return next((shared for shared in bucket if same_node(shared, node)), None)
+        return bucket if bucket is not None and same_node(bucket, node) else None
+
+    def _add(self, node: Node):
+        bucket = self.nodes.get(node._hash)
+        if bucket is None:
+            self.nodes[node._hash] = node
+        elif type(bucket) is list:
+            bucket.append(node)
+        else:
+            self.nodes[node._hash] = [bucket, node]
+        self.count += 1
+
+
+def same_node(a: Node, b: Node) -> bool:
+    """Whether two nodes have the same class and data, and the same children.
+
+    Data of different types is never the same, so True, 1 and 1.0 stay apart,
+    as they would in a dump, although they are equal.
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    match a:
+        case Map():
+            return list(a.data) == list(b.data) and all(
+                map(is_, a.data.values(), b.data.values())
+            )
+        case Sequence():
+            return len(a.data) == len(b.data) and all(map(is_, a.data, b.data))
+    return type(a.data) is type(b.data) and a.data == b.data
@@ -1,29 +1,398 @@
 import logging
+from enum import Enum
+from typing import TYPE_CHECKING, Any
 
-from pydispatch import dispatcher
+from engine.compiler import Op, Program
+from engine.exceptions import BadChoice, BadSnapshot, StoryError
+from engine.snapshot import History, Snapshot
+
+if TYPE_CHECKING:
+    from engine.profiler import Profiler
+    from engine.replay import Recording
 
 log = logging.getLogger("Interpreter")
 
 
+class Status(Enum):
+    RUNNING = "running"
+    WAITING = "waiting"  # For a choice
+    ENDED = "ended"
+
+
 class Interpreter:
-    def __init__(self):
-        dispatcher.connect(self.handle_choice, signal="Make_Choice")
+    """Run a compiled Program by advancing a program counter over its code.
+
+    Output goes through the put_text, give_choice and end hooks, which send
+    the Put_Text, Give_Choice and Exit_Game signals.
 
-        # Mock choices: True is a placeholder for Address
-        self.choices = {"north": True, "south": True, "east": True, "west": True}
+    Public Methods:
+        step: Run one instruction.
+        run: Run until the story waits for a choice or ends.
+        choose: Make one of the offered choices.
+        reset: Restart the story.
+        connect: Connect to the Make_Choice signal.
+        snapshot: Capture the story state.
+        restore: Restore a snapshot.
+        rewind: Undo the latest choices.
+        profile: Start collecting runtime statistics.
+        unprofile: Stop collecting runtime statistics.
+        record: Start recording the choices made.
 
+    The state property captures everything that decides what the story does
+    next, as a hashable tuple, and restores it when set.
+    """
+
+    def __init__(self, program: Program = None, undo: int = 0):
+        """Initialize the Interpreter with a story.
+
+        Args:
+            program (Program, optional): The story to run.
+            undo (int, optional): How many choices rewind can undo.
+                Defaults to 0, which disables undo.
+        """
+        self.connect()
+
+        self.program = program
         self.last_choice = None
+        self.history = History(undo) if undo else None
+        self.profiler: "Profiler" = None
+        self.recording: "Recording" = None
+        self.reset()
+
+        # Instruction handlers, indexed by Op
+        handlers = {
+            Op.PRINT: self._print,
+            Op.CHOICE: self._choice,
+            Op.JUMP: self._jump,
+            Op.GOTO: self._goto,
+            Op.CALL: self._call,
+            Op.RET: self._ret,
+            Op.BRANCH: self._branch,
+            Op.WAIT: self._wait,
+            Op.ERROR: self._error,
+            Op.LOAD: self._load,
+        }
+        self._handlers = tuple(handlers[op] for op in Op)
+        self._ops = self._handlers
 
         log.debug("Interpreter initialized.")
 
+    # The signal hooks import pydispatch when they run: headless interpreters
+    # (runner, sessions, explorer) never load it.
+
+    def connect(self):
+        """Receive choices from the Make_Choice signal."""
+        from pydispatch import dispatcher
+
+        dispatcher.connect(self.handle_choice, signal="Make_Choice")
+
+    def reset(self):
+        """Restart the story from its entry block."""
+        self.pc = self.program.entry if self.program else 0
+        self.stack: list[int] = []
+        self.choices: dict[str, int] = {}  # Pending choice ids -> choice index
+        self.resume = 0
+        self.status = Status.RUNNING if self.program else Status.ENDED
+        self.values: list[Any] = list(self.program.defaults) if self.program else []
+        self._conditions = self.program.evaluators if self.program else []
+        if self.history is not None:
+            self.history.clear()
+        if self.recording is not None:
+            self.recording.choices.clear()
+        if self.profiler is not None and self.program:
+            self.profiler.visit(self.program.scopes[self.pc])
+
+    @property
+    def variables(self) -> dict[str, Any]:
+        """The story variables by name."""
+        names = self.program.variables if self.program else []
+        return dict(zip(names, self.values))
+
+    @property
+    def state(self) -> tuple:
+        """The position, call stack, variables and pending choices."""
+        return (
+            self.pc,
+            tuple(self.stack),
+            tuple(self.values),
+            tuple(self.choices.values()),
+            self.resume,
+            self.status.value,
+        )
+
+    @state.setter
+    def state(self, state: tuple):
+        pc, stack, values, choices, resume, status = state
+        self.pc, self.resume, self.status = pc, resume, Status(status)
+        self.stack, self.values = list(stack), list(values)
+        self.choices = {self.program.choices[i].id: i for i in choices}
+
+    def snapshot(self) -> Snapshot:
+        """Capture the story state."""
+        return Snapshot.capture(self.program.fingerprint, self.state)
+
+    def restore(self, snapshot: Snapshot):
+        """Restore a snapshot taken from the same story.
+
+        Raises:
+            BadSnapshot: If the snapshot is from another story.
+        """
+        if snapshot.story != self.program.fingerprint:
+            raise BadSnapshot("The snapshot was taken from a different story.")
+        self.state = snapshot.state
+        if self.history is not None:
+            self.history.clear()
+
+    def rewind(self, choices: int = 1):
+        """Undo the latest choices, returning to the point they were offered.
+
+        Raises:
+            BadSnapshot: If fewer choices are recorded.
+        """
+        if self.history is None:
+            raise BadSnapshot("Undo is not enabled.")
+        self.state = self.history.pop(choices)
+        if self.recording is not None:
+            del self.recording.choices[-choices:]
+
+    def profile(self, profiler: "Profiler" = None) -> "Profiler":
+        """Collect runtime statistics, from the next step or run on.
+
+        Profiling swaps the instruction handlers for timed ones, so it costs
+        nothing until it is turned on. A start counts as a visit to the start
+        block when the story is reset. See engine.profiler.
+
+        Args:
+            profiler (Profiler, optional): A Profiler to add to. Defaults to a
+                new one.
+
+        Returns:
+            Profiler: The statistics, updated as the story runs.
+        """
+        from engine.profiler import Profiler  # Only profiled interpreters need it
+
+        self.profiler = profiler or Profiler()
+        self._ops = self.profiler.wrap(self, self._handlers)
+        return self.profiler
+
+    def unprofile(self) -> "Profiler":
+        """Stop collecting runtime statistics, returning them."""
+        profiler, self.profiler = self.profiler, None
+        self._ops = self._handlers
+        return profiler
+
+    def record(self, recording: "Recording" = None) -> "Recording":
+        """Record the choices made from now on, to replay them later.
+
+        A recording replays the story from its start: record from the start,
+        or pass the recording of the choices that led here. Rewinding drops
+        the undone choices from it. See engine.replay.
+
+        Args:
+            recording (Recording, optional): A Recording to add to. Defaults
+                to a new one.
+
+        Returns:
+            Recording: The choices, updated as they are made.
+        """
+        from engine.replay import Recording  # Only recording interpreters need it
+
+        self.recording = recording or Recording(self.program.fingerprint)
+        return self.recording
+
     def step(self):
         """Run the interpreter one step"""
-        # Pretend the interpreter has some logic to choose a direction
-        log.debug("Sending Give_Choice signal.")
-        dispatcher.send("Give_Choice", choices=self.choices)
+        if self.status is Status.ENDED:
+            log.debug("Story ended.")
+            self.end()
+            return
+        if self.status is Status.WAITING:
+            return
+
+        op, arg = self.program.code[self.pc]
+        self.pc += 1
+        self._ops[op](arg)
+
+    def run(self, limit: int = None) -> Status:
+        """Run until the story waits for a choice or ends.
+
+        Args:
+            limit (int, optional): Stop after this many instructions, even if
+                the story is still running. Defaults to no limit.
+
+        Returns:
+            Status: WAITING or ENDED, or RUNNING if the limit was reached.
+        """
+        code, ops = self.program.code, self._ops
+        if limit is None:
+            while self.status is Status.RUNNING:
+                op, arg = code[self.pc]
+                self.pc += 1
+                ops[op](arg)
+            return self.status
+
+        for _ in range(limit):
+            if self.status is not Status.RUNNING:
+                break
+            op, arg = code[self.pc]
+            self.pc += 1
+            ops[op](arg)
+        return self.status
+
+    def choose(self, choice: str):
+        """Make one of the offered choices and continue into its effects.
+
+        Raises:
+            BadChoice: If the choice is not on offer.
+        """
+        if self.status is not Status.WAITING or choice not in self.choices:
+            raise BadChoice(f"Choice {choice} is not on offer.")
+
+        if self.history is not None:
+            self.history.push(self.state)
+        info = self.program.choices[self.choices[choice]]
+        if not info.reusable:
+            self.choices = {k: v for k, v in self.choices.items() if k != choice}
+        self.stack.append(-self.resume - 1)
+        if self.profiler is not None:
+            self.profiler.choose(self, info)
+        if self.recording is not None:
+            self.recording.choices.append(choice)
+        self.pc = info.effects
+        self.status = Status.RUNNING
 
     def handle_choice(self, choice: str):
-        log.debug(f"Received choice: {choice}")
+        log.debug("Received choice: %s", choice)
 
         # Store the last choice
         self.last_choice = choice
+
+        if self.status is Status.WAITING and choice in self.choices:
+            self.choose(choice)
+
+    # Hooks -------------------------------------------------------------------
+
+    def put_text(self, text: str):
+        from pydispatch import dispatcher
+
+        dispatcher.send("Put_Text", text=text)
+
+    def give_choice(self, choices: dict[str, str]):
+        from pydispatch import dispatcher
+
+        log.debug("Sending Give_Choice signal.")
+        dispatcher.send("Give_Choice", choices=choices)
+
+    def end(self):
+        from pydispatch import dispatcher
+
+        log.debug("Sending Exit_Game signal.")
+        dispatcher.send("Exit_Game")
+
+    # Instructions ------------------------------------------------------------
+
+    def _print(self, text: str):
+        self.put_text(text)
+
+    def _choice(self, index: int):
+        self.choices[self.program.choices[index].id] = index
+
+    def _jump(self, pc: int):
+        self.pc = pc
+
+    def _goto(self, pc: int):
+        self.choices = {}
+        stack = self.stack
+        while stack and stack[-1] < 0:
+            stack.pop()
+        self.pc = pc
+
+    def _call(self, pc: int):
+        self.stack.append(self.pc)
+        self.pc = pc
+
+    def _ret(self, unwind: bool):
+        stack = self.stack
+        if unwind:
+            while stack and stack[-1] < 0:
+                stack.pop()
+        if not stack:
+            self.status = Status.ENDED
+            return
+        pc = stack.pop()
+        self.pc = pc if pc >= 0 else -pc - 1
+
+    def _branch(self, arg: tuple[int, int]):
+        condition, pc = arg
+        if not self._conditions[condition](self.values):
+            self.pc = pc
+
+    def _wait(self, pc: int):
+        if not self.choices:
+            return
+        self.resume = pc
+        self.status = Status.WAITING
+        choices = self.program.choices
+        self.give_choice({k: choices[i].text for k, i in self.choices.items()})
+
+    def _error(self, message: str):
+        raise StoryError(message)
+
+    def _load(self, arg: int | tuple[int, int]):
+        if type(arg) is tuple:  # A stub into a loaded chapter: use it, and enter
+            chapter, self.pc = arg
+        else:
+            chapter = arg
+            self.pc -= 1
+        self.program.load(chapter)
+
+
+class AsyncInterpreter(Interpreter):
+    """An interpreter for asyncio game loops.
+
+    Instead of sending signals, its hooks buffer the story text and the
+    offered choices for the game loop to collect, and advance runs the story
+    in slices, yielding to the event loop between them, so one event loop can
+    drive many stories and a long stretch of story never starves I/O.
+
+    Public Methods:
+        advance: Run until the story waits for a choice or ends.
+        drain: Take the buffered story text.
+    """
+
+    # Instructions to run between yields to the event loop
+    SLICE = 1000
+
+    def __init__(self, program: Program = None, undo: int = 0):
+        self.output: list[str] = []
+        self.offer: dict[str, str] = {}
+        super().__init__(program, undo)
+
+    def connect(self):
+        pass
+
+    async def advance(self) -> Status:
+        """Run until the story waits for a choice or ends.
+
+        Returns:
+            Status: WAITING or ENDED.
+        """
+        import asyncio  # Only asyncio game loops need it
+
+        while self.run(self.SLICE) is Status.RUNNING:
+            await asyncio.sleep(0)
+        return self.status
+
+    def drain(self) -> list[str]:
+        """Take the story text printed since the last drain."""
+        output, self.output = self.output, []
+        return output
+
+    def put_text(self, text: str):
+        self.output.append(text)
+
+    def give_choice(self, choices: dict[str, str]):
+        self.offer = choices
+
+    def end(self):
+        pass
@@ -0,0 +1,159 @@
+"""
+Link-time address resolution for goto and gosub.
+
+Usage:
+    >>> from engine.linker import link
+    >>> links = link(doc)
+    >>> links.target("/start/child_block")
+    Block(...)
+
+Addresses name blocks by path: "/start" is the top level block named start,
+and "/start/child_block" is a block nested in it. Relative addresses are
+looked up from the block containing the jump outwards, so "child" first means
+a child of the current block, then a sibling, and so on up to the top level.
+
+Linking walks the Document once, indexes every block by path and resolves every
+goto and gosub target, so all bad addresses are reported together before a
+story runs, and a jump at runtime is an index lookup.
+"""
+
+from dataclasses import dataclass
+from typing import Iterator
+
+from engine.exceptions import BadAddress
+from engine.nodes import Block, Document, GoSub, GoTo
+from engine.syntax import Map, Node, Sequence
+
+
+@dataclass(slots=True)
+class Jump:
+    """A goto or gosub, with the block index its address resolved to."""
+
+    node: Map
+    scope: str
+    address: str
+    target: int | None = None
+
+
+class Links:
+    """The blocks of a Document indexed by path, and its resolved jumps.
+
+    Public Methods:
+        resolve: Resolve an address to a block index.
+        target: Resolve an address to a Block.
+    """
+
+    def __init__(self, doc: Node):
+        self.doc = doc
+        self.blocks: list[Block] = []
+        self.paths: list[str] = []
+        self.index: dict[str, int] = {}
+        self.jumps: list[Jump] = []
+        self.errors: list[str] = []
+        self._resolved: dict[tuple[str, str], int] = {}
+
+        if isinstance(doc, Document) and doc["blocks"] is not None:
+            self._index_blocks(doc["blocks"], scope="")
+        for jump in self.jumps:
+            try:
+                jump.target = self.resolve(jump.address, jump.scope)
+            except BadAddress as e:
+                self.errors.append(str(e))
+
+    @property
+    def unresolved(self) -> list[Jump]:
+        return [jump for jump in self.jumps if jump.target is None]
+
+    def resolve(self, address: str, scope: str = "") -> int:
+        """Resolve an address to the index of its block.
+
+        Args:
+            address (str): An absolute ("/a/b") or relative ("b") address.
+            scope (str, optional): The path of the block the address is used
+                in. Defaults to the top level.
+
+        Returns:
+            int: The index of the block in Links.blocks.
+
+        Raises:
+            BadAddress: If no block has the address.
+        """
+        try:
+            return self._resolved[scope, address]
+        except KeyError:
+            pass
+
+        for candidate in candidates(address, scope):
+            if candidate in self.index:
+                target = self._resolved[scope, address] = self.index[candidate]
+                return target
+
+        where = f"in block {scope}" if scope else "at the top level"
+        raise BadAddress(f"No block at address {address} ({where}).")
+
+    def target(self, address: str, scope: str = "") -> Block:
+        """Resolve an address to its Block. See resolve."""
+        return self.blocks[self.resolve(address, scope)]
+
+    def _index_blocks(self, blocks: Sequence, scope: str):
+        for block in blocks.data:
+            if not isinstance(block, Block):
+                continue
+            path = f"{scope}/{block['name'].data}"
+            if path in self.index:
+                self.errors.append(f"Duplicate block address: {path}")
+                continue
+
+            self.index[path] = len(self.blocks)
+            self.blocks.append(block)
+            self.paths.append(path)
+
+            for node in walk(block["content"]):
+                if isinstance(node, GoTo):
+                    self.jumps.append(Jump(node, path, node["goto"].data))
+                elif isinstance(node, GoSub):
+                    self.jumps.append(Jump(node, path, node["gosub"].data))
+
+            if block["blocks"] is not None:
+                self._index_blocks(block["blocks"], scope=path)
+
+
+def candidates(address: str, scope: str = "") -> Iterator[str]:
+    """Yield the paths an address may name from a scope, nearest first."""
+    path = address.strip("/")
+    if address.startswith("/"):
+        yield f"/{path}"
+        return
+    while scope:
+        yield f"{scope}/{path}"
+        scope = scope.rpartition("/")[0]
+    yield f"/{path}"
+
+
+def walk(node: Node) -> Iterator[Node]:
+    """Yield a node and its subnodes depth first, stopping at nested blocks."""
+    yield node
+    if isinstance(node, Sequence):
+        for item in node.data:
+            yield from walk(item)
+    elif isinstance(node, Map) and not isinstance(node, Block):
+        for item in node.data.values():
+            yield from walk(item)
+
+
+def link(doc: Node) -> Links:
+    """Index the blocks of a Document and resolve every goto and gosub in it.
+
+    Args:
+        doc (Node): A parsed story.
+
+    Returns:
+        Links: The block index and resolved jumps.
+
+    Raises:
+        BadAddress: Listing every unresolved address and duplicate block.
+    """
+    links = Links(doc)
+    if links.errors:
+        raise BadAddress("Unable to link story:\n" + "\n".join(links.errors))
+    return links
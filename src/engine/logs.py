@@ -0,0 +1,45 @@
+"""
+Logging configuration for the console scripts.
+
+Usage:
+    >>> from engine import logs
+    >>> logs.configure()  # Once, at the top of main
+    >>> logs.configure(level="DEBUG")  # Or with a level override
+
+Importing an engine module never configures logging: every module only gets
+its logger, and each console script calls configure once, before it logs.
+The config is the [tool.logging] table of pyproject.toml in the working
+directory. Without one, or if it is not valid, records go to the console at
+INFO.
+
+Loggers made before configure stay enabled (disable_existing_loggers is
+false), so modules may be imported in any order.
+"""
+
+import logging
+from pathlib import Path
+
+PYPROJECT = Path("pyproject.toml")
+FORMAT = "[%(name)s] %(message)s"
+
+_configured = False
+
+
+def configure(path: Path = PYPROJECT, level: str | None = None):
+    """Configure logging, the first time it is called.
+
+    Args:
+        path (Path, optional): A TOML file with a [tool.logging] table.
+        level (str, optional): The root logger level, overriding the config.
+    """
+    global _configured
+    if not _configured:
+        _configured = True
+        try:
+            import logging518.config
+
+            logging518.config.fileConfig(path)
+        except (OSError, KeyError, ValueError):  # ValueError: bad TOML or config
+            logging.basicConfig(format=FORMAT, level=logging.INFO)
+    if level is not None:
+        logging.getLogger().setLevel(level.upper())
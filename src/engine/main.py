@@ -2,34 +2,123 @@
 A console runner for the game engine.
 
 Usage:
-    $ python -m engine.main
+    $ python -m engine.main story.yaml
+    $ IFEngine story.yaml
+    $ IFEngine --async story.yaml
+    $ IFEngine --log-level DEBUG story.yaml
+    $ IFEngine --startup-profile story.yaml
+    $ IFEngine --lazy --budget 1000000 story/
+    $ IFEngine --record session.json story.yaml
+    $ IFEngine --replay session.json --until 9990 story.yaml
 
 Expected behavior:
-    - The game displays choices: north, south, east, west, exit
-    - The game waits for user input, and then displays the choices again
-    - The game exits on "exit"
+    - The game prints the story from its start block
+    - At each wait, and at the end of a block, the game displays the choices
+    - The game waits for user input, and then plays the chosen effects
+    - The game exits at the end of the story, or on "exit"
+
+With --startup-profile, the game does not start: IFEngine reports how long a
+cold start spends importing each module and in each step of initialization.
+See engine.startup.
+
+With --lazy, the story may be a directory of story files, and each chapter
+(top level block) is only parsed when the game first reaches it. --budget
+caps how much chapter source stays loaded. See engine.chapters.
+
+With --record, the choices made are written to a file when the game exits.
+With --replay, the game starts where a recording left off, or after its first
+--until choices, without showing the story up to there, and the player goes on
+from that point. Recording a replayed game records the replayed choices too.
+See engine.replay.
 """
 
+import argparse
 import logging
+from pathlib import Path
 
-import logging518.config
+from engine import logs
 
-# Config logging before importing submodules
-# Otherwise submodules get empty loggers
-logging518.config.fileConfig("pyproject.toml")
+log = logging.getLogger("IFProject")
 
-from engine.game import Game
 
-log = logging.getLogger("IFProject")
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="IFEngine", description=__doc__)
+    args.add_argument(
+        "story", type=Path, help="The story file (YAML), or directory, to play."
+    )
+    args.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run the game loop on an asyncio event loop.",
+    )
+    args.add_argument("--log-level", help="Override the configured log level.")
+    args.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Report import and initialization times instead of playing.",
+    )
+    args.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Load each chapter of the story when it is first reached.",
+    )
+    args.add_argument(
+        "--budget",
+        type=int,
+        help="With --lazy, the most chapter source to keep loaded, in bytes.",
+    )
+    args.add_argument("--record", type=Path, help="Write the choices made here.")
+    args.add_argument("--replay", type=Path, help="Replay the choices recorded here.")
+    args.add_argument(
+        "--until", type=int, help="With --replay, how many choices to replay."
+    )
+    args = args.parse_args(argv)
+    logs.configure(level=args.log_level)
 
+    if args.startup_profile:
+        from engine.startup import profile
+
+        print(profile(args.story).report())
+        return
+
+    # The game modules load here, after logging is configured and only when
+    # a game is played
+    from engine.game import AsyncGame, Game
 
-def main():
     log.info("Welcome to IFProject!")
     log.info("Loading the game.")
-    game = Game()
+    story = args.story
+    if args.lazy:
+        from engine.chapters import open_story
+
+        story = open_story(story, args.budget)
+    game = AsyncGame(story) if args.use_async else Game(story)
+    recording = None
+    if args.replay or args.record:
+        from engine.replay import Recording, replay
+
+        program = game.interpreter.program
+        recording = Recording(program.fingerprint)
+        if args.replay:
+            recording = Recording.loads(args.replay.read_text())
+            recording.choices = recording.choices[: args.until]
+            replay(program, recording, interpreter=game.interpreter)
+            log.info(f"Replayed {len(recording.choices)} choices.")
+        if args.record:
+            game.interpreter.record(recording)
 
     log.info("Runing the game loop.")
-    game.run()
+    try:
+        if args.use_async:
+            import asyncio
+
+            asyncio.run(game.run())
+        else:
+            game.run()
+    finally:
+        if args.record:
+            args.record.write_text(recording.dumps())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,396 @@
+# Generated by tools/build.py from engine/syntax.yaml. Do not edit.
+"""
+The story syntax: node classes and parse tables generated from syntax.yaml.
+
+Usage:
+    >>> from engine.nodes import Document, syntax_v1
+    >>> doc = Parser(syntax_v1).parse(source)
+    >>> isinstance(doc, Document)
+
+Regenerate it with `python -m tools.build` after editing syntax.yaml.
+"""
+
+from dataclasses import dataclass
+
+from engine.syntax import (
+    Expression,
+    Map,
+    Null,
+    Sequence,
+    Spec,
+    Syntax,
+    Tables,
+    Tag,
+    Value,
+)
+
+# Sequences -------------------------------------------------------------------
+
+
+@dataclass(slots=True, eq=False)
+class Vars(Sequence):
+    """A list of Var."""
+
+
+@dataclass(slots=True, eq=False)
+class Blocks(Sequence):
+    """A list of Block."""
+
+
+@dataclass(slots=True, eq=False)
+class Content(Sequence):
+    """A list of Command."""
+
+
+@dataclass(slots=True, eq=False)
+class ShownEffects(Sequence):
+    """A list of ShownEffect."""
+
+
+@dataclass(slots=True, eq=False)
+class Ifs(Sequence):
+    """A list of If."""
+
+
+@dataclass(slots=True, eq=False)
+class Cases(Sequence):
+    """A list of Case."""
+
+
+# Maps ------------------------------------------------------------------------
+
+
+@dataclass(slots=True, eq=False, weakref_slot=True)
+class Document(Map):
+    spec = Spec(
+        Tag("vars", Vars, optional=True),
+        Tag("blocks", Blocks, optional=True),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Var(Map):
+    spec = Spec(
+        Tag("name", Expression),
+        Tag("type", Expression),
+        Tag("value", Value, optional=True),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Block(Map):
+    spec = Spec(
+        Tag("name", Expression),
+        Tag("start", Value, optional=True),
+        Tag("img", Expression, optional=True),
+        Tag("content", Content, optional=True),
+        Tag("blocks", Blocks, optional=True),
+        one_of=("content", "blocks"),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Choice(Map):
+    spec = Spec(
+        Tag("choice", Expression),
+        Tag("effects", Content),
+        Tag("text", Expression, optional=True),
+        Tag("reusable", Value, optional=True),
+        Tag("shown_effects", ShownEffects, optional=True),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class GainEffect(Map):
+    spec = Spec(
+        Tag("gain", Expression),
+        Tag("amount", Value),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class PayEffect(Map):
+    spec = Spec(
+        Tag("pay", Expression),
+        Tag("amount", Value),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Error(Map):
+    spec = Spec(
+        Tag("error", Null),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class GoSub(Map):
+    spec = Spec(
+        Tag("gosub", Expression),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class GoTo(Map):
+    spec = Spec(
+        Tag("goto", Expression),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class If(Map):
+    spec = Spec(
+        Tag("if", Expression),
+        Tag("then", Content),
+        Tag("else", Content, optional=True),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class IfList(Map):
+    spec = Spec(
+        Tag("if_list", Ifs),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Modify(Map):
+    spec = Spec(
+        Tag("modify", Expression),
+        Tag("add", Expression, optional=True),
+        Tag("subtract", Expression, optional=True),
+        Tag("multiply", Expression, optional=True),
+        Tag("divide", Expression, optional=True),
+        Tag("set", Expression, optional=True),
+        one_of=("add", "subtract", "multiply", "divide", "set"),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Print(Map):
+    spec = Spec(
+        Tag("print", Expression),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Return(Map):
+    spec = Spec(
+        Tag("return", Null),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Switch(Map):
+    spec = Spec(
+        Tag("switch", Expression),
+        Tag("cases", Cases),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Case(Map):
+    spec = Spec(
+        Tag("case", Value),
+        Tag("then", Content),
+    )
+
+
+@dataclass(slots=True, eq=False)
+class Wait(Map):
+    spec = Spec(
+        Tag("wait", Null),
+    )
+
+
+# Disjuncts -------------------------------------------------------------------
+
+
+Command = (
+    Choice,
+    Error,
+    GoSub,
+    GoTo,
+    If,
+    IfList,
+    Modify,
+    Print,
+    Return,
+    Switch,
+    Wait,
+)
+
+ShownEffect = (GainEffect, PayEffect)
+
+
+# Parse tables ----------------------------------------------------------------
+
+TYPES = [
+    Expression,
+    Value,
+    Null,
+    Sequence,
+    Vars,
+    Blocks,
+    Content,
+    ShownEffects,
+    Ifs,
+    Cases,
+    Document,
+    Var,
+    Block,
+    Choice,
+    GainEffect,
+    PayEffect,
+    Error,
+    GoSub,
+    GoTo,
+    If,
+    IfList,
+    Modify,
+    Print,
+    Return,
+    Switch,
+    Case,
+    Wait,
+]
+
+TABLES = Tables(
+    expressions=(Expression,),
+    sequences=(Sequence, Vars, Blocks, Content, ShownEffects, Ifs, Cases),
+    maps=(
+        Document,
+        Var,
+        Block,
+        Choice,
+        GainEffect,
+        PayEffect,
+        Error,
+        GoSub,
+        GoTo,
+        If,
+        IfList,
+        Modify,
+        Print,
+        Return,
+        Switch,
+        Case,
+        Wait,
+    ),
+    required={
+        Document: frozenset(),
+        Var: frozenset({"name", "type"}),
+        Block: frozenset({"name"}),
+        Choice: frozenset({"choice", "effects"}),
+        GainEffect: frozenset({"amount", "gain"}),
+        PayEffect: frozenset({"amount", "pay"}),
+        Error: frozenset({"error"}),
+        GoSub: frozenset({"gosub"}),
+        GoTo: frozenset({"goto"}),
+        If: frozenset({"if", "then"}),
+        IfList: frozenset({"if_list"}),
+        Modify: frozenset({"modify"}),
+        Print: frozenset({"print"}),
+        Return: frozenset({"return"}),
+        Switch: frozenset({"cases", "switch"}),
+        Case: frozenset({"case", "then"}),
+        Wait: frozenset({"wait"}),
+    },
+    one_of={
+        Block: frozenset({"blocks", "content"}),
+        Modify: frozenset({"add", "divide", "multiply", "set", "subtract"}),
+    },
+    discriminators={
+        "amount": (GainEffect, PayEffect),
+        "blocks": (Document,),
+        "case": (Case,),
+        "cases": (Switch,),
+        "choice": (Choice,),
+        "effects": (Choice,),
+        "error": (Error,),
+        "gain": (GainEffect,),
+        "gosub": (GoSub,),
+        "goto": (GoTo,),
+        "if": (If,),
+        "if_list": (IfList,),
+        "modify": (Modify,),
+        "name": (Var, Block),
+        "pay": (PayEffect,),
+        "print": (Print,),
+        "return": (Return,),
+        "switch": (Switch,),
+        "then": (If, Case),
+        "type": (Var,),
+        "vars": (Document,),
+        "wait": (Wait,),
+    },
+    tag_types={
+        "add": Expression,
+        "amount": Value,
+        "blocks": Blocks,
+        "case": Value,
+        "cases": Cases,
+        "choice": Expression,
+        "content": Content,
+        "divide": Expression,
+        "effects": Content,
+        "else": Content,
+        "error": Null,
+        "gain": Expression,
+        "gosub": Expression,
+        "goto": Expression,
+        "if": Expression,
+        "if_list": Ifs,
+        "img": Expression,
+        "modify": Expression,
+        "multiply": Expression,
+        "name": Expression,
+        "pay": Expression,
+        "print": Expression,
+        "return": Null,
+        "reusable": Value,
+        "set": Expression,
+        "shown_effects": ShownEffects,
+        "start": Value,
+        "subtract": Expression,
+        "switch": Expression,
+        "text": Expression,
+        "then": Content,
+        "type": Expression,
+        "value": Value,
+        "vars": Vars,
+        "wait": Null,
+    },
+    kinds={
+        Expression: Expression,
+        Value: Value,
+        Null: Null,
+        Sequence: Sequence,
+        Vars: Sequence,
+        Blocks: Sequence,
+        Content: Sequence,
+        ShownEffects: Sequence,
+        Ifs: Sequence,
+        Cases: Sequence,
+        Document: Map,
+        Var: Map,
+        Block: Map,
+        Choice: Map,
+        GainEffect: Map,
+        PayEffect: Map,
+        Error: Map,
+        GoSub: Map,
+        GoTo: Map,
+        If: Map,
+        IfList: Map,
+        Modify: Map,
+        Print: Map,
+        Return: Map,
+        Switch: Map,
+        Case: Map,
+        Wait: Map,
+    },
+    fingerprint="337dc458234b1855bee3a1067392c883b2eed3ab210d522bc9cdd19085360696",
+)
+
+syntax_v1 = Syntax(TYPES, TABLES)
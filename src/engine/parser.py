@@ -1,15 +1,31 @@
+import hashlib
+import io
+import json
 import logging
+import os
+import weakref
+from dataclasses import dataclass
 from pathlib import Path
 from types import NoneType
+from typing import IO, TYPE_CHECKING, Iterable, Iterator
 
-import logging518.config
 import yaml
-
-logging518.config.fileConfig("pyproject.toml")
-log = logging.getLogger("Parser")
-
+from yaml.events import (
+    DocumentEndEvent,
+    DocumentStartEvent,
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+    StreamStartEvent,
+)
 
 from engine.exceptions import NotRecognized
+from engine.interning import Interner
+from engine.nodes import Document, syntax_v1
 from engine.syntax import (
     Expression,
     Map,
@@ -19,10 +35,40 @@ from engine.syntax import (
     Null,
     Sequence,
     Syntax,
-    syntax_v1,
+    Value,
 )
 
+if TYPE_CHECKING:
+    from engine.cache import ASTCache
+
+log = logging.getLogger("Parser")
+
 PoPo = str | list | dict | None
+BlockIndex = dict[str, tuple[bytes, Node]]
+
+# Use the libyaml emitter when PyYAML was built with it
+EventDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# The errors parse_many reports for each file, instead of stopping the batch
+PARSE_ERRORS = (NotRecognized, TypeError, yaml.YAMLError, OSError, UnicodeDecodeError)
+
+
+@dataclass
+class Parsed:
+    """A file parsed by parse_many: its AST, or the error that stopped it."""
+
+    path: Path
+    node: Node | None = None
+    error: Exception | None = None
+
+
+def block_digest(data: PoPo) -> bytes:
+    """Hash a block's PoPo, independent of key order."""
+    try:
+        text = json.dumps(data, sort_keys=True, default=repr)
+    except TypeError:  # Keys of mixed types
+        text = repr(data)
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
 
 
 def log_parse_start(data, node_type):
@@ -34,7 +80,7 @@ def log_parse_start(data, node_type):
     else:
         name = node_type.__name__
     data_string = str(data).strip()[:80]
-    log.debug(f"Parsing {name} node with: {data_string}")
+    log.debug("Parsing %s node with: %s", name, data_string)
 
 
 class Parser:
@@ -42,22 +88,47 @@ class Parser:
 
     Public Methods:
         parse: Parse a YAML string or file into an AST Node.
-        dump: Dump an AST Node into a YAML string.
+        parse_many: Parse many files in parallel, as they finish.
+        reparse: Parse an edited document, reusing its unchanged blocks.
+        dump: Dump an AST Node as YAML, to a string, a file or a text stream.
 
     Private Methods:
+        _load: Parse a YAML string into an AST Node, bypassing the cache.
+        _parse_file: Parse one file of a batch, catching its parse errors.
+        _intern: Intern an AST Node, if the parser interns.
+        _block_index: Index the blocks of a Document by name and content hash.
         _parse: Parse a PoPo into an AST Node according to the given node_type.
         _parse_map: Parse a dictionary into a Map node.
+        _emit: Stream an AST Node to a YAML emitter, event by event.
         _dump: Dump an AST Node back into a PoPo.
     """
 
-    def __init__(self, syntax: Syntax = syntax_v1):
+    def __init__(
+        self,
+        syntax: Syntax = syntax_v1,
+        cache: "ASTCache" = None,
+        one_pass: bool = False,
+        intern: bool = False,
+    ):
         """Initialize the Parser with a given syntax.
 
         Args:
             syntax (Syntax, optional): The syntax to use when parsing.
                 Defaults to syntax_v1.
+            cache (ASTCache, optional): An on-disk cache of parsed ASTs.
+                Defaults to None, which disables caching.
+            one_pass (bool, optional): Build the AST straight from the YAML
+                event stream, without an intermediate PoPo tree.
+                Defaults to False.
+            intern (bool, optional): Share one instance of every distinct
+                subtree, across every AST the parser returns. See
+                engine.interning. Defaults to False.
         """
         self.syntax = syntax
+        self.cache = cache
+        self.one_pass = one_pass
+        self.interner = Interner() if intern else None
+        self._indexes: dict[int, BlockIndex] = {}
 
     def parse(self, data: str | Path) -> Node:
         """Parse a YAML string or file into an AST Node.
@@ -74,68 +145,259 @@ class Parser:
         if isinstance(data, Path):
             data = data.read_text()
 
-        data = yaml.load(data, Loader=yaml.FullLoader)
-        return self._parse(data, node_type=None)
+        if self.cache is None:
+            return self._intern(self._load(data))
+
+        key = self.cache.key(data, self.syntax)
+        node = self.cache.load(key)
+        if node is None:
+            node = self._load(data)
+            self.cache.store(key, node)
+        return self._intern(node)
+
+    def parse_many(
+        self, paths: Iterable[Path], workers: int = None
+    ) -> Iterator[Parsed]:
+        """Parse many YAML files across a process pool, as they finish.
+
+        Each worker parses with a copy of this parser, sharing its syntax and
+        cache. The ASTs are interned here, if this parser interns.
+
+        Args:
+            paths (Iterable[Path]): The files to parse.
+            workers (int, optional): The number of worker processes. Defaults
+                to one per core. With 1, files are parsed in this process, in
+                order.
+
+        Yields:
+            Parsed: Each file's AST, or the error that stopped it: one of
+                PARSE_ERRORS, such as a YAML error or a missing or unreadable
+                file. They are yielded in the order they finish.
+        """
+        paths = list(paths)
+        workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+        if workers == 1:
+            yield from map(self._parse_file, paths)
+            return
+
+        # Only pools need them
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        log.info(f"Parsing {len(paths)} files with {workers} workers.")
+        pool = ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(self.syntax, self.cache, self.one_pass),
+        )
+        try:
+            futures = [pool.submit(_parse_file, path) for path in paths]
+            for future in as_completed(futures):
+                parsed = future.result()
+                if parsed.node is not None:
+                    parsed.node = self._intern(parsed.node)
+                yield parsed
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def reparse(self, old_doc: Node, new_source: str | Path) -> Node:
+        """Parse an edited document, reusing the unchanged blocks of its old AST.
+
+        Blocks under Document.blocks are matched by name and by a hash of their
+        content. Only new or changed blocks are parsed, and every other Block
+        subtree of old_doc is shared with the result.
+
+        Args:
+            old_doc (Node): The AST of the document before the edit.
+            new_source (str | Path): The edited YAML data string or file.
+
+        Returns:
+            Node: An AST Node equal to parse(new_source).
 
-    def dump(self, node: Node, file: Path = None) -> str:
-        """Dump an AST Node into a YAML string.
+        Raises:
+            NotRecognized: If the data is not recognized.
+        """
+        if isinstance(new_source, Path):
+            new_source = new_source.read_text()
+
+        data = yaml.load(new_source, Loader=yaml.FullLoader)
+        is_doc = (
+            isinstance(data, dict) and self.syntax.grammar.recognize(data) is Document
+        )
+        if not is_doc or not isinstance(data.get("blocks"), list):
+            return self._intern(self._parse(data, node_type=None))
+
+        old_index = self._block_index(old_doc)
+        keys, blocks = [], []
+        for block_data in data["blocks"]:
+            digest = block_digest(block_data)
+            name = block_data.get("name") if isinstance(block_data, dict) else None
+            name = name if isinstance(name, str) else None
+            old_digest, block = old_index.get(name, (None, None))
+            if old_digest != digest:
+                log.debug(f"Reparsing changed block: {name}")
+                block = self._parse(block_data, node_type=None)
+            blocks.append(block)
+            keys.append((name, digest))
+
+        result = {
+            tag.key: Sequence(blocks)
+            if tag.key == "blocks"
+            else self._parse(data[tag.key], tag.type)
+            for tag in Document.spec
+            if tag.key in data
+        }
+        doc = self._intern(Document(result))
+
+        # Index the interned blocks, which the next reparse shares as they are
+        blocks = doc.data["blocks"].data
+        new_index = {
+            name: (digest, block) for (name, digest), block in zip(keys, blocks)
+        }
+        if id(doc) not in self._indexes:  # Unchanged or interned: indexed already
+            weakref.finalize(doc, self._indexes.pop, id(doc), None)
+        self._indexes[id(doc)] = new_index
+        return doc
+
+    def dump(self, node: Node, file: Path | IO[str] = None) -> str | IO[str]:
+        """Dump an AST Node as YAML, writing it to a file if one is given.
 
         Args:
             node (Node): The AST Node to dump.
-            file (Path, optional): The file to dump the YAML string to.
+            file (Path | IO[str], optional): A file path or writable text
+                stream to dump the YAML to.
 
         Returns:
-            str: A string that represents the YAML format of the AST Node.
+            str | IO[str]: The YAML, as it always was when no file or a file
+                path is given, or the stream it was written to.
 
         Effects:
-            Writes the YAML string to the given file.
+            Writes the YAML to the given file. A stream is written node by
+            node, without building the whole document in memory first.
         """
-        result = yaml.dump(self._dump(node))
+        if file is None or isinstance(file, Path):
+            stream = io.StringIO()
+            self._emit(node, stream)
+            text = stream.getvalue()
+            if file is not None:
+                file.write_text(text, encoding="utf-8")
+            return text
 
-        if file:
-            file.write_text(result)
+        self._emit(node, file)
+        return file
 
-        return result
+    def _load(self, data: str) -> Node:
+        if self.one_pass:
+            from engine.builder import ASTBuilder  # Only one_pass parsers use it
 
-    def _parse(self, data: PoPo, node_type: NodeType) -> Node:
-        log_parse_start(data, node_type)
+            return ASTBuilder(self).build(data)
+
+        data = yaml.load(data, Loader=yaml.FullLoader)
+        return self._parse(data, node_type=None)
 
-        # Hack to match node types with class patterns
-        node_type_instance = node_type({}) if node_type else None
+    def _parse_file(self, path: Path) -> Parsed:
+        try:
+            return Parsed(path, node=self.parse(path))
+        except PARSE_ERRORS as e:
+            return Parsed(path, error=e)
+
+    def _intern(self, node: Node) -> Node:
+        return node if self.interner is None else self.interner.intern(node)
+
+    def _block_index(self, doc: Node) -> BlockIndex:
+        if id(doc) in self._indexes:
+            return self._indexes[id(doc)]
+
+        # Not from reparse: hash the dumped blocks instead of their source
+        if not isinstance(doc, Document) or "blocks" not in doc.data:
+            return {}
+        index = {}
+        for block in doc.data["blocks"].data:
+            name = block.data.get("name") if isinstance(block, Map) else None
+            name = name.data if isinstance(name, Expression) else None
+            index[name] = block_digest(self._dump(block)), block
+        return index
+
+    def _parse(self, data: PoPo, node_type: NodeType) -> Node:
+        if log.isEnabledFor(logging.DEBUG):
+            log_parse_start(data, node_type)
+        kind = self.syntax.grammar.kind(node_type)
 
-        match data, node_type_instance:
-            case str(), Expression():
+        match data:
+            case str() if kind is Expression:
                 return node_type(data)
 
-            case list(), Sequence():
+            case list() if kind is Sequence:
                 return Sequence([self._parse(item, None) for item in data])
 
-            case dict(), None | Map():
+            case dict() if kind is None or kind is Map:
                 return self._parse_map(data, node_type)
 
-            case None, Null():
+            case bool() | int() | float() | str() if kind is Value:
+                return node_type(data)
+
+            case None if kind is Null:
                 return Null()
 
+        raise TypeError(f"Data: {data} does not match node {node_type}")
+
+    def _parse_map(self, data: dict, node_type: MapType | None) -> Map:
+        grammar = self.syntax.grammar
+        if node_type is None:
+            node = grammar.recognize(data)
+        else:
+            node = node_type if grammar.accepts(node_type, data) else None
+
+        if node is None:
+            raise NotRecognized(f"Unrecognized map: {data}")
+
+        log.debug("===> Matched tags for %s.", node.__name__)
+        result = {
+            tag.key: self._parse(data[tag.key], tag.type)
+            for tag in node.spec
+            if tag.key in data
+        }
+        return node(result)
+
+    def _emit(self, node: Node, stream: IO[str]):
+        dumper = EventDumper(stream)
+        try:
+            dumper.emit(StreamStartEvent())
+            dumper.emit(DocumentStartEvent(explicit=False))
+            for event in self._events(node, dumper):
+                dumper.emit(event)
+            dumper.emit(DocumentEndEvent(explicit=False))
+            dumper.emit(StreamEndEvent())
+        finally:
+            dumper.dispose()
+
+    def _events(self, node: Node, dumper: yaml.Dumper) -> Iterator[Event]:
+        match node:
+            case Null() | Expression() | Value():
+                yield self._scalar(node.data, dumper)
+            case Map():
+                yield MappingStartEvent(None, None, True, flow_style=False)
+                for key in sorted(node.data):
+                    yield self._scalar(key, dumper)
+                    yield from self._events(node.data[key], dumper)
+                yield MappingEndEvent()
+            case Sequence():
+                yield SequenceStartEvent(None, None, True, flow_style=False)
+                for item in node.data:
+                    yield from self._events(item, dumper)
+                yield SequenceEndEvent()
+            case Node():
+                raise NotRecognized(f"Unrecognized {node.type} node: {node}")
             case _:
-                raise TypeError(f"Data: {data} does not match node {node_type}")
-
-    def _parse_map(self, data, node_type: MapType | None) -> Map:
-        candidate_nodes = [node_type] if node_type else self.syntax.maps
-        log.debug(
-            f"=> Parse as map. Candidate nodes: "
-            "{[node.__name__ for node in candidate_nodes]}:"
-        )
+                raise TypeError(f"Expected Node, got: {node}")
 
-        for node in candidate_nodes:
-            if all(tag.key in data or tag.optional for tag in node.spec):
-                log.debug(f"===> Matched tags for {node.__name__}.")
-                result = {
-                    tag.key: self._parse(data[tag.key], tag.type)
-                    for tag in node.spec
-                    if tag.key in data
-                }
-                return node(result)
-        raise NotRecognized(f"Unrecognized map: {data}")
+    @staticmethod
+    def _scalar(data: PoPo, dumper: yaml.Dumper) -> ScalarEvent:
+        # Quote scalars the way yaml.dump does, so they load back unchanged
+        scalar = dumper.represent_data(data)
+        plain = dumper.resolve(yaml.ScalarNode, scalar.value, (True, False))
+        quoted = dumper.resolve(yaml.ScalarNode, scalar.value, (False, True))
+        implicit = (scalar.tag == plain, scalar.tag == quoted)
+        return ScalarEvent(None, scalar.tag, implicit, scalar.value, style=scalar.style)
 
     def _dump(self, node: Node) -> PoPo:
         data, type = node.data, node.type
@@ -144,13 +406,16 @@ class Parser:
                 log.debug("Dumping Null node.")
                 return None
             case Expression():
-                log.debug(f"Dumping {type} expression: {data}")
+                log.debug("Dumping %s expression: %s", type, data)
+                return data
+            case Value():
+                log.debug("Dumping %s value: %s", type, data)
                 return data
             case Map():
-                log.debug(f"Dumping {type} map: {data}")
+                log.debug("Dumping %s map: %s", type, data)
                 return {k: self._dump(v) for k, v in data.items()}
             case Sequence():
-                log.debug(f"Dumping {type} sequence: {data}")
+                log.debug("Dumping %s sequence: %s", type, data)
                 return [self._dump(item) for item in data]
             case Node():
                 raise NotRecognized(f"Unrecognized {type} node: {node}")
@@ -158,7 +423,21 @@ class Parser:
                 raise TypeError(f"Expected Node, got: {node}")
 
 
+# The parser of each parse_many worker process
+_parser: Parser = None
+
+
+def _init_worker(syntax: Syntax, cache: "ASTCache", one_pass: bool):
+    global _parser
+    _parser = Parser(syntax, cache, one_pass)
+
+
+def _parse_file(path: Path) -> Parsed:
+    return _parser._parse_file(path)
+
+
 # Publish the default parser
 parser = Parser()
 parse = parser.parse
+parse_many = parser.parse_many
 dump = parser.dump
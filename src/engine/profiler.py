@@ -0,0 +1,226 @@
+"""
+Runtime profiling for the interpreter: where a story spends its time.
+
+Usage:
+    >>> profiler = interpreter.profile()
+    >>> interpreter.run()
+    >>> print(profiler.report())
+    >>> profiler.dump(Path("story.tsv"))  # A flat table
+    >>> profiler.dump_stats(Path("story.prof"))  # cProfile stats
+    $ python -m pstats story.prof
+
+Profiling swaps the interpreter's instruction handlers for timed wrappers,
+and unprofile swaps them back, so an interpreter that is not profiled runs
+the same code as one that never was: profiling costs nothing when it is off.
+One Profiler may collect from many interpreters, one at a time or in turn.
+
+Collected:
+    ops: The count and time of each instruction type.
+    blocks: The instructions run in, and time spent in, each block.
+    visits: How often each block was entered, by a goto, a gosub or a start.
+    conditions: The count and time of each condition, by source.
+    choices: How often each choice was made, by block and choice id.
+    depths: How often each stack depth was reached, by a gosub or a choice.
+
+In cProfile stats, each block is a function of the file "<story>", called by
+the blocks that jump to it, and each condition is a function of the file
+"<conditions>", called by the blocks that test it.
+"""
+
+import csv
+import marshal
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from engine.compiler import ChoiceInfo, Op
+
+if TYPE_CHECKING:
+    from engine.interpreter import Interpreter
+
+Handler = Callable[[Any], None]
+
+STORY_FILE = "<story>"
+CONDITIONS_FILE = "<conditions>"
+
+
+@dataclass
+class Profiler:
+    """Runtime statistics of the interpreters it profiles.
+
+    Counters are [count, seconds] lists, keyed by name.
+
+    Public Methods:
+        wrap: Wrap an interpreter's instruction handlers.
+        visit: Count a visit to a block.
+        choose: Count a choice.
+        report: Format the statistics as tables.
+        summary: The statistics, as JSON data.
+        dump: Write the statistics to a flat, tab separated file.
+        create_stats: Build cProfile stats, for pstats.Stats(profiler).
+        dump_stats: Write cProfile stats to a file.
+    """
+
+    ops: dict[str, list] = field(default_factory=dict)
+    blocks: dict[str, list] = field(default_factory=dict)
+    visits: Counter = field(default_factory=Counter)
+    conditions: dict[str, list] = field(default_factory=dict)
+    choices: dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    depths: Counter = field(default_factory=Counter)
+    callers: dict[tuple, Counter] = field(default_factory=lambda: defaultdict(Counter))
+
+    def wrap(
+        self, interpreter: "Interpreter", handlers: tuple[Handler, ...]
+    ) -> tuple[Handler, ...]:
+        """Wrap an interpreter's instruction handlers, indexed by Op, to time them."""
+        return tuple(self._timed(interpreter, op, handlers[op]) for op in Op)
+
+    def visit(self, path: str):
+        """Count a visit to a block."""
+        self.visits[path] += 1
+
+    def choose(self, interpreter: "Interpreter", info: ChoiceInfo):
+        """Count a choice, made by an interpreter."""
+        self.choices[interpreter.program.scopes[info.effects]][info.id] += 1
+        self.depths[len(interpreter.stack)] += 1
+
+    def _timed(self, interpreter: "Interpreter", op: Op, handler: Handler) -> Handler:
+        scopes, clock = interpreter.program.scopes, time.perf_counter
+        counter = self.ops.setdefault(op.name, [0, 0.0])
+        blocks, callers = self.blocks, self.callers
+
+        def record(pc: int, seconds: float):
+            counter[0] += 1
+            counter[1] += seconds
+            block = blocks.get(scopes[pc])
+            if block is None:
+                block = blocks[scopes[pc]] = [0, 0.0]
+            block[0] += 1
+            block[1] += seconds
+
+        def timed(arg):
+            pc = interpreter.pc - 1
+            start = clock()
+            handler(arg)
+            record(pc, clock() - start)
+
+        def jump(target: int):
+            pc = interpreter.pc - 1
+            start = clock()
+            handler(target)
+            record(pc, clock() - start)
+            self.visits[scopes[target]] += 1
+            callers[STORY_FILE, scopes[target]][scopes[pc]] += 1
+            if op is Op.CALL:
+                self.depths[len(interpreter.stack)] += 1
+
+        def branch(arg: tuple[int, int]):
+            pc = interpreter.pc - 1
+            start = clock()
+            handler(arg)
+            seconds = clock() - start
+            record(pc, seconds)
+            source = interpreter.program.conditions[arg[0]]
+            condition = self.conditions.setdefault(source, [0, 0.0])
+            condition[0] += 1
+            condition[1] += seconds
+            callers[CONDITIONS_FILE, source][scopes[pc]] += 1
+
+        if op is Op.GOTO or op is Op.CALL:
+            return jump
+        if op is Op.BRANCH:
+            return branch
+        return timed
+
+    def report(self, top: int = 10) -> str:
+        """Format the statistics: the hottest blocks and conditions, and more."""
+        lines = []
+
+        def table(title: str, rows: dict[str, list], unit: str):
+            lines.append(f"{title}, slowest first")
+            lines.append(f"{'count':>10} {'total ms':>10} {'us each':>8}  {unit}")
+            slowest = sorted(rows.items(), key=lambda row: row[1][1], reverse=True)
+            lines.extend(
+                f"{count:10} {seconds * 1000:10.2f} "
+                f"{seconds * 1e6 / count if count else 0.0:8.2f}  {name}"
+                for name, (count, seconds) in slowest[:top]
+            )
+            lines.append("")
+
+        table("Instructions", self.ops, "op")
+        table("Blocks", self.blocks, "block (count: instructions run)")
+        table("Conditions", self.conditions, "condition")
+
+        lines.append("Visits, most first")
+        lines.extend(f"{n:10}  {path}" for path, n in self.visits.most_common(top))
+        lines.append("")
+
+        lines.append("Choices, most first")
+        made = Counter(
+            {
+                (path, id): n
+                for path, ids in self.choices.items()
+                for id, n in ids.items()
+            }
+        )
+        lines.extend(f"{n:10}  {path}: {id}" for (path, id), n in made.most_common(top))
+        lines.append("")
+
+        lines.append("Stack depths")
+        lines.extend(f"{n:10}  {depth}" for depth, n in sorted(self.depths.items()))
+        return "\n".join(lines)
+
+    def summary(self) -> dict[str, Any]:
+        """The statistics, as JSON data."""
+        return {
+            "ops": self.ops,
+            "blocks": self.blocks,
+            "visits": dict(self.visits),
+            "conditions": self.conditions,
+            "choices": {path: dict(ids) for path, ids in self.choices.items()},
+            "depths": dict(self.depths),
+        }
+
+    def dump(self, path: Path):
+        """Write the statistics to a tab separated file, one row per counter.
+
+        The columns are kind, name, count and seconds, where the kind is op,
+        block, visit, condition, choice or depth. Choices are named by block
+        and choice id, separated by a space.
+        """
+        with path.open("w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file, delimiter="\t", lineterminator="\n")
+            writer.writerow(["kind", "name", "count", "seconds"])
+            for kind, rows in ("op", self.ops), ("block", self.blocks):
+                writer.writerows([kind, name, n, s] for name, (n, s) in rows.items())
+            writer.writerows(["visit", name, n, ""] for name, n in self.visits.items())
+            writer.writerows(
+                ["condition", name, n, s] for name, (n, s) in self.conditions.items()
+            )
+            writer.writerows(
+                ["choice", f"{path} {id}", n, ""]
+                for path, ids in self.choices.items()
+                for id, n in ids.items()
+            )
+            writer.writerows(["depth", d, n, ""] for d, n in self.depths.items())
+
+    def create_stats(self):
+        """Build cProfile stats in self.stats, as cProfile.Profile does."""
+        functions = {STORY_FILE: self.blocks, CONDITIONS_FILE: self.conditions}
+        self.stats = {}
+        for file, rows in functions.items():
+            for name, (_, seconds) in rows.items():
+                calls = self.visits[name] if file == STORY_FILE else rows[name][0]
+                callers = {
+                    (STORY_FILE, 0, caller): (n, n, 0.0, 0.0)
+                    for caller, n in self.callers.get((file, name), {}).items()
+                }
+                self.stats[file, 0, name] = calls, calls, seconds, seconds, callers
+
+    def dump_stats(self, path: Path):
+        """Write cProfile stats, to read with pstats or any cProfile viewer."""
+        self.create_stats()
+        with open(path, "wb") as file:
+            marshal.dump(self.stats, file)
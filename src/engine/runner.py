@@ -0,0 +1,229 @@
+"""
+A headless runner for batches of scripted playthroughs.
+
+Usage:
+    $ IFRunner story.yaml scripts.json
+    $ IFRunner story.yaml scripts.json --workers 8 --output report.json
+
+    >>> from engine.runner import run_scripts
+    >>> report = run_scripts(Path("story.yaml"), [["continue"], ["good", "bad"]])
+    >>> report.rate
+    2150.3
+
+A script is the list of choice ids to make, in order, at each point the story
+waits for a choice. A scripts file is a JSON list of scripts.
+
+The story is parsed and compiled once. Each worker process receives the
+compiled Program once, when it starts, and then plays whole chunks of scripts
+without sending the story again, so a sweep scales with the number of cores.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from engine import logs
+from engine.compiler import Program, compile_story
+from engine.exceptions import BadChoice, StoryError
+from engine.expressions import EVAL_ERRORS
+from engine.interpreter import Interpreter, Status
+from engine.parser import parse
+
+log = logging.getLogger("Runner")
+
+# Instructions a playthrough may run between choices before it is stopped
+DEFAULT_STEP_LIMIT = 100_000
+
+
+class ScriptedInterpreter(Interpreter):
+    """An interpreter that records its output instead of sending signals."""
+
+    def __init__(self, program: Program):
+        self.transcript: list[str] = []
+        super().__init__(program)
+
+    def connect(self):
+        pass
+
+    def put_text(self, text: str):
+        self.transcript.append(text)
+
+    def give_choice(self, choices: dict[str, str]):
+        pass
+
+    def end(self):
+        pass
+
+
+class SilentInterpreter(ScriptedInterpreter):
+    """A headless interpreter that discards the story text."""
+
+    def put_text(self, text: str):
+        pass
+
+
+@dataclass(slots=True)
+class Playthrough:
+    """The outcome of playing one script.
+
+    Attributes:
+        script: The choices the playthrough was asked to make.
+        status: "ended", "waiting" (the script ran out), "running" (the step
+            limit was reached), or "error".
+        transcript: Every line the story printed.
+        choices: How many choices of the script were made.
+        error: What went wrong, if the status is "error".
+        variables: The story variables by name, where the playthrough stopped.
+        block: The path of the block of the last instruction run.
+    """
+
+    script: list[str]
+    status: str
+    transcript: list[str] = field(default_factory=list)
+    choices: int = 0
+    error: str | None = None
+    variables: dict[str, Any] = field(default_factory=dict)
+    block: str | None = None
+
+
+@dataclass
+class Report:
+    """The outcome of a batch of playthroughs.
+
+    Attributes:
+        playthroughs: One Playthrough per script, in script order.
+        seconds: The wall time spent playing.
+        workers: The number of worker processes used.
+    """
+
+    playthroughs: list[Playthrough]
+    seconds: float
+    workers: int
+
+    @property
+    def rate(self) -> float:
+        """Playthroughs per second."""
+        return len(self.playthroughs) / self.seconds if self.seconds else 0.0
+
+    @property
+    def statuses(self) -> Counter:
+        """The number of playthroughs per status."""
+        return Counter(playthrough.status for playthrough in self.playthroughs)
+
+
+def play(program: Program, script: list[str], limit: int = DEFAULT_STEP_LIMIT):
+    """Play one script through a Program.
+
+    Args:
+        program (Program): A compiled story.
+        script (list[str]): The choice ids to make, in order.
+        limit (int, optional): The most instructions to run between choices.
+
+    Returns:
+        Playthrough: The outcome.
+    """
+    interpreter = ScriptedInterpreter(program)
+    result = Playthrough(list(script), Status.RUNNING.value, interpreter.transcript)
+    try:
+        while interpreter.run(limit) is Status.WAITING:
+            if result.choices == len(script):
+                break
+            interpreter.choose(script[result.choices])
+            result.choices += 1
+    except (BadChoice, StoryError, *EVAL_ERRORS) as e:
+        result.status, result.error = "error", f"{type(e).__name__}: {e}"
+    else:
+        result.status = interpreter.status.value
+
+    # The end state, to compare playthroughs by
+    result.variables = interpreter.variables
+    result.block = program.scopes[interpreter.pc - 1]  # Of the last instruction run
+    return result
+
+
+# Worker processes -----------------------------------------------------------
+
+_program: Program = None
+_limit: int = DEFAULT_STEP_LIMIT
+
+
+def _init_worker(program: Program, limit: int):
+    global _program, _limit
+    _program, _limit = program, limit
+
+
+def _play(script: list[str]) -> Playthrough:
+    return play(_program, script, _limit)
+
+
+def run_scripts(
+    story: Path | Program,
+    scripts: list[list[str]],
+    workers: int = None,
+    limit: int = DEFAULT_STEP_LIMIT,
+) -> Report:
+    """Play a batch of scripts through a story, in parallel.
+
+    Args:
+        story (Path | Program): A story file, or a compiled story.
+        scripts (list[list[str]]): The scripts to play.
+        workers (int, optional): The number of worker processes. Defaults to
+            one per core. With 1, scripts are played in this process.
+        limit (int, optional): The most instructions to run between choices.
+
+    Returns:
+        Report: The playthroughs, in script order, and their timing.
+
+    Raises:
+        BadAddress, BadNode, BadExpression: If the story does not compile.
+    """
+    program = story if isinstance(story, Program) else compile_story(parse(story))
+    workers = min(workers or os.cpu_count() or 1, max(len(scripts), 1))
+
+    log.info(f"Playing {len(scripts)} scripts with {workers} workers.")
+    start = time.perf_counter()
+    if workers == 1:
+        playthroughs = [play(program, script, limit) for script in scripts]
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # Only pools need it
+
+        chunksize = max(1, len(scripts) // (workers * 4))
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(program, limit)
+        ) as pool:
+            playthroughs = list(pool.map(_play, scripts, chunksize=chunksize))
+    seconds = time.perf_counter() - start
+
+    return Report(playthroughs, seconds, workers)
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="IFRunner", description=__doc__)
+    args.add_argument("story", type=Path, help="The story file (YAML) to play.")
+    args.add_argument("scripts", type=Path, help="A JSON list of choice scripts.")
+    args.add_argument("--workers", type=int, help="Worker processes (default: cores)")
+    args.add_argument("--limit", type=int, default=DEFAULT_STEP_LIMIT)
+    args.add_argument("--output", type=Path, help="Write the full report as JSON.")
+    args = args.parse_args(argv)
+    logs.configure()
+
+    scripts = json.loads(args.scripts.read_text())
+    report = run_scripts(args.story, scripts, args.workers, args.limit)
+
+    statuses = ", ".join(f"{n} {status}" for status, n in report.statuses.items())
+    print(f"{len(report.playthroughs)} playthroughs: {statuses}")
+    print(f"{report.rate:.1f} playthroughs/s on {report.workers} workers")
+
+    if args.output:
+        playthroughs = [asdict(playthrough) for playthrough in report.playthroughs]
+        args.output.write_text(json.dumps(playthroughs, indent=2))
+
+
+if __name__ == "__main__":
+    main()
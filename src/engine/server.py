@@ -0,0 +1,300 @@
+"""
+A local HTTP and WebSocket server for play sessions.
+
+Usage:
+    $ IFServer stories/ --port 8080
+
+    $ curl -X POST localhost:8080/sessions -d '{"story": "simple_choice"}'
+    {"session": "Xw...", "story": "simple_choice", "text": [...], ...}
+    $ curl -X POST localhost:8080/sessions/Xw.../choices -d '{"choice": "continue"}'
+    $ curl localhost:8080/sessions/Xw.../recording
+    $ curl -X DELETE localhost:8080/sessions/Xw...
+
+    $ IFServer stories/ --profile
+    $ curl localhost:8080/profile
+
+Every response is a turn: the session id, the story text printed since the
+last choice, the choices on offer and the session status. HTTP connections
+are kept alive between requests.
+
+WebSocket clients connect to /ws and send one JSON command per message,
+{"start": story}, {"session": id, "choice": choice} or {"close": id}, and get
+back one turn (or {"error": ...}) per message.
+
+A story that cannot be compiled answers 422, and a story that fails outside
+its error nodes, such as a condition that raises, answers 500 and ends its
+session.
+
+GET /sessions/<id>/recording answers with the choices made in a session, which
+replay it with IFEngine --replay. A session that fails sends them in its last
+turn. See engine.replay.
+
+With --profile, every story's interpreter is profiled, and GET /profile
+answers with the runtime statistics of each loaded story. See
+engine.profiler.
+
+The server uses only the standard library, and plays every session in one
+event loop: see engine.sessions.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+from engine import logs
+from engine.exceptions import BadChoice, BadSession, BadStory
+from engine.sessions import SessionManager, StoryLibrary
+
+log = logging.getLogger("Server")
+
+MAX_BODY = 2**20
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+REASONS = {
+    101: "Switching Protocols",
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    422: "Unprocessable Content",
+    500: "Internal Server Error",
+}
+
+# The status of the response to a request that raises each error
+STATUSES = {BadSession: 404, BadChoice: 409, BadStory: 422}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Server:
+    """Serve a SessionManager over HTTP and WebSocket.
+
+    Public Methods:
+        handle: Handle one client connection.
+        start: Start listening.
+    """
+
+    def __init__(self, sessions: SessionManager):
+        self.sessions = sessions
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        """Start listening, returning the asyncio Server."""
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info(f"Serving on {host}:{port}")
+        return server
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Handle requests on one connection until the client closes it."""
+        try:
+            while request := await read_request(reader):
+                method, path, headers, body = request
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self.websocket(reader, writer, headers)
+                    return
+                status, payload = self.route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except HTTPError as e:
+            await write_response(writer, e.status, {"error": str(e)}, False)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def route(self, method: str, path: str, body: bytes) -> tuple[int, Any]:
+        """Answer one HTTP request with a status and a JSON payload."""
+        parts = path.strip("/").split("/")
+        try:
+            match method, parts:
+                case "POST", ["sessions"]:
+                    return 200, self.sessions.start(field(body, "story"))
+                case "POST", ["sessions", session, "choices"]:
+                    return 200, self.sessions.choose(session, field(body, "choice"))
+                case "GET", ["sessions", session, "recording"]:
+                    return 200, asdict(self.sessions.recording(session))
+                case "DELETE", ["sessions", session]:
+                    self.sessions.close(session)
+                    return 200, {"session": session, "status": "closed"}
+                case "GET", ["profile"]:
+                    profiles = self.sessions.library.profiles()
+                    return 200, {name: p.summary() for name, p in profiles.items()}
+                case _, ["sessions", *_]:
+                    return 405, {"error": f"{method} is not allowed on {path}."}
+        except tuple(STATUSES) as e:
+            return STATUSES[type(e)], {"error": str(e)}
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return 500, failure(e)
+        return 404, {"error": f"Nothing at {path}."}
+
+    def command(self, message: dict) -> Any:
+        """Answer one WebSocket command."""
+        try:
+            match message:
+                case {"start": str(name)}:
+                    return self.sessions.start(name)
+                case {"close": str(session)}:
+                    self.sessions.close(session)
+                    return {"session": session, "status": "closed"}
+                case {"session": str(session), "choice": str(choice)}:
+                    return self.sessions.choose(session, choice)
+        except tuple(STATUSES) as e:
+            return {"error": str(e)}
+        except Exception as e:
+            return failure(e)
+        return {"error": f"Unknown command: {message}"}
+
+    async def websocket(self, reader, writer, headers: dict[str, str]):
+        key = headers.get("sec-websocket-key", "").encode()
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        await writer.drain()
+
+        while (frame := await read_frame(reader)) is not None:
+            opcode, payload = frame
+            if opcode == 0x9:  # Ping
+                writer.write(encode_frame(0xA, payload))
+            elif opcode == 0x1:  # Text
+                try:
+                    reply = self.command(json.loads(payload))
+                except ValueError:
+                    reply = {"error": "Messages must be JSON."}
+                writer.write(encode_frame(0x1, json.dumps(reply).encode()))
+            await writer.drain()
+        writer.write(encode_frame(0x8, b""))
+        await writer.drain()
+
+
+def failure(error: Exception) -> dict:
+    """Log an error a story raised while it played, and describe it."""
+    log.exception("Error while playing a story")
+    return {"error": f"{type(error).__name__}: {error}"}
+
+
+def field(body: bytes, name: str) -> str:
+    """Get a string field from a JSON request body."""
+    try:
+        value = json.loads(body or b"{}")[name]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPError(400, f"Expected a JSON body with a {name} field.")
+    if not isinstance(value, str):
+        raise HTTPError(400, f"The {name} field must be a string.")
+    return value
+
+
+# HTTP ------------------------------------------------------------------------
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Read one request: method, path, lowercase headers and body."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Malformed Content-Length.")
+    if length > MAX_BODY:
+        raise HTTPError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+async def write_response(writer, status: int, payload: Any, keep_alive: bool):
+    body = json.dumps(payload).encode()
+    connection = "keep-alive" if keep_alive else "close"
+    head = (
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {connection}\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+# WebSocket frames ------------------------------------------------------------
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes] | None:
+    """Read one client frame, or None when the client closes."""
+    first, second = await reader.readexactly(2)
+    opcode, length = first & 0x0F, second & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2))
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8))
+    if opcode == 0x8 or not first & 0x80 or length > MAX_BODY:
+        return None  # Close, or a fragmented or oversized message
+
+    mask = await reader.readexactly(4) if second & 0x80 else bytes(4)
+    payload = await reader.readexactly(length)
+    return opcode, bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+
+def encode_frame(opcode: int, payload: bytes) -> bytes:
+    """Encode one unmasked server frame."""
+    length = len(payload)
+    if length < 126:
+        head = bytes([0x80 | opcode, length])
+    elif length < 2**16:
+        head = bytes([0x80 | opcode, 126]) + length.to_bytes(2)
+    else:
+        head = bytes([0x80 | opcode, 127]) + length.to_bytes(8)
+    return head + payload
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="IFServer", description=__doc__)
+    args.add_argument("stories", type=Path, help="The directory of stories to serve.")
+    args.add_argument("--host", default="127.0.0.1")
+    args.add_argument("--port", type=int, default=8080)
+    args.add_argument("--max-stories", type=int, default=32)
+    args.add_argument("--max-sessions", type=int, default=100_000)
+    args.add_argument(
+        "--profile", action="store_true", help="Profile the stories, see /profile."
+    )
+    args = args.parse_args(argv)
+    logs.configure()
+
+    library = StoryLibrary(args.stories, args.max_stories, args.profile)
+    server = Server(SessionManager(library, args.max_sessions))
+
+    async def serve():
+        async with await server.start(args.host, args.port) as listener:
+            await listener.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
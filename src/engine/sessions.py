@@ -0,0 +1,241 @@
+"""
+Many concurrent play sessions over shared, compiled stories.
+
+Usage:
+    >>> from engine.sessions import SessionManager, StoryLibrary
+    >>> sessions = SessionManager(StoryLibrary(Path("stories")))
+    >>> turn = sessions.start("hello_world")
+    >>> turn = sessions.choose(turn["session"], "continue")
+
+Stories are compiled once and kept in a least recently used StoryLibrary.
+Every session of a story shares its Program, which is never modified, and
+one interpreter that plays each move in turn: a session itself is only the
+story it plays and an interpreter state tuple. Sessions do not use the
+pydispatch signals, so sessions in one process never see each other's
+choices.
+
+Each session keeps the choices made in it, which replay it from the start
+(see engine.replay). A session that fails returns them in its last turn.
+
+A library made with profile=True profiles the interpreter of every story it
+compiles, so the Profiler of a story collects from all of its sessions. See
+engine.profiler.
+"""
+
+import logging
+import os
+import secrets
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from engine.compiler import COMPILE_ERRORS, Program, compile_story
+from engine.exceptions import BadSession, BadStory, StoryError
+from engine.interpreter import Status
+from engine.parser import PARSE_ERRORS, parse
+from engine.runner import DEFAULT_STEP_LIMIT, ScriptedInterpreter
+
+if TYPE_CHECKING:
+    from engine.profiler import Profiler
+    from engine.replay import Recording
+
+log = logging.getLogger("Sessions")
+
+Turn = dict[str, Any]
+
+
+@dataclass(slots=True)
+class Story:
+    """A compiled story, and the interpreter its sessions take turns on."""
+
+    name: str
+    mtime: float
+    program: Program
+    interpreter: ScriptedInterpreter = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.interpreter = ScriptedInterpreter(self.program)
+
+
+@dataclass(slots=True)
+class Session:
+    story: Story
+    state: tuple
+    choices: list[str] = field(default_factory=list)  # Made so far, to replay
+
+
+class StoryLibrary:
+    """The stories in a directory, compiled on first use and kept LRU.
+
+    Public Methods:
+        load: Get a compiled story by name.
+        profiles: Get the runtime statistics of each loaded story.
+    """
+
+    def __init__(self, root: Path, max_stories: int = 32, profile: bool = False):
+        self.root = root.resolve()
+        self.max_stories = max_stories
+        self.profile = profile
+        self.stories: OrderedDict[str, Story] = OrderedDict()
+
+    def load(self, name: str) -> Story:
+        """Get a story by name, compiling it if it is new or has changed.
+
+        Args:
+            name (str): The story file name, without ".yaml".
+
+        Raises:
+            BadSession: If there is no such story.
+            BadStory: If the story cannot be parsed or compiled.
+        """
+        path = self.root / f"{name}.yaml"
+        try:
+            if Path(name).name != name or name.startswith("."):
+                raise FileNotFoundError(name)
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            raise BadSession(f"No story named {name}.")
+
+        story = self.stories.get(name)
+        if story is None or story.mtime != mtime:
+            log.info(f"Compiling story: {name}")
+            try:
+                program = compile_story(parse(path))
+            except PARSE_ERRORS + COMPILE_ERRORS as e:
+                raise BadStory(f"Cannot compile story {name}: {e}")
+            story = self.stories[name] = Story(name, mtime, program)
+            if self.profile:
+                story.interpreter.profile()
+        self.stories.move_to_end(name)
+        while len(self.stories) > self.max_stories:
+            self.stories.popitem(last=False)
+        return story
+
+    def profiles(self) -> dict[str, "Profiler"]:
+        """The runtime statistics of each loaded story, if profiling."""
+        return {
+            name: story.interpreter.profiler
+            for name, story in self.stories.items()
+            if story.interpreter.profiler is not None
+        }
+
+
+class SessionManager:
+    """Play sessions of the stories in a StoryLibrary.
+
+    Sessions past max_sessions are dropped, least recently used first.
+
+    Public Methods:
+        start: Start a session of a story.
+        choose: Make a choice in a session.
+        recording: Get the choices made in a session, to replay them.
+        close: End a session.
+    """
+
+    def __init__(
+        self,
+        library: StoryLibrary,
+        max_sessions: int = 100_000,
+        limit: int = DEFAULT_STEP_LIMIT,
+    ):
+        self.library = library
+        self.max_sessions = max_sessions
+        self.limit = limit
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def start(self, name: str) -> Turn:
+        """Start a session of a story, and play it up to its first choice.
+
+        The session is only kept if the story waits for a choice.
+
+        Raises:
+            BadSession: If there is no such story.
+            BadStory: If the story cannot be parsed or compiled.
+        """
+        story = self.library.load(name)
+        interpreter = story.interpreter
+        interpreter.reset()
+        session = Session(story, interpreter.state)
+        return self._play(secrets.token_urlsafe(12), session)
+
+    def choose(self, session_id: str, choice: str) -> Turn:
+        """Make a choice in a session, and play on to the next one.
+
+        Raises:
+            BadSession: If there is no such session.
+            BadChoice: If the choice is not on offer.
+        """
+        session = self._session(session_id)
+        interpreter = session.story.interpreter
+        interpreter.state = session.state
+        interpreter.choose(choice)
+        session.choices.append(choice)
+        return self._play(session_id, session)
+
+    def recording(self, session_id: str) -> "Recording":
+        """Get the choices made in a session, to replay them. See engine.replay.
+
+        Raises:
+            BadSession: If there is no such session.
+        """
+        return self._recording(self._session(session_id))
+
+    def close(self, session_id: str):
+        """End a session.
+
+        Raises:
+            BadSession: If there is no such session.
+        """
+        self._session(session_id)
+        del self.sessions[session_id]
+
+    def _recording(self, session: Session) -> "Recording":
+        from engine.replay import Recording  # Only recordings need it
+
+        return Recording(session.story.program.fingerprint, list(session.choices))
+
+    def _session(self, session_id: str) -> Session:
+        try:
+            self.sessions.move_to_end(session_id)
+        except KeyError:
+            raise BadSession(f"No session {session_id}.")
+        return self.sessions[session_id]
+
+    def _play(self, session_id: str, session: Session) -> Turn:
+        interpreter = session.story.interpreter
+        interpreter.transcript.clear()
+        turn = {"session": session_id, "story": session.story.name}
+        try:
+            status = interpreter.run(self.limit)
+        except StoryError as e:
+            status, turn["error"] = None, str(e)
+        except BaseException:
+            self.sessions.pop(session_id, None)  # Its state is lost
+            raise
+
+        turn["text"] = list(interpreter.transcript)
+        if status is Status.WAITING:
+            choices = session.story.program.choices
+            turn["choices"] = {
+                k: choices[i].text for k, i in interpreter.choices.items()
+            }
+            turn["status"] = status.value
+            session.state = interpreter.state
+            self.sessions[session_id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            return turn
+
+        # The session is over: it ended, failed or got stuck
+        if status is Status.RUNNING:
+            turn["error"] = f"No choice or ending after {self.limit} steps"
+        turn["choices"] = {}
+        turn["status"] = "ended" if status is Status.ENDED else "error"
+        if turn["status"] == "error":
+            turn["recording"] = asdict(self._recording(session))  # To reproduce it
+        self.sessions.pop(session_id, None)
+        return turn
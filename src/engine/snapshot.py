@@ -0,0 +1,164 @@
+"""
+Snapshots and undo history of interpreter state.
+
+Usage:
+    >>> interpreter = Interpreter(program, undo=100)
+    >>> saved = interpreter.snapshot().dumps()  # Save
+    >>> interpreter.restore(Snapshot.loads(saved))  # Load
+    >>> interpreter.rewind(3)  # Undo the last three choices
+
+A Snapshot is the interpreter state (position, call stack, variable values
+and pending choices) as plain numbers and strings, tagged with a format
+version and the fingerprint of the Program it was taken from. Capturing and
+restoring it copies the state and nothing else.
+
+History keeps the state before each of the most recent choices. Only the
+latest is kept whole: older ones are stored as the delta that turns the next
+state back into them, so a story with a deep call stack or many variables
+pays for what a choice changed, not for the whole state, and the oldest
+deltas are dropped once the history is full.
+"""
+
+import json
+from collections import deque
+from dataclasses import asdict, dataclass
+
+from engine.exceptions import BadSnapshot
+
+# Bump when the snapshot format changes
+SNAPSHOT_VERSION = 1
+
+State = tuple  # See Interpreter.state
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """A versioned, serializable interpreter state.
+
+    Public Methods:
+        dumps: Serialize the snapshot to JSON.
+        loads: Deserialize a snapshot from JSON.
+    """
+
+    story: str
+    pc: int
+    stack: tuple[int, ...]
+    values: tuple
+    choices: tuple[int, ...]
+    resume: int
+    status: str
+    version: int = SNAPSHOT_VERSION
+
+    @classmethod
+    def capture(cls, story: str, state: State) -> "Snapshot":
+        return cls(story, *state)
+
+    @property
+    def state(self) -> State:
+        return (
+            self.pc,
+            self.stack,
+            self.values,
+            self.choices,
+            self.resume,
+            self.status,
+        )
+
+    def dumps(self) -> str:
+        """Serialize the snapshot to JSON."""
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, data: str | bytes) -> "Snapshot":
+        """Deserialize a snapshot from JSON.
+
+        Raises:
+            BadSnapshot: If the data is not a snapshot of this version.
+        """
+        try:
+            fields = json.loads(data)
+            if fields.get("version") != SNAPSHOT_VERSION:
+                raise BadSnapshot(
+                    f"Unsupported snapshot version: {fields.get('version')}"
+                )
+            for name in ("stack", "values", "choices"):
+                fields[name] = tuple(fields[name])
+            return cls(**fields)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise BadSnapshot(f"Not a snapshot: {e}")
+
+
+class History:
+    """A bounded history of states, all but the latest stored as deltas.
+
+    Public Methods:
+        push: Record a state.
+        pop: Remove and return the states recorded last.
+        clear: Forget every state.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.top: State | None = None
+        self.deltas: deque[tuple] = deque(maxlen=max(limit - 1, 0))
+
+    def __len__(self) -> int:
+        return 0 if self.top is None else len(self.deltas) + 1
+
+    def push(self, state: State):
+        """Record a state, dropping the oldest one if the history is full."""
+        if self.top is not None and self.limit > 1:
+            self.deltas.append(delta(state, self.top))
+        self.top = state
+
+    def pop(self, n: int = 1) -> State:
+        """Remove the n latest states, returning the oldest of them.
+
+        Raises:
+            BadSnapshot: If fewer than n states are recorded.
+        """
+        if n < 1 or n > len(self):
+            raise BadSnapshot(f"Cannot rewind {n} choices, {len(self)} recorded.")
+
+        state = self.top
+        for _ in range(n - 1):
+            state = apply(state, self.deltas.pop())
+        self.top = apply(state, self.deltas.pop()) if self.deltas else None
+        return state
+
+    def clear(self):
+        """Forget every state."""
+        self.top = None
+        self.deltas.clear()
+
+
+def delta(new: State, old: State) -> tuple:
+    """The delta that turns the new state back into the old one."""
+    pc, stack, values, choices, resume, status = old
+    new_stack, new_values = new[1], new[2]
+
+    shared, common = 0, min(len(stack), len(new_stack))
+    while shared < common and stack[shared] == new_stack[shared]:
+        shared += 1
+
+    changed = tuple(
+        (slot, value)
+        for slot, (value, new_value) in enumerate(zip(values, new_values))
+        if value != new_value or type(value) is not type(new_value)
+    )
+    choices = None if choices == new[3] else choices
+    return pc, shared, stack[shared:], changed, choices, resume, status
+
+
+def apply(state: State, delta: tuple) -> State:
+    """Apply a delta to a state, returning the older state."""
+    pc, shared, stack, changed, choices, resume, status = delta
+    values = state[2]
+    if changed:
+        values = list(values)
+        for slot, value in changed:
+            values[slot] = value
+        values = tuple(values)
+    if choices is None:
+        choices = state[3]
+    return pc, state[1][:shared] + stack, values, choices, resume, status
@@ -0,0 +1,130 @@
+"""
+Startup profiling: where a cold start of the engine spends its time.
+
+Usage:
+    $ IFEngine --startup-profile story.yaml
+
+    >>> from engine.startup import profile
+    >>> print(profile(Path("story.yaml")).report())
+
+A startup profile has two parts. Imports are timed in a fresh interpreter,
+with python -X importtime, so every module counts as it would on a cold
+start, whatever this process has imported already. Initialization is timed
+in this process, one step at a time: importing the game, parsing and
+compiling the story, and building the interpreter and view.
+"""
+
+import importlib
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# The module a startup profile cold imports: the console game, and all it needs
+GAME_MODULE = "engine.game"
+
+
+@dataclass(slots=True)
+class ImportTime:
+    """One module's import time, in seconds, from python -X importtime."""
+
+    module: str
+    own: float
+    cumulative: float
+    depth: int
+
+
+@dataclass
+class StartupProfile:
+    """Import and initialization times of a cold start.
+
+    Public Methods:
+        step: Time one initialization step.
+        report: Format the profile as a table.
+    """
+
+    imports: list[ImportTime] = field(default_factory=list)
+    steps: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def step(self, name: str):
+        """Time the body of a with block as an initialization step."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = time.perf_counter() - start
+
+    def report(self, top: int = 15) -> str:
+        """Format the profile: the slowest imports, then each step."""
+        lines = []
+        if self.imports:
+            total = max(entry.cumulative for entry in self.imports)
+            lines.append(f"Cold imports: {total * 1000:.1f} ms, slowest first")
+            lines.append(f"{'own ms':>8} {'total ms':>9}  module")
+            slowest = sorted(self.imports, key=lambda e: e.cumulative, reverse=True)
+            lines += [
+                f"{entry.own * 1000:8.1f} {entry.cumulative * 1000:9.1f}  "
+                f"{'  ' * entry.depth}{entry.module}"
+                for entry in slowest[:top]
+            ]
+            lines.append("")
+
+        lines.append(f"Initialization: {sum(self.steps.values()) * 1000:.1f} ms")
+        for name, seconds in self.steps.items():
+            lines.append(f"{seconds * 1000:8.1f} ms  {name}")
+        return "\n".join(lines)
+
+
+def import_times(module: str) -> list[ImportTime]:
+    """Time a cold import of a module, and every module it imports.
+
+    Raises:
+        RuntimeError: If the module cannot be imported.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, sys.path)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Cannot import {module}: {result.stderr.strip()}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append(
+            ImportTime(name.strip(), int(own) / 1e6, int(cumulative) / 1e6, depth)
+        )
+    return times
+
+
+def profile(story: Path, module: str = GAME_MODULE) -> StartupProfile:
+    """Profile the startup of the console game on a story, without playing it."""
+    result = StartupProfile(import_times(module))
+
+    with result.step(f"import {module}"):
+        importlib.import_module(module)
+
+    from engine.compiler import compile_story
+    from engine.interpreter import Interpreter
+    from engine.parser import Parser
+    from engine.view import View
+
+    with result.step("parse story"):
+        doc = Parser().parse(story)
+    with result.step("compile story"):
+        program = compile_story(doc)
+    with result.step("create interpreter"):
+        Interpreter(program)
+    with result.step("create view"):
+        View()
+    return result
@@ -1,30 +1,57 @@
-import re
-import types
-from dataclasses import dataclass, replace
-from pathlib import Path
-from typing import Any, Optional
-
-import yaml
+import hashlib
+import sys
+from dataclasses import dataclass, field, replace
+from functools import cache, cached_property
+from typing import Any, ClassVar, Optional
 
 from engine.exceptions import BadAddress, BadNode
 
 # Base Nodes ------------------------------------------------------------------
 
+# Nodes are slotted: a story holds one instance per command, so per-instance
+# dicts add up. Anything shared by every node of a class (Expression patterns,
+# Map specs) is class data, not a field.
+
 
+@dataclass(slots=True, eq=False)
 class Node:
-    data: Any
+    """The base of every AST node.
+
+    Nodes compare equal when they are of the same class and hold equal data.
+    Node classes are declared with eq=False so they all share Node.__eq__,
+    which short-circuits on identity, and on the cached hashes of interned
+    nodes (see engine.interning).
+    """
+
+    data: Any = None
+    _hash: int | None = field(default=None, init=False, repr=False)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        mine, theirs = self._hash, other._hash
+        if mine is not None and theirs is not None and mine != theirs:
+            return False
+        return self.data is other.data or self.data == other.data
+
+    __hash__ = None  # Nodes are mutable
+
+    def __getstate__(self):
+        # Hashes are salted per process: a pickled node must not keep its own
+        return None, {"data": self.data, "_hash": None}
 
     def get_addr(self, address: list[str | int]):
         current_node = self
-
-        for index, addr in enumerate(address):
-            try:
+        index, addr = 0, None  # For the error, if address is not iterable
+        try:
+            for index, addr in enumerate(address):
                 current_node = current_node[addr]
-            except Exception as e:
-                raise BadAddress(
-                    f"Error at address position {index}"
-                    f" (value {addr}) in {address}: {e}"
-                )
+        except Exception as e:
+            raise BadAddress(
+                f"Error at address position {index} (value {addr}) in {address}: {e}"
+            )
 
         return current_node
 
@@ -37,21 +64,35 @@ NodeType = type[Node]
 NodeTypes = tuple[NodeType]
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class Expression(Node):
     data: str
-    pattern: str = ".*"
+    pattern: ClassVar[str] = ".*"
+
+    def __post_init__(self):
+        # Stories repeat the same ids, addresses and conditions many times
+        if type(self.data) is str:
+            self.data = sys.intern(self.data)
 
     def __getitem__(self, index: Any = None):
         if index is not None:
-            raise BadAddress("Terminal {self.type} accessed with index {index}")
+            raise BadAddress(f"Terminal {self.type} accessed with index {index}")
 
 
 ExpressionType = type[Expression]
 ExpressionTypes = tuple[ExpressionType]
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
+class Value(Node):
+    data: bool | int | float | str
+
+    def __getitem__(self, index: Any = None):
+        if index is not None:
+            raise BadAddress(f"Terminal {self.type} accessed with index {index}")
+
+
+@dataclass(slots=True, eq=False)
 class Sequence(Node):
     data: list
 
@@ -69,7 +110,7 @@ SequenceType = type[Sequence]
 SequenceTypes = tuple[SequenceType]
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class Tag:
     key: str
     type: Node
@@ -77,69 +118,261 @@ class Tag:
 
 
 class Spec:
+    """The tags of a Map class.
+
+    one_of names optional tags of which a map must hold at least one.
+    """
+
     tags: list[Tag]
 
-    def __init__(self, *tags):
+    def __init__(self, *tags, one_of: tuple[str, ...] = ()):
         self.tags = tags
+        self.one_of = one_of
         self.compile()
 
     def compile(self):
-        self.keys = [tag.key for tag in self.tags]
-        self.required_keys = [tag.key for tag in self.tags if not tag.optional]
-        self.optional_keys = [tag.key for tag in self.tags if not tag.optional]
+        self.keys = frozenset(tag.key for tag in self.tags)
+        self.required_keys = frozenset(tag.key for tag in self.tags if not tag.optional)
+        self.optional_keys = frozenset(tag.key for tag in self.tags if tag.optional)
+        self.one_of_keys = frozenset(self.one_of)
 
     def __iter__(self):
         return iter(self.tags)
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class Map(Node):
     data: dict
-    spec: Spec
+    spec: ClassVar[Spec] = Spec()
 
     def __getitem__(self, key: str):
         if not isinstance(key, str):
             raise BadAddress(f"Map node requires string index. Given: {key}.")
 
-        if key not in self.spec.keys:
+        spec = self.spec
+        if key not in spec.keys:
             raise BadAddress(f"{self.type} node has no {key} key.")
 
-        if key not in self.data:
-            if key in self.spec.optional_keys:
+        try:
+            return self.data[key]
+        except KeyError:
+            if key in spec.optional_keys:
                 return None
-            raise BadNode("{self.type} Map node missing a required key: {key}")
-
-        return self.data[key]
+            raise BadNode(f"{self.type} Map node missing a required key: {key}")
 
 
 MapType = type[Map]
 MapTypes = tuple[MapType]
 
 
+@dataclass(slots=True, eq=False)
+class Null(Node):
+    data: None = None
+
+
 # Syntax ----------------------------------------------------------------------
 
 
 @dataclass
 class Syntax:
+    """A set of node types, and the parse tables for them.
+
+    The story syntax, syntax_v1 in engine.nodes, ships its tables precomputed
+    from syntax.yaml. Any other syntax, and every extension of one, compiles
+    its tables from its types on first use.
+    """
+
     types: NodeTypes
+    tables: Optional["Tables"] = field(default=None, repr=False, compare=False)
 
     @property
     def expressions(self) -> ExpressionTypes:
-        return self.by_type(Expression)
+        return self.grammar.expressions
 
     @property
     def sequences(self) -> SequenceTypes:
-        return self.by_type(Sequence)
+        return self.grammar.sequences
 
     @property
     def maps(self) -> MapTypes:
-        return self.by_type(Map)
+        return self.grammar.maps
+
+    @cached_property
+    def grammar(self) -> "Grammar":
+        """The parse tables for this syntax, compiled on first use.
+
+        Syntaxes are extended by copy, so every extension compiles its own
+        grammar and a stale one is never reused.
+        """
+        return Grammar(self)
 
     def by_type(self, target_type: NodeType) -> NodeTypes:
         return [t for t in self.types if issubclass(t, target_type)]
 
     def extend(self, *new_types: NodeTypes) -> "Syntax":
-        return replace(self, types=self.types + list(new_types))
+        return replace(self, types=self.types + list(new_types), tables=None)
+
+
+# Grammar ---------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Tables:
+    """The parse tables of a Syntax. See Grammar.
+
+    Attributes:
+        expressions, sequences, maps: The node types of each kind, in syntax
+            order. The order of maps ranks them.
+        required: The required keys of each Map.
+        one_of: The keys of each Map of which a dict must hold at least one.
+        discriminators: The Maps indexed by each of their required keys. A Map
+            with no required keys is indexed by all its keys.
+        tag_types: The one node type each key is parsed as, or None when Maps
+            disagree.
+        kinds: The base node class of each node type.
+        fingerprint: A digest of every node type and spec.
+    """
+
+    expressions: ExpressionTypes
+    sequences: SequenceTypes
+    maps: MapTypes
+    required: dict[MapType, frozenset]
+    one_of: dict[MapType, frozenset]
+    discriminators: dict[str, MapTypes]
+    tag_types: dict[str, NodeType | None]
+    kinds: dict[NodeType, NodeType]
+    fingerprint: str
+
+
+KINDS = (Null, Expression, Value, Sequence, Map)
+
+
+def kind_of(node_type: NodeType) -> NodeType:
+    """Return the base node class (Expression, Value, Sequence...) of a type."""
+    return next((k for k in KINDS if issubclass(node_type, k)), Node)
+
+
+def fingerprint(signature: list) -> str:
+    return hashlib.sha256(repr(signature).encode()).hexdigest()
+
+
+def compile_tables(syntax: Syntax) -> Tables:
+    """Compile the parse tables of a syntax from its node types."""
+    maps = tuple(syntax.by_type(Map))
+    required = {node: frozenset(node.spec.required_keys) for node in maps}
+
+    discriminators: dict[str, list[MapType]] = {}
+    for node in maps:
+        for key in required[node] or node.spec.keys:
+            discriminators.setdefault(key, []).append(node)
+
+    # Sequence and Null tags parse the same whatever their declared type
+    tag_types: dict[str, dict[NodeType, NodeType]] = {}
+    for node in maps:
+        for tag in node.spec:
+            kind = kind_of(tag.type)
+            build = kind if kind in (Sequence, Null) else tag.type
+            tag_types.setdefault(tag.key, {}).setdefault(build, tag.type)
+
+    signature = []
+    for node in syntax.types:
+        entry = [node.__module__, node.__qualname__]
+        if node in required:
+            entry += [(t.key, t.type.__qualname__, t.optional) for t in node.spec]
+            entry.append(sorted(node.spec.one_of_keys))
+        elif issubclass(node, Expression):
+            entry.append(node.pattern)
+        signature.append(entry)
+
+    return Tables(
+        expressions=tuple(syntax.by_type(Expression)),
+        sequences=tuple(syntax.by_type(Sequence)),
+        maps=maps,
+        required=required,
+        one_of={node: node.spec.one_of_keys for node in maps if node.spec.one_of},
+        discriminators={k: tuple(v) for k, v in discriminators.items()},
+        tag_types={
+            key: next(iter(built.values())) if len(built) == 1 else None
+            for key, built in tag_types.items()
+        },
+        kinds={node: kind_of(node) for node in syntax.types},
+        fingerprint=fingerprint(signature),
+    )
+
+
+class Grammar:
+    """Parse tables for a Syntax, precomputed or compiled once from its types.
+
+    A dict is recognized as a Map whose required keys it holds, and at least
+    one of its one_of keys if it has any. A Map with no required keys, like the
+    root Document, only matches a dict holding nothing but its own keys. When
+    several Maps match, the one requiring the most keys wins (a Block with
+    nested blocks is not a Document), then the first in the syntax. Instead of
+    testing every Map in turn, each required key indexes the Maps that need it,
+    so only Maps sharing a key with the dict are checked.
+    The result is memoized by the dict's frozen key set, which makes repeated
+    shapes a single lookup.
+    """
+
+    def __init__(self, syntax: Syntax):
+        tables = syntax.tables or compile_tables(syntax)
+        self.types = tuple(syntax.types)
+        self.expressions = tables.expressions
+        self.sequences = tables.sequences
+        self.maps = tables.maps
+        self.rank = {node: rank for rank, node in enumerate(self.maps)}
+        self.required = tables.required
+        self.one_of = tables.one_of
+        self.discriminators = tables.discriminators
+        self.tag_types = tables.tag_types
+        self.fingerprint = tables.fingerprint
+
+        self._recognized: dict[frozenset, MapType | None] = {}
+        self._kinds: dict[NodeType | None, NodeType | None] = {
+            None: None,
+            **tables.kinds,
+        }
+
+    def recognize(self, data: dict) -> MapType | None:
+        """Find the Map class for a dict, or None if no Map matches it."""
+        keys = frozenset(data)
+        try:
+            return self._recognized[keys]
+        except KeyError:
+            node = self._recognized[keys] = self._resolve(keys)
+            return node
+
+    def accepts(self, node: MapType, data: dict) -> bool:
+        """Check that a dict holds the keys a Map class requires."""
+        return self._matches(node, data.keys())
+
+    def kind(self, node_type: NodeType | None) -> NodeType | None:
+        """Return the base node class (Expression, Value, Sequence...) of a type."""
+        try:
+            return self._kinds[node_type]
+        except KeyError:
+            kind = self._kinds[node_type] = kind_of(node_type)
+            return kind
+
+    def _matches(self, node: MapType, keys) -> bool:
+        if node in self.required:
+            required, one_of = self.required[node], self.one_of.get(node)
+        else:
+            required, one_of = node.spec.required_keys, node.spec.one_of_keys
+        if not required:
+            return keys <= node.spec.keys
+        return required <= keys and (not one_of or not one_of.isdisjoint(keys))
+
+    def _resolve(self, keys: frozenset) -> MapType | None:
+        candidates = set()
+        for key in keys:
+            candidates.update(self.discriminators.get(key, ()))
+        matches = [node for node in candidates if self._matches(node, keys)]
+        return min(
+            matches,
+            key=lambda node: (-len(self.required[node]), self.rank[node]),
+            default=None,
+        )
 
 
 # Initial syntax --------------------------------------------------------------
@@ -150,136 +383,71 @@ empty_syntax = Syntax(types=[])
 initial_syntax = Syntax(types=[Expression, Sequence])
 
 
-# Basic Syntax ----------------------------------------------------------------
+# Test Syntax -----------------------------------------------------------------
 
-
-@dataclass
-class Null(Node):
-    data: None = None
+# The story nodes are generated from syntax.yaml: see engine.nodes. These nodes
+# only exercise the syntax machinery.
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class A(Map):
-    spec: Spec = Spec(
+    spec = Spec(
         Tag("a", Expression),
     )
 
 
-@dataclass
-class If(Map):
-    spec: Spec = Spec(
-        Tag("if", Expression),
-        Tag("then", Sequence),
-        Tag("else", Sequence, optional=True),
-    )
-
-
-@dataclass
-class Doc(Map):
-    spec: Spec = Spec(
-        Tag("blocks", Sequence),
-    )
-
-
-@dataclass
-class Blocks(Sequence):
-    pass
-
-
-@dataclass
-class Block(Map):
-    spec: Spec = Spec(
-        Tag("name", Expression),
-        Tag("content", Sequence),
-    )
-
-
-@dataclass
-class Content(Sequence):
-    pass
-
-
-@dataclass
-class Goto(Map):
-    spec: Spec = Spec(
-        Tag("goto", Expression),
-    )
-
-
-@dataclass
-class GoSub(Map):
-    spec: Spec = Spec(
-        Tag("gosub", Expression),
-    )
-
-
-@dataclass
-class Choice(Map):
-    spec: Spec = Spec(
-        Tag("choice", Expression),
-        Tag("effects", Content),
-        Tag("text", Expression, optional=True),
-        # Tags ommited:
-        # Tag("shown_effects", Sequence[ShownEffect], optional=True),
-        # Tag("reusable", Expression, optional=True),
-    )
-
-
-@dataclass
-class Print(Map):
-    spec: Spec = Spec(
-        Tag("print", Expression),
-    )
-
-
-@dataclass
-class Error(Map):
-    spec: Spec = Spec(
-        Tag("error", Null),
-    )
-
-
-@dataclass
-class Return(Map):
-    spec: Spec = Spec(
-        Tag("return", Null),
-    )
+@dataclass(slots=True, eq=False)
+class Variable(Expression):
+    pattern = "^[a-zA-Z_][a-zA-Z0-9_]*$"
 
 
-@dataclass
-class Wait(Map):
-    spec: Spec = Spec(
-        Tag("wait", Null),
+@dataclass(slots=True, eq=False)
+class Text(Expression):
+    pattern = "[a-zA-Z_]*"
+
+
+# Story Syntax ----------------------------------------------------------------
+
+# The story nodes, and syntax_v1, are generated into engine.nodes. They are
+# still importable from here, as before, and so are their old names.
+
+RENAMED = {"Doc": "Document", "Goto": "GoTo"}
+
+
+@cache
+def _moved() -> dict[str, Any]:
+    import engine.nodes as nodes  # Imported late: engine.nodes imports this module
+
+    moved = {
+        node.__name__: node for node in nodes.TYPES if node.__module__ == nodes.__name__
+    }
+    moved.update((old, moved[new]) for old, new in RENAMED.items())
+    moved["syntax_v1"] = nodes.syntax_v1
+    moved["simple_syntax"] = initial_syntax.extend(
+        moved["If"],
+        A,
+        Variable,
+        moved["Document"],
+        moved["Var"],
+        moved["Block"],
+        moved["GoTo"],
+        moved["GoSub"],
+        moved["Choice"],
+        moved["Print"],
+        moved["Error"],
+        Text,
+        Null,
+        moved["Return"],
+        moved["Wait"],
+        Value,
     )
+    return moved
 
 
-@dataclass
-class Variable(Expression):
-    pattern: str = "^[a-zA-Z_][a-zA-Z0-9_]*$"
-
-
-@dataclass
-class Text(Expression):
-    pattern: str = "[a-zA-Z_]*"
-
-
-simple_syntax = initial_syntax.extend(
-    If,
-    A,
-    Variable,
-    Doc,
-    Block,
-    Goto,
-    GoSub,
-    Choice,
-    Print,
-    Error,
-    Text,
-    Null,
-    Return,
-    Wait,
-)
-syntax_v1 = simple_syntax
-
-
-node_class_dict = {"A": A, "print": Print, "wait": Wait}
+def __getattr__(name: str) -> Any:
+    if name == "__all__":  # For import *, which only sees globals otherwise
+        public = [name for name in globals() if not name.startswith("_")]
+        return public + list(_moved())
+    if name in _moved():
+        return _moved()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
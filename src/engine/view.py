@@ -1,27 +1,164 @@
 import logging
+import sys
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Protocol
 
-from pydispatch import dispatcher
+if TYPE_CHECKING:
+    import socket
 
 log = logging.getLogger("View")
 
+# pydispatch and asyncio are imported where they are used, so that importing
+# the module loads neither
+
+# The most text an Output holds before it flushes early, in characters
+DEFAULT_LIMIT = 64 * 1024
+
+MENU = "Your choices are: {}\n"
+PROMPT = "Please enter a choice or type 'exit' to quit.\n=>  "
+INVALID = "Invalid choice, try again.\n\n"
+
+
+# Sinks -----------------------------------------------------------------------
+
+
+class Sink(Protocol):
+    """Where a View's output goes: one write per flush.
+
+    A sink applies backpressure by blocking in write until it has taken the
+    text, which holds up the story until then.
+    """
+
+    def write(self, text: str): ...
+
+
+class ConsoleSink:
+    """Write to a text stream, standard output by default."""
+
+    def __init__(self, stream: IO[str] = None):
+        self.stream = stream
+
+    def write(self, text: str):
+        stream = self.stream or sys.stdout  # Looked up late, so it can be swapped
+        stream.write(text)
+        stream.flush()
+
+
+class FileSink:
+    """Append to a file, a story's transcript."""
+
+    def __init__(self, path: Path):
+        self.file = path.open("a", encoding="utf-8")
+
+    def write(self, text: str):
+        self.file.write(text)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class MemorySink:
+    """Keep every flush, for a web UI to collect or a test to check."""
 
-class View:
     def __init__(self):
+        self.flushes: list[str] = []
+
+    def write(self, text: str):
+        self.flushes.append(text)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.flushes)
+
+
+class SocketSink:
+    """Send to a connected socket, blocking while its send buffer is full."""
+
+    def __init__(self, sock: "socket.socket", encoding: str = "utf-8"):
+        self.sock = sock
+        self.encoding = encoding
+
+    def write(self, text: str):
+        self.sock.sendall(text.encode(self.encoding))
+
+
+class Output:
+    """Text collected for a sink, and written to it in one flush.
+
+    Public Methods:
+        write: Collect text, flushing early once limit characters are held.
+        flush: Write the collected text to the sink, in a single write.
+    """
+
+    def __init__(self, sink: Sink = None, limit: int = DEFAULT_LIMIT):
+        self.sink = sink or ConsoleSink()
+        self.limit = limit
+        self.buffer: list[str] = []
+        self.size = 0
+
+    def write(self, text: str):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            log.debug("Output full, flushing early.")
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            text, self.buffer, self.size = "".join(self.buffer), [], 0
+            self.sink.write(text)
+
+
+# Views -----------------------------------------------------------------------
+
+
+class View:
+    """A View for the signal game loop, prompting for choices on the console.
+
+    Story text is collected, and written to the sink in one flush when the
+    story waits for a choice, with the choices and the prompt, or exits.
+
+    Public Methods:
+        print_to_console: Collect a line of story text.
+        show_choices: Show the choices and read the player's pick.
+        flush: Write the collected text.
+    """
+
+    def __init__(self, sink: Sink = None, limit: int = DEFAULT_LIMIT):
+        """Initialize the View, and connect it to the interpreter's signals.
+
+        Args:
+            sink (Sink, optional): Where output goes. Defaults to the console.
+            limit (int, optional): The most text to hold before flushing early.
+        """
+        from pydispatch import dispatcher
+
+        self.output = Output(sink, limit)
         dispatcher.connect(self.print_to_console, signal="Put_Text")
         dispatcher.connect(self.show_choices, signal="Give_Choice")
+        dispatcher.connect(self.flush, signal="Exit_Game")
         log.debug("View initialized.")
 
     def print_to_console(self, text: str):
-        print(text)
+        self.output.write(f"{text}\n")
+
+    def flush(self):
+        self.output.flush()
 
     def show_choices(self, choices: dict[str, bool]):
+        from pydispatch import dispatcher
+
         log.debug(f"Received choices: {choices}")
+        menu = MENU.format(", ".join(choices.keys()))
+        self.output.write(menu)
         while True:
-            # Display the choices
-            print(f"Your choices are: {", ".join(choices.keys())}")
+            # Display the text, the choices and the prompt, at once
+            self.output.write(PROMPT)
+            self.output.flush()
 
             # Get the user's choice
-            choice = input("Please enter a choice or type 'exit' to quit.\n" "=>  ")
+            choice = input()
             choice = choice.lower().strip()  # Fix spaces and case
 
             log.debug(f"Received choice: {choice}")
@@ -38,4 +175,94 @@ class View:
                 return
 
             log.debug("Invalid choice, retrying.")
-            print("Invalid choice, try again.\n")
+            self.output.write(INVALID)
+            self.output.write(menu)
+
+
+# Async Views -----------------------------------------------------------------
+
+
+class InputSource(Protocol):
+    """Where an AsyncView reads the player's input from."""
+
+    async def read(self, prompt: str) -> str: ...
+
+
+class ConsoleInput:
+    """Read input from the console, in a thread so the event loop keeps running."""
+
+    async def read(self, prompt: str) -> str:
+        import asyncio
+
+        return await asyncio.to_thread(input, prompt)
+
+
+class QueueInput:
+    """Read input put on a queue, by a connection handler or a test."""
+
+    def __init__(self):
+        import asyncio
+
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+
+    def put(self, line: str):
+        self.queue.put_nowait(line)
+
+    async def read(self, prompt: str) -> str:
+        return await self.queue.get()
+
+
+class AsyncView:
+    """A View for asyncio game loops, awaiting input from an InputSource.
+
+    Like View, it collects story text and writes it to the sink in one flush
+    when the story waits for a choice, with the choices, or ends.
+
+    Public Methods:
+        put_text: Collect a line of story text.
+        show_choices: Show the choices and await the player's pick.
+        end: Show the end of the story.
+        flush: Write the collected text.
+    """
+
+    def __init__(
+        self, source: InputSource = None, sink: Sink = None, limit: int = DEFAULT_LIMIT
+    ):
+        self.source = source or ConsoleInput()
+        self.output = Output(sink, limit)
+        log.debug("Async View initialized.")
+
+    async def put_text(self, text: str):
+        self.output.write(f"{text}\n")
+
+    def flush(self):
+        self.output.flush()
+
+    async def show_choices(self, choices: dict[str, str]) -> str | None:
+        """Show the choices and await a valid one.
+
+        Returns:
+            str | None: The choice, or None if the player exits.
+        """
+        log.debug(f"Received choices: {choices}")
+        menu = MENU.format(", ".join(choices.keys()))
+        self.output.write(menu)
+        while True:
+            # Display the text and the choices at once, then prompt
+            self.output.flush()
+            choice = await self.source.read(PROMPT)
+            choice = choice.lower().strip()  # Fix spaces and case
+
+            log.debug(f"Received choice: {choice}")
+            if choice == "exit":
+                return None
+            if choice in choices:
+                return choice
+
+            log.debug("Invalid choice, retrying.")
+            self.output.write(INVALID)
+            self.output.write(menu)
+
+    async def end(self):
+        log.debug("Story ended.")
+        self.output.flush()
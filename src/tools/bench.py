@@ -0,0 +1,200 @@
+"""
+This module benchmarks the engine on generated stories, and reports JSON
+
+Usage:
+    $ python -m tools.bench --blocks 2000 --output bench.json
+    $ python -m tools.bench --blocks 500 --depth 3 --variables 10 --repeat 5
+
+Each benchmark runs `repeat` times and reports its best time, and a rate in
+the benchmark's unit per second. Log records are discarded while benchmarks
+run, so the numbers measure the engine rather than the console.
+
+Benchmarks:
+    parse: Parser.parse, in blocks per second.
+    parse_one_pass: Parser.parse with one_pass, in blocks per second.
+    dump: Parser.dump, in blocks per second.
+    get_addr: Node.get_addr on random command addresses, in lookups per second.
+    round_trip: parse(dump(doc)) == doc, in blocks per second.
+    compile: compile_story, in blocks per second.
+    interpreter: Interpreter.run over random playthroughs, in steps per second.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from contextlib import contextmanager
+from importlib import metadata
+from pathlib import Path
+from typing import Callable
+
+from engine.compiler import compile_story
+from engine.interpreter import Status
+from engine.parser import Parser
+from engine.runner import ScriptedInterpreter
+
+from tools.generate import MINIMUMS, at_least, generate, to_yaml
+
+LOOKUPS = 10_000
+PLAYTHROUGHS = 100
+
+
+def best_time(function: Callable, repeat: int) -> float:
+    """The best wall time of repeat calls to a function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def result(seconds: float, count: int, unit: str) -> dict:
+    return {"seconds": seconds, "rate": count / seconds, "unit": f"{unit}/s"}
+
+
+def addresses(doc, count: int, rng: random.Random) -> list[list]:
+    """Random addresses of commands in the top level blocks of a Doc."""
+    blocks = doc["blocks"].data
+    found = []
+    for _ in range(count):
+        index = rng.randrange(len(blocks))
+        content = blocks[index]["content"].data
+        found.append(["blocks", index, "content", rng.randrange(len(content))])
+    return found
+
+
+def playthrough(interpreter: ScriptedInterpreter, rng: random.Random) -> int:
+    """Play random choices to the end, returning the instructions run."""
+    interpreter.reset()
+    steps = 0
+    while interpreter.status is not Status.ENDED:
+        if interpreter.status is Status.WAITING:
+            interpreter.choose(rng.choice(list(interpreter.choices)))
+        interpreter.step()
+        steps += 1
+    return steps
+
+
+def replay(interpreter: ScriptedInterpreter, seed: int):
+    """Play the same playthroughs as playthrough, with Interpreter.run."""
+    rng = random.Random(seed)
+    for _ in range(PLAYTHROUGHS):
+        interpreter.reset()
+        interpreter.transcript.clear()
+        while interpreter.run() is Status.WAITING:
+            interpreter.choose(rng.choice(list(interpreter.choices)))
+
+
+def run_benchmarks(source: str, blocks: int, repeat: int, seed: int) -> dict:
+    parser, one_pass = Parser(), Parser(one_pass=True)
+    doc = parser.parse(source)
+    dumped = parser.dump(doc)
+    program = compile_story(doc)
+    rng = random.Random(seed)
+    lookups = addresses(doc, LOOKUPS, rng)
+
+    # Count the steps of the playthroughs once, then time them at full speed
+    interpreter = ScriptedInterpreter(program)
+    rng = random.Random(seed)
+    steps = sum(playthrough(interpreter, rng) for _ in range(PLAYTHROUGHS))
+
+    def get_addr():
+        for address in lookups:
+            doc.get_addr(address)
+
+    timings = {
+        "parse": (lambda: parser.parse(source), blocks, "blocks"),
+        "parse_one_pass": (lambda: one_pass.parse(source), blocks, "blocks"),
+        "dump": (lambda: parser.dump(doc), blocks, "blocks"),
+        "get_addr": (get_addr, LOOKUPS, "lookups"),
+        "round_trip": (lambda: parser.parse(dumped) == doc, blocks, "blocks"),
+        "compile": (lambda: compile_story(doc), blocks, "blocks"),
+        "interpreter": (lambda: replay(interpreter, seed), steps, "steps"),
+    }
+    results = {}
+    for name, (function, count, unit) in timings.items():
+        results[name] = result(best_time(function, repeat), count, unit)
+    results["round_trip"]["equal"] = parser.parse(dumped) == doc
+    return results
+
+
+@contextmanager
+def quiet():
+    logging.disable(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def bench(
+    blocks: int = 1000,
+    branching: int = 2,
+    depth: int = 1,
+    variables: int = 0,
+    repeat: int = 3,
+    seed: int = 0,
+) -> dict:
+    """Benchmark the engine on a generated story.
+
+    Returns:
+        dict: The environment, the story shape and the results, ready to be
+            written as JSON.
+
+    Raises:
+        ValueError: If a shape argument is less than its minimum.
+    """
+    story = generate(blocks, branching, depth, variables, seed)
+    source = to_yaml(story)
+    with quiet():
+        results = run_benchmarks(source, blocks, repeat, seed)
+
+    try:
+        version = metadata.version("IFProject")
+    except metadata.PackageNotFoundError:
+        version = None
+
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "story": {
+            "blocks": blocks,
+            "branching": branching,
+            "depth": depth,
+            "variables": variables,
+            "seed": seed,
+            "bytes": len(source.encode()),
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="bench", description=__doc__)
+    args.add_argument("--blocks", type=at_least(MINIMUMS["blocks"]), default=1000)
+    args.add_argument("--branching", type=at_least(MINIMUMS["branching"]), default=2)
+    args.add_argument("--depth", type=at_least(MINIMUMS["depth"]), default=1)
+    args.add_argument("--variables", type=at_least(MINIMUMS["variables"]), default=0)
+    args.add_argument("--repeat", type=at_least(1), default=3)
+    args.add_argument("--seed", type=int, default=0)
+    args.add_argument("--output", type=Path, help="Write the JSON report here.")
+    args = args.parse_args(argv)
+
+    report = bench(
+        args.blocks, args.branching, args.depth, args.variables, args.repeat, args.seed
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
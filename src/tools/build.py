@@ -1,8 +1,136 @@
-def main():
-    # 1 Cleanup previous build
-    # 2 Copy source files to dist directory
-    # 3 Post process items if necessary
-    pass
+"""
+This module runs the build steps of the engine
+
+Usage:
+    $ python -m tools.build
+    $ python -m tools.build --check
+    $ python -m tools.build --stories stories/ --output dist/
+
+Steps:
+    nodes: Generate engine/nodes.py from engine/syntax.yaml. See tools.codegen.
+    bundles: Compile every story (*.yaml) in the stories directory into a
+        bundle in the output directory, for the web UI to load without
+        parsing YAML. By default the bundles go to src/web_ui/stories/, where
+        pyscript.toml fetches game.story from. Unreachable blocks, unused variables and
+        dead code are stripped first. See engine.bundle and engine.analyzer.
+        Stories are parsed in parallel, one worker process per core.
+
+Bundles are only rebuilt when their story changes: the output directory
+keeps a manifest of the hash of each story's source, and of the bundle
+format and grammar it was built with.
+
+With --check, nothing is written, and the build fails if a generated file is
+out of date.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+from tools import codegen
+
+STORIES_DIR = Path("src/web_ui")
+OUTPUT_DIR = STORIES_DIR / "stories"  # Served with the web UI, see pyscript.toml
+MANIFEST = "stories.json"
+
+# Bumped when the build changes what it compiles a story into, to rebuild all
+BUILD_VERSION = 3
+
+
+def source_hash(source: bytes) -> str:
+    """Hash a story's source, with everything its bundle depends on."""
+    # Engine modules are imported when used: the nodes step must run even
+    # when engine/nodes.py is stale or broken
+    from engine.bundle import BUNDLE_VERSION
+    from engine.nodes import syntax_v1
+
+    digest = hashlib.sha256(source)
+    versions = f"{BUILD_VERSION}:{BUNDLE_VERSION}:{syntax_v1.grammar.fingerprint}"
+    digest.update(versions.encode())
+    return digest.hexdigest()
+
+
+def build_bundles(
+    stories: Path, output: Path, force: bool = False, workers: int = None
+) -> dict:
+    """Bundle every story in a directory, skipping unchanged ones.
+
+    Changed stories are parsed in parallel, by workers processes (see
+    Parser.parse_many), then stripped and compiled here.
+
+    Returns:
+        dict: What happened to each story, by name: "built", "skipped", or
+            the error that stopped it from compiling.
+    """
+    from engine.analyzer import strip
+    from engine.bundle import SUFFIX, dumps
+    from engine.compiler import compile_story
+    from engine.parser import Parser
+
+    manifest_path = output / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    results, digests = {}, {}
+    for path in sorted(stories.glob("*.yaml")):
+        name, digest = path.stem, source_hash(path.read_bytes())
+        target = output / f"{name}{SUFFIX}"
+        if not force and manifest.get(name) == digest and target.exists():
+            results[name] = "skipped"
+        else:
+            digests[path] = digest
+
+    for parsed in Parser().parse_many(digests, workers):
+        name = parsed.path.stem
+        try:
+            if parsed.error is not None:
+                raise parsed.error
+            program = compile_story(strip(parsed.node))
+        except Exception as e:
+            results[name] = f"{type(e).__name__}: {e}"
+            manifest.pop(name, None)
+            continue
+        output.mkdir(parents=True, exist_ok=True)
+        (output / f"{name}{SUFFIX}").write_bytes(dumps(program))
+        manifest[name] = digests[parsed.path]
+        results[name] = "built"
+
+    if manifest:
+        output.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return dict(sorted(results.items()))
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="build", description=__doc__)
+    args.add_argument(
+        "--check", action="store_true", help="Fail if a generated file is stale."
+    )
+    args.add_argument("--stories", type=Path, default=STORIES_DIR)
+    args.add_argument("--output", type=Path, default=OUTPUT_DIR)
+    args.add_argument(
+        "--force", action="store_true", help="Rebuild unchanged bundles too."
+    )
+    args.add_argument("--workers", type=int, help="Worker processes (default: cores)")
+    args = args.parse_args(argv)
+
+    if codegen.generate(check=args.check):
+        print(f"Up to date: {codegen.NODES_FILE}")
+    elif args.check:
+        sys.exit(f"Out of date: {codegen.NODES_FILE}. Run python -m tools.build.")
+    else:
+        print(f"Generated: {codegen.NODES_FILE}")
+    if args.check:
+        return
+
+    results = build_bundles(args.stories, args.output, args.force, args.workers)
+    for name, result in results.items():
+        print(f"{name}: {result}")
+    failed = [
+        name for name, result in results.items() if result not in ("built", "skipped")
+    ]
+    if failed:
+        sys.exit(f"Failed to bundle: {', '.join(failed)}")
 
 
 if __name__ == "__main__":
@@ -12,6 +12,7 @@ ITEMS_TO_CLEAN = dict(
     egg_info=Path().rglob("*.egg-info/"),
     log_files=Path().rglob("*.log"),
     py_caches=Path().rglob("__pycache__/"),
+    ast_cache=Path("./.ast_cache/"),
 )
 
 
@@ -0,0 +1,268 @@
+"""
+This module generates engine/nodes.py from the grammar in engine/syntax.yaml
+
+Usage:
+    $ python -m tools.build
+    $ python -m tools.build --check
+
+    >>> from tools.codegen import render, rules
+    >>> source = render(rules())
+
+The generated module holds a slotted node class for every map and list rule
+of the grammar, a tuple of the classes of every disjunct rule, and the parse
+tables of syntax_v1 as literals, so importing it and parsing with it does no
+grammar work. The tables are the ones engine.syntax.compile_tables would
+compile from the generated classes: tests check that they agree.
+
+Rules:
+    map: A Map class. Its required and optional keys become tags, and its
+        one_of keys optional tags of which a map must hold at least one.
+    list: A Sequence class.
+    disjunct: A tuple of the classes a value may be.
+    Any other type name is a terminal: see TERMINALS.
+"""
+
+from functools import cache
+from pathlib import Path
+
+import engine
+import yaml
+from engine.syntax import fingerprint
+
+ENGINE_DIR = Path(engine.__file__).parent
+GRAMMAR_FILE = ENGINE_DIR / "syntax.yaml"
+NODES_FILE = ENGINE_DIR / "nodes.py"
+
+# The base node class each terminal type is parsed as
+TERMINALS = {
+    "id": "Expression",
+    "data_type": "Expression",
+    "address": "Expression",
+    "expression": "Expression",
+    "short_text": "Expression",
+    "long_text": "Expression",
+    "FILE_PATH": "Expression",
+    "bool": "Value",
+    "uint": "Value",
+    "value": "Value",
+    "VALUE": "Value",
+    "\\null": "Null",
+}
+
+# The engine.syntax classes every story syntax holds, with their signatures
+# in Grammar.fingerprint
+BASES = {
+    "Expression": ["engine.syntax", "Expression", ".*"],
+    "Value": ["engine.syntax", "Value"],
+    "Null": ["engine.syntax", "Null"],
+    "Sequence": ["engine.syntax", "Sequence"],
+}
+
+HEADER = '''\
+# Generated by tools/build.py from engine/syntax.yaml. Do not edit.
+"""
+The story syntax: node classes and parse tables generated from syntax.yaml.
+
+Usage:
+    >>> from engine.nodes import Document, syntax_v1
+    >>> doc = Parser(syntax_v1).parse(source)
+    >>> isinstance(doc, Document)
+
+Regenerate it with `python -m tools.build` after editing syntax.yaml.
+"""
+
+from dataclasses import dataclass
+
+from engine.syntax import (
+    Expression,
+    Map,
+    Null,
+    Sequence,
+    Spec,
+    Syntax,
+    Tables,
+    Tag,
+    Value,
+)
+'''
+
+
+@cache
+def rules() -> dict[str, dict]:
+    """The grammar from engine/syntax.yaml, indexed by rule id."""
+    return yaml.safe_load(GRAMMAR_FILE.read_text())
+
+
+def render(rules: dict[str, dict]) -> str:
+    """Render the source of engine/nodes.py from the grammar rules.
+
+    Raises:
+        ValueError: If a rule has an unknown type or names an unknown rule.
+    """
+    by_type = {"map": [], "list": [], "disjunct": []}
+    for rule_id, rule in rules.items():
+        if rule.get("type") not in by_type:
+            raise ValueError(f"Rule {rule_id} has unknown type: {rule.get('type')}")
+        by_type[rule["type"]].append(rule)
+
+    # Tags of each map, in spec order: (key, type, optional)
+    tags = {
+        rule["name"]: [
+            (key, type_name(rules, ref), group != "required")
+            for group in ("required", "optional", "one_of")
+            for key, ref in rule.get(group, {}).items()
+        ]
+        for rule in by_type["map"]
+    }
+    # One blank line after the imports, as ruff's import sorting wants
+    body = [*node_classes(rules, by_type, tags), parse_tables(by_type, tags)]
+    return HEADER + "\n" + "\n\n".join(body)
+
+
+def type_name(rules: dict[str, dict], ref: str) -> str:
+    """The node class a tag or disjunct of the grammar refers to."""
+    if ref in TERMINALS:
+        return TERMINALS[ref]
+    if ref in rules and rules[ref].get("type") in ("map", "list"):
+        return rules[ref]["name"]
+    raise ValueError(f"Unknown node type: {ref}")
+
+
+def node_classes(rules: dict, by_type: dict, tags: dict) -> list[str]:
+    out = [section("Sequences")]
+    for rule in by_type["list"]:
+        item = rule["list_of"]
+        if item not in rules:
+            raise ValueError(f"Rule {rule['name']} lists unknown rule: {item}")
+        out.append(
+            "@dataclass(slots=True, eq=False)\n"
+            f"class {rule['name']}(Sequence):\n"
+            f'    """A list of {rules[item]["name"]}."""\n'
+        )
+
+    out.append(section("Maps"))
+    for rule in by_type["map"]:
+        options = "slots=True, eq=False"
+        if rule.get("root"):
+            options += ", weakref_slot=True"
+        lines = [f"@dataclass({options})", f"class {rule['name']}(Map):"]
+        lines.append("    spec = Spec(")
+        for key, name, optional in tags[rule["name"]]:
+            flag = ", optional=True" if optional else ""
+            lines.append(f'        Tag("{key}", {name}{flag}),')
+        if rule.get("one_of"):
+            prefix = "        one_of="
+            lines.append(f"{prefix}{literal(rule['one_of'], prefix, quote=True)},")
+        out.append("\n".join([*lines, "    )", ""]))
+
+    out.append(section("Disjuncts"))
+    disjuncts = []
+    for rule in by_type["disjunct"]:
+        classes = [type_name(rules, ref) for ref in rule["classes"]]
+        disjuncts.append(f"{rule['name']} = {literal(classes, rule['name'] + ' = ')}\n")
+    out.append("\n".join(disjuncts))
+    return out
+
+
+def parse_tables(by_type: dict, tags: dict) -> str:
+    """The literal Tables of the grammar: see engine.syntax.compile_tables."""
+    maps = list(tags)
+    sequences = [rule["name"] for rule in by_type["list"]]
+    types = [*BASES, *sequences, *maps]
+    kinds = {name: name for name in BASES}
+    kinds |= {name: "Sequence" for name in sequences}
+    kinds |= {name: "Map" for name in maps}
+
+    required = {name: sorted(k for k, _, opt in tags[name] if not opt) for name in maps}
+    one_of = {r["name"]: sorted(r["one_of"]) for r in by_type["map"] if r.get("one_of")}
+
+    discriminators: dict[str, list[str]] = {}
+    for name in maps:
+        for key in required[name] or [key for key, _, _ in tags[name]]:
+            discriminators.setdefault(key, []).append(name)
+
+    tag_types: dict[str, dict[str, str]] = {}
+    for name in maps:
+        for key, ref, _ in tags[name]:
+            build = kinds[ref] if kinds[ref] in ("Sequence", "Null") else ref
+            tag_types.setdefault(key, {}).setdefault(build, ref)
+
+    signature = [BASES[name] for name in BASES]
+    signature += [["engine.nodes", name] for name in sequences]
+    signature += [
+        ["engine.nodes", name, *tags[name], sorted(one_of.get(name, []))]
+        for name in maps
+    ]
+
+    def frozen(name: str, keys: list[str]) -> str:
+        if not keys:
+            return "frozenset()"
+        prefix = f"        {name}: frozenset("
+        return f"frozenset({literal(keys, prefix, quote=True, braces='{}')})"
+
+    def table(name: str, entries: dict[str, str]) -> list[str]:
+        lines = [f"        {k}: {v}," for k, v in entries.items()]
+        return [f"    {name}={{", *lines, "    },"]
+
+    lines = [section("Parse tables"), "TYPES = [", *(f"    {t}," for t in types)]
+    lines += ["]", "", "TABLES = Tables("]
+    lines.append("    expressions=(Expression,),")
+    lines.append(
+        f"    sequences={literal(['Sequence', *sequences], '    sequences=')},"
+    )
+    lines.append(f"    maps={literal(maps, '    maps=')},")
+    lines += table("required", {name: frozen(name, required[name]) for name in maps})
+    lines += table(
+        "one_of", {name: frozen(name, keys) for name, keys in one_of.items()}
+    )
+    lines += table(
+        "discriminators",
+        {
+            f'"{key}"': literal(discriminators[key], f'        "{key}": ')
+            for key in sorted(discriminators)
+        },
+    )
+    lines += table(
+        "tag_types",
+        {
+            f'"{key}"': next(iter(built.values())) if len(built) == 1 else "None"
+            for key, built in sorted(tag_types.items())
+        },
+    )
+    lines += table("kinds", {name: kinds[name] for name in types})
+    lines.append(f'    fingerprint="{fingerprint(signature)}",')
+    lines += [")", "", "syntax_v1 = Syntax(TYPES, TABLES)", ""]
+    return "\n".join(lines)
+
+
+def section(name: str) -> str:
+    """A section separator comment, padded like the rest of the engine."""
+    return f"# {name} ".ljust(79, "-") + "\n"
+
+
+def literal(items: list[str], prefix: str, quote=False, braces="()") -> str:
+    """Format a tuple or set literal that follows prefix on a line, the way
+    ruff format would: on that line if it fits, else one item per line."""
+    items = [f'"{item}"' if quote else item for item in items]
+    opening, closing = braces
+    if len(items) == 1 and braces == "()":
+        return f"({items[0]},)"
+    flat = f"{opening}{', '.join(items)}{closing}"
+    if len(prefix) + len(flat) + 2 <= 88:
+        return flat
+    indent = " " * (len(prefix) - len(prefix.lstrip()))
+    lines = [opening, *(f"{indent}    {item}," for item in items), indent + closing]
+    return "\n".join(lines)
+
+
+def generate(path: Path = NODES_FILE, check: bool = False) -> bool:
+    """Write the generated module, or with check, only compare it.
+
+    Returns:
+        bool: Whether the module on disk was up to date.
+    """
+    source = render(rules())
+    current = path.read_text() if path.exists() else None
+    if current != source and not check:
+        path.write_text(source)
+    return current == source
@@ -0,0 +1,196 @@
+"""
+This module generates synthetic stories at any scale, for benchmarks and tests
+
+Usage:
+    $ python -m tools.generate --blocks 5000 --branching 3 --depth 2 > big.yaml
+
+    >>> from tools.generate import generate, to_yaml
+    >>> story = generate(blocks=1000, branching=2, depth=3, variables=8)
+    >>> to_yaml(story)
+
+Stories are built from the grammar in engine/syntax.yaml, using the commands
+the engine's syntax implements, and the keys of every map are checked against
+its spec in the grammar. (one_of keys are not exclusive: the engine lets a
+block have both content and nested blocks.)
+
+Generated stories are valid: every address resolves, every condition names a
+declared variable, and every playthrough ends, because choices only jump
+forward.
+
+Shape:
+    blocks: The number of blocks, nested ones included.
+    branching: The number of choices per block.
+    depth: How deep blocks nest. Each top level block heads a chain of
+        depth - 1 nested blocks.
+    variables: The number of declared variables, tested by if commands.
+
+Every story has at least one block, and blocks nest at least one deep.
+"""
+
+import argparse
+import random
+import sys
+from functools import cache
+from pathlib import Path
+from typing import Callable
+
+import engine
+import yaml
+
+GRAMMAR_FILE = Path(engine.__file__).parent / "syntax.yaml"
+
+DATA_TYPES = {"bool": [True, False], "number": [0, 1, 2, 3], "string": ["a", "b"]}
+
+# The least value of each shape argument
+MINIMUMS = {"blocks": 1, "branching": 0, "depth": 1, "variables": 0}
+
+
+@cache
+def grammar() -> dict[str, dict]:
+    """The grammar from engine/syntax.yaml, indexed by node name."""
+    rules = yaml.safe_load(GRAMMAR_FILE.read_text())
+    return {rule["name"]: rule for rule in rules.values()}
+
+
+def at_least(least: int) -> Callable[[str], int]:
+    """An argparse type for ints of at least some value."""
+
+    def integer(text: str) -> int:
+        value = int(text)
+        if value < least:
+            raise argparse.ArgumentTypeError(f"must be at least {least}, not {value}")
+        return value
+
+    return integer
+
+
+def node(name: str, fields: dict) -> dict:
+    """Build a map node, checking its keys against the grammar.
+
+    Raises:
+        ValueError: If the keys do not match the node's spec.
+    """
+    rule = grammar()[name]
+    required = set(rule.get("required", {}))
+    allowed = required | set(rule.get("optional", {})) | set(rule.get("one_of", {}))
+    keys = set(fields)
+    if not required <= keys <= allowed:
+        raise ValueError(f"{name} takes {sorted(allowed)}, not {sorted(keys)}")
+    return fields
+
+
+def generate(
+    blocks: int = 100,
+    branching: int = 2,
+    depth: int = 1,
+    variables: int = 0,
+    seed: int = 0,
+) -> dict:
+    """Generate a story.
+
+    Args:
+        blocks (int, optional): The number of blocks.
+        branching (int, optional): The number of choices per block.
+        depth (int, optional): How deep blocks nest.
+        variables (int, optional): The number of declared variables.
+        seed (int, optional): The random seed. The same arguments always
+            generate the same story.
+
+    Returns:
+        dict: The story, as YAML data.
+
+    Raises:
+        ValueError: If a shape argument is less than its minimum.
+    """
+    shape = dict(blocks=blocks, branching=branching, depth=depth, variables=variables)
+    for name, value in shape.items():
+        if value < MINIMUMS[name]:
+            raise ValueError(f"{name} must be at least {MINIMUMS[name]}, not {value}")
+
+    rng = random.Random(seed)
+    names = [f"var_{i}" for i in range(variables)]
+    types = [rng.choice(sorted(DATA_TYPES)) for _ in names]
+
+    # Block paths, in story order: each chain is a top level block and its
+    # nested descendants
+    paths = []
+    for i in range(blocks):
+        chain, level = divmod(i, depth)
+        parent = paths[-1] if level else ""
+        paths.append(f"{parent}/block_{chain}" + (f"_{level}" if level else ""))
+
+    contents = [
+        block_content(rng, i, paths, branching, names, types) for i in range(blocks)
+    ]
+
+    # Assemble the nested blocks, innermost first
+    top = []
+    for i in reversed(range(blocks)):
+        name = paths[i].rpartition("/")[2]
+        fields = {"name": name, "content": contents[i]}
+        if i == 0:
+            fields["start"] = True
+        if i + 1 < blocks and paths[i + 1].startswith(paths[i] + "/"):
+            fields["blocks"] = [top.pop()]
+        top.append(node("Block", fields))
+
+    story = {"blocks": top[::-1]}
+    if names:
+        story = {
+            "vars": [
+                node("Var", {"name": name, "type": t, "value": DATA_TYPES[t][0]})
+                for name, t in zip(names, types)
+            ],
+            **story,
+        }
+    return node("Document", story)
+
+
+def block_content(rng, i, paths, branching, names, types) -> list[dict]:
+    content = [node("Print", {"print": f"You are in {paths[i]}."})]
+
+    if names:
+        slot = rng.randrange(len(names))
+        condition = f"{names[slot]} == {DATA_TYPES[types[slot]][0]!r}"
+        content.append(
+            node(
+                "If",
+                {
+                    "if": condition,
+                    "then": [node("Print", {"print": "The condition holds."})],
+                    "else": [node("Error", {"error": None})],
+                },
+            )
+        )
+
+    # Choices jump forward, so every playthrough ends
+    targets = [i + step for step in range(1, branching + 1) if i + step < len(paths)]
+    for n, target in enumerate(targets):
+        effects = [
+            node("Print", {"print": f"You chose {n}."}),
+            node("GoTo", {"goto": paths[target]}),
+        ]
+        content.append(node("Choice", {"choice": f"choice_{n}", "effects": effects}))
+    return content
+
+
+def to_yaml(story: dict) -> str:
+    """Format a generated story as YAML."""
+    return yaml.safe_dump(story, sort_keys=False, width=120)
+
+
+def main(argv: list[str] = None):
+    args = argparse.ArgumentParser(prog="generate", description=__doc__)
+    args.add_argument("--blocks", type=at_least(MINIMUMS["blocks"]), default=100)
+    args.add_argument("--branching", type=at_least(MINIMUMS["branching"]), default=2)
+    args.add_argument("--depth", type=at_least(MINIMUMS["depth"]), default=1)
+    args.add_argument("--variables", type=at_least(MINIMUMS["variables"]), default=0)
+    args.add_argument("--seed", type=int, default=0)
+    args = args.parse_args(argv)
+
+    story = generate(args.blocks, args.branching, args.depth, args.variables, args.seed)
+    sys.stdout.write(to_yaml(story))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,18 @@
 from pathlib import Path
 
-from engine.interpreter import Visitor
-from engine.parser import parser
+from engine.bundle import load
+from engine.interpreter import Interpreter
 
-
-class Renderer: ...
+# Built by tools/build.py into stories/, and fetched here by pyscript.toml: the
+# story, compiled, so the browser never parses YAML
+GAME_BUNDLE = Path("game.story")
 
 
 def main():
-    game_yaml = Path("game.yaml")
-    ast = parser(game_yaml)
-    renderer = Renderer()
-    engine = Visitor(ast, renderer)
+    program = load(GAME_BUNDLE)
+    engine = Interpreter(program)
 
-    engine.start()
+    engine.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+from pathlib import Path
+
+from engine.analyzer import DeadCode, analyze, main, strip
+from engine.compiler import compile_story
+from engine.parser import dump, parse
+from engine.runner import play
+
+from tests.cases import Case, cases
+
+STORIES = Path("tests/stories")
+
+STORY = """
+vars:
+  - name: gold
+    type: number
+  - name: unused
+    type: bool
+  - name: only_in_dead_block
+    type: bool
+blocks:
+  - name: start
+    start: true
+    content:
+      - if: gold > 1
+        then:
+          - goto: shop
+        else:
+          - return:
+      - print: Never printed.
+      - goto: lost
+  - name: shop
+    content:
+      - choice: buy
+        effects:
+          - gosub: /attic/chest
+          - goto: /start
+          - print: Never printed either.
+  - name: attic
+    content:
+      - if: only_in_dead_block
+        then:
+          - print: Dusty.
+    blocks:
+      - name: chest
+        content:
+          - print: Gold!
+  - name: lost
+    content:
+      - print: Only reached from dead code.
+"""
+
+
+def test_analyze():
+    """Given a story with dead blocks, variables and code,
+    When it is analyzed,
+    Then each is found, and jumps in dead code do not count"""
+    result = analyze(parse(STORY))
+    assert result.entry == "/start"
+    assert result.graph["/start"] == {"/shop"}
+    assert result.graph["/shop"] == {"/attic/chest", "/start"}
+    assert result.unreachable == ["/attic", "/lost"]
+    assert result.unused_variables == ["unused", "only_in_dead_block"]
+    assert result.dead_code == [
+        DeadCode("/start", "if: gold > 1", 2),
+        DeadCode("/shop", "goto: /start", 1),
+    ]
+
+
+def test_strip():
+    """Given a story with dead nodes,
+    When it is stripped,
+    Then only live nodes are left, and it plays the same"""
+    doc = parse(STORY)
+    live = strip(doc)
+
+    assert strip(live) == live
+    result = analyze(live)
+    assert result.unreachable == ["/attic"]  # Kept for the block nested in it
+    assert live["blocks"].data[2]["content"] is None
+    assert [var["name"].data for var in live["vars"].data] == ["gold"]
+    assert result.dead_code == []
+    assert parse(dump(live)) == live
+    assert dump(doc) != dump(live)
+
+
+@cases(*(Case(path.stem, path) for path in sorted(STORIES.glob("*.yaml"))))
+def test_strip_plays_the_same(case):
+    doc = parse(case.val)
+    script = ["continue"] * 3
+    assert play(compile_story(strip(doc)), script) == play(compile_story(doc), script)
+
+
+def test_main(tmp_path, capsys):
+    (tmp_path / "story.yaml").write_text(STORY)
+    main([str(tmp_path / "story.yaml"), "--strip", str(tmp_path / "live.yaml")])
+
+    output = capsys.readouterr().out
+    assert "unreachable block: /lost" in output
+    assert "unused variable: unused" in output
+    assert "dead code: /shop: 1 after goto: /start" in output
+    assert "lost" not in (tmp_path / "live.yaml").read_text()
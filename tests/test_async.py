@@ -0,0 +1,97 @@
+import asyncio
+from pathlib import Path
+
+from engine.compiler import compile_story
+from engine.game import AsyncGame
+from engine.interpreter import AsyncInterpreter, Status
+from engine.parser import parse
+from engine.view import AsyncView, MemorySink, QueueInput
+
+STORIES = Path("tests/stories")
+
+LOOP = """
+vars:
+  - name: forever
+    type: bool
+    value: true
+blocks:
+  - name: start
+    content:
+      - if: forever
+        then:
+          - goto: start
+"""
+
+
+class RecordingView(AsyncView):
+    """An AsyncView that records what it shows."""
+
+    def __init__(self, *choices: str):
+        super().__init__(QueueInput(), MemorySink())
+        for choice in choices:
+            self.source.put(choice)
+        self.ended = False
+
+    @property
+    def lines(self) -> list[str]:
+        return [line.strip() for line in self.output.sink.text.splitlines() if line]
+
+    async def end(self):
+        await super().end()
+        self.ended = True
+
+
+def test_game_plays_to_the_end():
+    view = RecordingView("nope", "good")
+    game = AsyncGame(STORIES / "simple_choice_goto.yaml", view)
+
+    assert asyncio.run(game.run()) is Status.ENDED
+    assert view.ended
+    assert "Invalid choice, try again." in view.lines
+    assert view.lines[-1] == "The program should end now. Goodbye!"
+
+
+def test_exit():
+    view = RecordingView("exit")
+    game = AsyncGame(STORIES / "simple_choice.yaml", view)
+
+    assert asyncio.run(game.run()) is Status.WAITING
+    assert not view.ended
+
+
+def test_one_loop_runs_many_games():
+    program = compile_story(parse(STORIES / "simple_choice.yaml"))
+    views = [RecordingView() for _ in range(3)]
+
+    async def play():
+        games = [asyncio.create_task(AsyncGame(program, view).run()) for view in views]
+        await asyncio.sleep(0.01)
+        # Every game is waiting for input at once
+        assert not any(game.done() for game in games)
+        for view in views:
+            view.source.put("continue")
+        return await asyncio.gather(*games)
+
+    assert asyncio.run(play()) == [Status.ENDED] * 3
+    assert all(view.lines[-1] == "You made a choice." for view in views)
+
+
+def test_advance_yields_to_the_loop():
+    interpreter = AsyncInterpreter(compile_story(parse(LOOP)))
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(interpreter.pc)
+            await asyncio.sleep(0)
+
+    async def race():
+        ticker = asyncio.create_task(tick())
+        try:
+            await asyncio.wait_for(interpreter.advance(), 0.05)
+        except TimeoutError:
+            pass
+        ticker.cancel()
+
+    asyncio.run(race())
+    assert len(ticks) > 1
@@ -0,0 +1,78 @@
+import json
+import zlib
+from pathlib import Path
+
+import pytest
+from engine.bundle import SUFFIX, dumps, load, loads
+from engine.compiler import compile_story
+from engine.exceptions import BadBundle
+from engine.parser import parse
+from engine.runner import play
+from tools.build import MANIFEST, OUTPUT_DIR, STORIES_DIR, build_bundles
+
+from tests.cases import Case, cases
+
+STORIES = Path("tests/stories")
+
+
+@cases(*(Case(path.stem, path) for path in sorted(STORIES.glob("*.yaml"))))
+def test_round_trip(case):
+    """Given a compiled story,
+    When it is bundled and loaded back,
+    Then the Program is the same, and plays the same"""
+    program = compile_story(parse(case.val))
+    loaded = loads(dumps(program))
+    assert loaded == program
+    assert loaded.fingerprint == program.fingerprint
+    assert (
+        play(loaded, ["continue"]).transcript == play(program, ["continue"]).transcript
+    )
+
+
+@cases(
+    Case("Not compressed", b"{}"),
+    Case("Not JSON", zlib.compress(b"not json")),
+    Case("Not a map", zlib.compress(b"[]")),
+    Case("Old version", zlib.compress(json.dumps({"version": 0}).encode())),
+    Case("Missing fields", zlib.compress(json.dumps({"version": 1}).encode())),
+)
+def test_bad_bundle(case):
+    with pytest.raises(BadBundle):
+        loads(case.val)
+
+
+def test_build_skips_unchanged_stories(tmp_path):
+    stories, output = tmp_path / "stories", tmp_path / "dist"
+    stories.mkdir()
+    for name in ("hello_world", "simple_choice"):
+        (stories / f"{name}.yaml").write_bytes((STORIES / f"{name}.yaml").read_bytes())
+
+    assert set(build_bundles(stories, output).values()) == {"built"}
+    assert set(build_bundles(stories, output).values()) == {"skipped"}
+
+    (stories / "hello_world.yaml").write_text("blocks: []\n")
+    assert build_bundles(stories, output) == {
+        "hello_world": "built",
+        "simple_choice": "skipped",
+    }
+    assert load(output / f"simple_choice{SUFFIX}").choices
+    assert set(json.loads((output / MANIFEST).read_text())) == {
+        "hello_world",
+        "simple_choice",
+    }
+
+
+def test_build_reports_bad_stories(tmp_path):
+    (tmp_path / "bad.yaml").write_text("blocks:\n  - name: x\n    content: [goto: y]\n")
+    result = build_bundles(tmp_path, tmp_path / "dist")
+    assert result["bad"].startswith("BadAddress")
+    assert not (tmp_path / "dist" / f"bad{SUFFIX}").exists()
+
+
+def test_web_ui_fetches_the_built_bundle():
+    """Given the default build output,
+    When the web UI starts,
+    Then pyscript fetches the game bundle from where the build writes it"""
+    config = (STORIES_DIR / "pyscript.toml").read_text()
+    url = (OUTPUT_DIR / f"game{SUFFIX}").relative_to(STORIES_DIR).as_posix()
+    assert f'"{url}" = "game{SUFFIX}"' in config
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+from engine.cache import ASTCache
+from engine.nodes import Print, syntax_v1
+from engine.parser import Parser
+from engine.syntax import A, Expression, initial_syntax
+
+STORY = Path("tests/stories/simple_gosub.yaml")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ASTCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def cached_parser(cache):
+    return Parser(cache=cache)
+
+
+def test_store_and_load(cache):
+    node = A({"a": Expression("action")})
+    key = cache.key("a: action", syntax_v1)
+    cache.store(key, node)
+
+    assert cache.load(key) == node
+
+
+def test_miss(cache):
+    assert cache.load(cache.key("a: action", syntax_v1)) is None
+
+
+def test_key_depends_on_source_and_syntax(cache):
+    key = cache.key("print: hi", syntax_v1)
+    assert key != cache.key("print: bye", syntax_v1)
+    assert key != cache.key("print: hi", initial_syntax.extend(Print))
+
+
+def test_parse_hits_cache(cached_parser, monkeypatch):
+    """Given a story parsed once with a cache,
+    When it is parsed again,
+    Then the AST comes from the cache without reparsing"""
+    first = cached_parser.parse(STORY)
+
+    def fail(*args):
+        raise AssertionError("Story was reparsed")
+
+    monkeypatch.setattr(cached_parser, "_load", fail)
+    assert cached_parser.parse(STORY) == first
+
+
+def test_corrupt_entry_is_a_miss(cache, cached_parser):
+    source = STORY.read_text()
+    key = cache.key(source, syntax_v1)
+    cached_parser.parse(source)
+    cache._path(key).write_bytes(b"not a pickle")
+
+    assert cache.load(key) is None
+    assert not cache._path(key).exists()
+    assert cached_parser.parse(source) == Parser().parse(source)
+
+
+def test_eviction(tmp_path):
+    cache = ASTCache(tmp_path, max_bytes=0)
+    cache.store("key", A({"a": Expression("action")}))
+
+    assert cache.load("key") is None
+
+
+def test_clear(cache, cached_parser):
+    cached_parser.parse(STORY)
+    cache.clear()
+
+    assert not cache._entries()
@@ -0,0 +1,205 @@
+from pathlib import Path
+
+import pytest
+from engine.chapters import StoryIndex, open_story
+from engine.compiler import compile_story
+from engine.exceptions import BadAddress, NotRecognized
+from engine.interpreter import Interpreter
+from engine.parser import parse
+from engine.runner import play
+
+from tests.cases import Case, cases
+
+STORIES = Path("tests/stories")
+
+# A story in two files, with nested blocks, jumps between the files, and text
+# that is not ASCII, so byte offsets and char offsets differ
+PROLOGUE = """
+vars:
+  - name: gold
+    type: number
+    value: 2
+blocks:
+  - name: café
+    start: true
+    content:
+      - print: Déjà vu.
+      - gosub: /market
+      - goto: inner
+    blocks:
+      - name: inner
+        content:
+          - if: gold > 1
+            then:
+              - print: Rich.
+          - choice: leave
+            effects:
+              - goto: road
+  - {name: road, content: [{print: On the road.}, {goto: /market/stall}]}
+"""
+MARKET = """
+blocks:
+  - name: market
+    content:
+      - print: Bonjour.
+    blocks:
+      - name: stall
+        content:
+          - print: Ça va?
+          - goto: /café/inner
+"""
+
+
+WHOLE = PROLOGUE + MARKET.replace("blocks:\n", "", 1)
+SCRIPT = ["leave"] * 3
+
+
+@pytest.fixture
+def story(tmp_path) -> Path:
+    story = tmp_path / "story"
+    story.mkdir()
+    (story / "1_prologue.yaml").write_text(PROLOGUE, encoding="utf-8")
+    (story / "2_market.yaml").write_text(MARKET, encoding="utf-8")
+    return story
+
+
+@cases(*(Case(path.stem, path) for path in sorted(STORIES.glob("*.yaml"))))
+def test_lazy_plays_the_same(case):
+    script = ["continue"] * 3
+    expected = play(compile_story(parse(case.val)), script)
+    assert play(open_story(case.val), script) == expected
+
+
+def test_index(story):
+    index = StoryIndex.scan(sorted(story.glob("*.yaml")))
+    assert list(index.blocks) == [
+        "/café",
+        "/café/inner",
+        "/road",
+        "/market",
+        "/market/stall",
+    ]
+    assert [chapter.path for chapter in index.chapters] == ["/café", "/road", "/market"]
+    assert index.starts == ["/café"]
+    assert "{goto: /market/stall}]}" in index.source(1)
+
+
+def test_chapters_load_when_reached(story):
+    """Given a story in two files,
+    When it is opened and played to its first choice,
+    Then only the chapters it reached are loaded"""
+    program = open_story(story)
+    assert program.variables == ["gold"]
+    assert not program.loaded
+
+    assert play(program, []).transcript == ["Déjà vu.", "Bonjour.", "Rich."]
+    assert list(program.loaded) == [0, 2]
+    assert play(program, SCRIPT) == play(compile_story(parse(WHOLE)), SCRIPT)
+
+
+def test_budget_evicts_chapters(story):
+    """Given a budget that holds one chapter,
+    When the story returns to, and chooses into, evicted chapters,
+    Then they are loaded again, and the story plays the same"""
+    program = open_story(story, budget=1)
+    assert play(program, SCRIPT) == play(compile_story(parse(WHOLE)), SCRIPT)
+    assert len(program.loaded) == 1
+
+
+HUB = """
+blocks:
+  - name: hub
+    start: true
+    content:
+      - print: Hub.
+      - choice: east
+        effects: [{goto: /east}]
+      - choice: west
+        effects: [{goto: /west}]
+  - {name: east, content: [{print: East.}, {goto: /hub}]}
+  - {name: west, content: [{print: West.}, {goto: /hub}]}
+"""
+
+
+def test_budget_keeps_the_most_recently_used_chapters(tmp_path):
+    """Given a budget that holds the hub and one other chapter,
+    When the story goes back to the hub between chapters,
+    Then the hub stays loaded, and the others are evicted"""
+    (tmp_path / "hub.yaml").write_text(HUB, encoding="utf-8")
+    sizes = [c.end - c.start for c in StoryIndex.scan([tmp_path / "hub.yaml"]).chapters]
+    program = open_story(tmp_path, budget=sizes[0] + max(sizes[1:]))
+    interpreter = Interpreter(program)
+    interpreter.run()
+    for choice, chapter in [("east", 1), ("west", 2), ("east", 1)]:
+        interpreter.choose(choice)
+        interpreter.run()
+        assert list(program.loaded) == [chapter, 0]
+
+
+ALIASES = [
+    Case(
+        "Across chapters",
+        "blocks:\n"
+        "  - {name: a, start: true, content: &shared [{print: Hi.}]}\n"
+        "  - {name: b, content: *shared}\n",
+    ),
+    Case(
+        "Nested block",
+        "blocks:\n"
+        "  - name: a\n"
+        "    start: true\n"
+        "    content:\n"
+        "      - &twice {choice: one, effects: [{choice: two, effects: []}]}\n"
+        "      - *twice\n",
+    ),
+]
+
+
+@cases(*ALIASES)
+def test_aliases_are_refused(case, tmp_path):
+    """Given a story with a YAML alias,
+    When it is opened lazily,
+    Then it is refused, since its chapters could not be parsed or sized alone"""
+    (tmp_path / "story.yaml").write_text(case.val, encoding="utf-8")
+    with pytest.raises(NotRecognized, match="alias"):
+        open_story(tmp_path)
+
+
+def test_snapshots_do_not_depend_on_load_order(story):
+    program = open_story(story)
+    program.load(1)  # Out of story order
+    first = Interpreter(program)
+    first.run()
+
+    second = Interpreter(open_story(story, budget=1))
+    second.restore(first.snapshot())
+    for interpreter in (first, second):
+        interpreter.choose("leave")
+        interpreter.run()
+    assert second.state == first.state
+
+
+def test_saved_index_is_reused(story, tmp_path, monkeypatch):
+    index = tmp_path / "story.index"
+    open_story(story, index=index)
+    assert index.exists()
+
+    def scan(files):
+        raise AssertionError("The story was scanned again.")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(StoryIndex, "scan", scan)
+        open_story(story, index=index)
+
+    (story / "2_market.yaml").write_text(MARKET + "  - {name: more}\n")
+    assert "/more" in open_story(story, index=index).index.blocks
+
+
+@cases(
+    Case("Unresolved", ("goto: inner", "goto: lost"), "No block at address lost"),
+    Case("Duplicate", ("name: road", "name: market"), "Duplicate block address"),
+)
+def test_bad_addresses_are_reported_on_open(case, story):
+    (story / "1_prologue.yaml").write_text(PROLOGUE.replace(*case.val))
+    with pytest.raises(BadAddress, match=case.expects):
+        open_story(story)
@@ -0,0 +1,41 @@
+import pytest
+from engine.nodes import Case as CaseNode
+from engine.nodes import Modify, Switch
+from engine.parser import parse
+from tools import build
+from tools.codegen import NODES_FILE, render, rules
+
+from tests.cases import Case, cases
+
+
+def test_nodes_module_is_up_to_date():
+    """Given the grammar in syntax.yaml,
+    When engine/nodes.py is generated from it,
+    Then the module on disk matches"""
+    assert render(rules()) == NODES_FILE.read_text()
+
+
+def test_build_check_passes():
+    build.main(["--check"])
+
+
+@cases(
+    Case("Unknown rule type", {"X": {"name": "X", "type": "tree"}}),
+    Case(
+        "Unknown tag type", {"X": {"name": "X", "type": "map", "required": {"x": "Y"}}}
+    ),
+    Case("Unknown list item", {"X": {"name": "X", "type": "list", "list_of": "Y"}}),
+)
+def test_bad_grammar(case):
+    with pytest.raises(ValueError):
+        render(case.val)
+
+
+def test_documented_commands_parse():
+    """Given commands the compiler does not support yet,
+    When they are parsed,
+    Then they match the documented grammar"""
+    node = parse("switch: x\ncases:\n- case: 1\n  then:\n  - modify: x\n    add: gold")
+    assert isinstance(node, Switch)
+    assert isinstance(node["cases"][0], CaseNode)
+    assert isinstance(node["cases"][0]["then"][0], Modify)
@@ -0,0 +1,106 @@
+import pytest
+from engine.compiler import Op, compile_story
+from engine.exceptions import BadAddress, BadNode
+from engine.interpreter import Status
+from engine.parser import parse
+from engine.runner import SilentInterpreter
+
+STORY = """
+vars:
+  - name: ready
+    type: bool
+blocks:
+  - name: intro
+    content:
+      - print: hello
+  - name: start
+    start: true
+    content:
+      - if: ready
+        then:
+          - gosub: /intro
+        else:
+          - goto: /intro
+      - choice: go
+        effects:
+          - print: going
+      - wait:
+"""
+
+
+@pytest.fixture
+def program():
+    return compile_story(parse(STORY))
+
+
+def test_layout(program):
+    assert program.code == [
+        # /intro
+        (Op.PRINT, "hello"),
+        (Op.WAIT, 1),
+        (Op.RET, True),
+        # /start
+        (Op.BRANCH, (0, 6)),
+        (Op.CALL, 0),
+        (Op.JUMP, 7),
+        (Op.GOTO, 0),
+        (Op.CHOICE, 0),
+        (Op.WAIT, 9),
+        (Op.WAIT, 9),
+        (Op.RET, True),
+        # go effects
+        (Op.PRINT, "going"),
+        (Op.RET, False),
+    ]
+
+
+def test_tables(program):
+    assert program.entry == 3
+    assert program.blocks == {"/intro": 0, "/start": 3}
+    assert program.choices[0].id == program.choices[0].text == "go"
+    assert program.choices[0].effects == 11
+    assert program.scopes[4] == program.scopes[11] == "/start"
+
+
+def test_first_block_is_the_default_entry():
+    assert compile_story(parse(STORY.replace("start: true", ""))).entry == 0
+
+
+def test_unresolved_address():
+    with pytest.raises(BadAddress):
+        compile_story(parse(STORY.replace("/intro", "/outro")))
+
+
+def test_uncompilable_node():
+    with pytest.raises(BadNode):
+        compile_story(parse(STORY.replace("print: going", "if_list: []")))
+
+
+def test_reusable_choice():
+    """Given a reusable choice,
+    When it is made,
+    Then it is still on offer at the next wait"""
+    story = """
+blocks:
+  - name: start
+    content:
+      - choice: go
+        reusable: true
+        effects:
+          - print: going
+      - wait:
+"""
+    program = compile_story(parse(story))
+    assert program.choices[0].reusable
+
+    interpreter = SilentInterpreter(program)
+    assert interpreter.run() is Status.WAITING
+    interpreter.choose("go")
+    assert list(interpreter.choices) == ["go"]
+
+
+def test_shown_effects_are_not_compiled():
+    shown = "choice: go\n        shown_effects:\n          - gain: gold\n" + 12 * " "
+    shown += "amount: 1"
+    with pytest.raises(BadNode, match="shown effects of choice go"):
+        compile_story(parse(STORY.replace("choice: go", shown)))
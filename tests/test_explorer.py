@@ -0,0 +1,123 @@
+import pytest
+from engine import explorer
+from engine.compiler import compile_story
+from engine.explorer import explore, main
+from engine.parser import parse
+from engine.runner import play
+
+STORY = """
+blocks:
+  - name: start
+    content:
+      - choice: left
+        effects:
+          - goto: fork
+      - choice: right
+        effects:
+          - goto: fork
+  - name: fork
+    content:
+      - choice: safe
+        effects:
+          - goto: home
+      - choice: trap
+        effects:
+          - goto: trap
+      - choice: loop
+        effects:
+          - goto: spin
+  - name: home
+    content:
+      - print: Phew.
+  - name: trap
+    content:
+      - error:
+  - name: spin
+    content:
+      - goto: spin
+  - name: unused
+    content:
+      - choice: never
+        effects: []
+"""
+
+
+def chain(length: int) -> str:
+    """A story with 2 ** length paths through length + 1 states."""
+    block = """
+  - name: b{}
+    content:
+      - choice: a
+        effects: [goto: b{}]
+      - choice: b
+        effects: [goto: b{}]"""
+    blocks = [block.format(i, i + 1, i + 1) for i in range(length)]
+    return "blocks:" + "".join(blocks) + f"\n  - name: b{length}\n    content: []\n"
+
+
+@pytest.fixture
+def program():
+    return compile_story(parse(STORY))
+
+
+def test_findings(program):
+    result = explore(program, limit=1000)
+
+    assert result.complete
+    assert [(f.block, f.script) for f in result.errors] == [("/trap", ["left", "trap"])]
+    assert [(f.block, f.script) for f in result.dead_ends] == [
+        ("/spin", ["left", "loop"])
+    ]
+    assert result.unreachable_choices == ["never in /unused"]
+    assert (result.states, result.endings) == (2, 1)
+
+
+def test_findings_replay(program):
+    error = explore(program, limit=1000).errors[0]
+    assert play(program, error.script).status == "error"
+
+
+def test_raising_conditions_are_errors():
+    """Given a story whose condition raises after a choice,
+    When it is explored,
+    Then the exploration completes, with an error finding that replays"""
+    story = STORY.replace(
+        "      - error:",
+        "      - if: 1 + 'gold'\n        then:\n          - print: Rich.",
+    )
+    program = compile_story(parse(story))
+    result = explore(program, limit=1000)
+
+    assert result.complete
+    (error,) = result.errors
+    assert (error.block, error.script) == ("/trap", ["left", "trap"])
+    assert error.message.startswith("TypeError in a condition")
+    assert play(program, error.script).error.startswith("TypeError")
+
+
+def test_visited_states_are_pruned():
+    result = explore(compile_story(parse(chain(60))))
+    assert result.complete
+    assert result.states == 60
+    assert result.endings == 2
+
+
+def test_max_states():
+    result = explore(compile_story(parse(chain(60))), max_states=10)
+    assert not result.complete
+    assert result.states == 10
+
+
+def test_workers_match_in_process(program, monkeypatch):
+    monkeypatch.setattr(explorer, "PARALLEL_THRESHOLD", 0)
+    assert explore(program, workers=2, limit=1000) == explore(program, limit=1000)
+
+
+def test_main(tmp_path, capsys):
+    story = tmp_path / "story.yaml"
+    story.write_text(STORY)
+
+    assert main([str(story), "--workers", "1", "--limit", "1000"]) == 1
+    out = capsys.readouterr().out
+    assert "error: /trap: Reached an error in block /trap <- left trap" in out
+    assert "unreachable choice: never in /unused" in out
@@ -0,0 +1,68 @@
+import pickle
+
+import pytest
+from engine.compiler import compile_story
+from engine.exceptions import BadExpression
+from engine.expressions import compile_condition
+from engine.parser import parse
+
+from tests.cases import Case, cases
+
+VARIABLES = ["gold", "cursed", "name"]
+
+
+@cases(
+    Case("Name", ("cursed", [0, True, ""]), True),
+    Case("Comparison", ("gold >= 10", [12, False, ""]), True),
+    Case("Chained comparison", ("0 < gold < 10", [12, False, ""]), False),
+    Case("Boolean logic", ("gold > 1 and not cursed", [2, False, ""]), True),
+    Case("Arithmetic", ("gold * 2 - 1 == 3", [2, False, ""]), True),
+    Case("String", ("name == 'Ann'", [0, False, "Ann"]), True),
+    Case("Membership", ("name in ['Ann', 'Bo']", [0, False, "Bo"]), True),
+    Case("YAML literals", ("cursed == false", [0, False, ""]), True),
+    Case("Surrounding whitespace", ("  gold \n", [3, False, ""]), 3),
+)
+def test_conditions(case):
+    source, values = case.val
+    assert compile_condition(source, VARIABLES)(values) == case.expects
+
+
+@cases(
+    Case("Call", "print(gold)", "Call is not allowed"),
+    Case("Attribute", "name.upper", "Attribute is not allowed"),
+    Case("Subscript", "name[0]", "Subscript is not allowed"),
+    Case("Lambda", "(lambda: 1)()", "not allowed"),
+    Case("Unknown variable", "silver > 1", "Unknown variable silver"),
+    Case("Malformed", "gold >", "Invalid expression"),
+)
+def test_bad_conditions(case):
+    with pytest.raises(BadExpression, match=case.expects):
+        compile_condition(case.val, VARIABLES)
+
+
+def test_conditions_compile_with_story():
+    story = """
+vars:
+  - name: gold
+    type: number
+    value: 5
+blocks:
+  - name: start
+    content:
+      - if: gold > 1
+        then: []
+      - if: gold > 1
+        then: []
+      - if: nothing
+        then: []
+"""
+    with pytest.raises(BadExpression, match="Unknown variable nothing"):
+        compile_story(parse(story))
+
+    program = compile_story(parse(story.replace("nothing", "gold == 5")))
+    assert program.conditions == ["gold > 1", "gold == 5"]
+    assert program.defaults == [5]
+
+    copy = pickle.loads(pickle.dumps(program))
+    assert copy == program
+    assert copy.evaluators[1](copy.defaults)
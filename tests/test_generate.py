@@ -0,0 +1,63 @@
+import pytest
+from engine.compiler import compile_story
+from engine.explorer import explore
+from engine.linker import link
+from engine.parser import Parser
+from tools.bench import bench
+from tools.generate import generate, main, node, to_yaml
+
+from tests.cases import Case, cases
+
+
+@cases(
+    Case("Flat", dict(blocks=30, branching=3), 30),
+    Case("Nested", dict(blocks=30, depth=4), 30),
+    Case("Variables", dict(blocks=30, variables=5), 30),
+    Case("Single block", dict(blocks=1), 1),
+)
+def test_generated_stories_are_valid(case):
+    source = to_yaml(generate(**case.val))
+    doc = Parser().parse(source)
+
+    assert Parser(one_pass=True).parse(source) == doc
+    assert len(link(doc).blocks) == case.expects
+
+    result = explore(compile_story(doc))
+    assert result.complete
+    assert not result.errors
+    assert not result.dead_ends
+    assert not result.unreachable_choices
+
+
+def test_generation_is_deterministic():
+    assert generate(blocks=20, variables=3) == generate(blocks=20, variables=3)
+    assert generate(blocks=20, variables=3) != generate(blocks=20, variables=3, seed=1)
+
+
+def test_nodes_are_checked_against_the_grammar():
+    with pytest.raises(ValueError, match="Print takes"):
+        node("Print", {"print": "Hi", "colour": "red"})
+
+
+@cases(
+    Case("No blocks", dict(blocks=0), "blocks must be at least 1"),
+    Case("Negative branching", dict(branching=-1), "branching must be at least 0"),
+    Case("No depth", dict(depth=0), "depth must be at least 1"),
+    Case("Negative variables", dict(variables=-2), "variables must be at least 0"),
+)
+def test_bad_shapes_are_refused(case):
+    with pytest.raises(ValueError, match=case.expects):
+        generate(**case.val)
+
+
+def test_bad_shape_options_are_refused(capsys):
+    with pytest.raises(SystemExit):
+        main(["--depth", "0"])
+    assert "--depth: must be at least 1, not 0" in capsys.readouterr().err
+
+
+def test_bench_report():
+    report = bench(blocks=20, repeat=1)
+    assert report["story"]["blocks"] == 20
+    assert report["results"]["round_trip"]["equal"]
+    assert all(result["rate"] > 0 for result in report["results"].values())
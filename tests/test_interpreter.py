@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import pytest
+from engine.compiler import compile_story
+from engine.exceptions import BadChoice, StoryError
+from engine.interpreter import Interpreter, Status
+from engine.parser import parse
+
+STORIES = Path("tests/stories")
+
+
+class Transcript(Interpreter):
+    """An interpreter that records its output instead of sending signals."""
+
+    def __init__(self, story: Path):
+        super().__init__(compile_story(parse(story)))
+        self.lines = []
+        self.offers = []
+
+    def put_text(self, text):
+        self.lines.append(text.strip())
+
+    def give_choice(self, choices):
+        self.offers.append(list(choices))
+
+    def end(self):
+        pass
+
+
+def test_print():
+    story = Transcript(STORIES / "hello_world.yaml")
+    assert story.run() is Status.ENDED
+    assert story.lines == ["Hello, World!"]
+
+
+def test_error():
+    story = Transcript(STORIES / "error.yaml")
+    with pytest.raises(StoryError):
+        story.run()
+    assert story.lines == ["This is the start of the program."]
+
+
+def test_goto_nested_block():
+    story = Transcript(STORIES / "simple_goto.yaml")
+    assert story.run() is Status.ENDED
+    assert story.lines[1:] == [
+        "Arrived at sibling_block.",
+        "Arrived at child block. Terminating program.",
+    ]
+
+
+def test_gosub():
+    story = Transcript(STORIES / "simple_gosub.yaml")
+    assert story.run() is Status.ENDED
+    assert "Kangaroo" in story.lines
+    assert story.lines[-1].startswith("We have exited the subroutine.")
+
+
+def test_choice():
+    story = Transcript(STORIES / "simple_choice.yaml")
+    assert story.run() is Status.WAITING
+    assert story.lines[-1] == "This is the text after the choice."
+    assert story.offers == [["continue"]]
+
+    story.choose("continue")
+    assert story.run() is Status.ENDED
+    assert story.lines[-1] == "You made a choice."
+
+
+def test_choice_goto_leaves_block():
+    story = Transcript(STORIES / "simple_choice_goto.yaml")
+    story.run()
+    story.choose("good")
+
+    assert story.run() is Status.ENDED
+    assert story.offers == [["good", "bad"]]
+    assert story.lines[-1] == "The program should end now. Goodbye!"
+
+
+def test_wait():
+    story = Transcript(STORIES / "simple_wait.yaml")
+    story.run()
+    story.choose("continue")
+    assert story.run() is Status.WAITING
+    assert story.offers == [["continue", "goto"], ["goto"]]
+
+    story.choose("goto")
+    assert story.run() is Status.ENDED
+    assert story.lines[-1] == "This is the end of the story."
+
+
+def test_step():
+    story = Transcript(STORIES / "hello_world.yaml")
+    story.step()
+    assert story.lines == ["Hello, World!"]
+    assert story.status is Status.RUNNING
+
+
+def test_bad_choice():
+    story = Transcript(STORIES / "simple_choice.yaml")
+    story.run()
+    with pytest.raises(BadChoice):
+        story.choose("nope")
+
+
+def test_reset():
+    story = Transcript(STORIES / "hello_world.yaml")
+    story.run()
+    story.reset()
+    story.run()
+    assert story.lines == ["Hello, World!", "Hello, World!"]
+
+
+def test_declared_values():
+    story = Transcript(STORIES / "simple_vars.yaml")
+    assert story.variables == {"test_true": True, "test_false": False}
+    assert story.run() is Status.ENDED
+
+
+def test_default_values():
+    story = Transcript(STORIES / "default_var_values.yaml")
+    assert story.variables == {"string": "", "number": 0, "bool": False}
+    assert story.run() is Status.ENDED
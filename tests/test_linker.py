@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+from engine.exceptions import BadAddress
+from engine.linker import Links, link
+from engine.parser import parse
+
+from tests.cases import Case, cases
+
+NESTED_STORY = """
+blocks:
+  - name: start
+    content:
+      - goto: child
+      - gosub: sibling
+    blocks:
+      - name: child
+        content:
+          - goto: /start
+  - name: sibling
+    content:
+      - if: x
+        then:
+          - goto: /start/child
+"""
+
+
+@pytest.fixture
+def links():
+    return link(parse(NESTED_STORY))
+
+
+def test_block_index(links):
+    assert links.paths == ["/start", "/start/child", "/sibling"]
+    assert links.index["/start/child"] == 1
+
+
+@cases(
+    Case("Absolute", ("/sibling", ""), 2),
+    Case("Absolute nested", ("/start/child", "/sibling"), 1),
+    Case("Relative child", ("child", "/start"), 1),
+    Case("Relative sibling", ("sibling", "/start"), 2),
+    Case("Relative from nested", ("sibling", "/start/child"), 2),
+)
+def test_resolve(case, links):
+    assert links.resolve(*case.val) == case.expects
+
+
+def test_jumps_are_resolved(links):
+    targets = [(jump.address, links.paths[jump.target]) for jump in links.jumps]
+    assert targets == [
+        ("child", "/start/child"),
+        ("sibling", "/sibling"),
+        ("/start", "/start"),
+        ("/start/child", "/start/child"),
+    ]
+
+
+def test_unresolved_addresses_are_all_reported():
+    story = NESTED_STORY.replace("goto: child", "goto: lost")
+    doc = parse(story.replace("goto: /start/child", "goto: /nowhere"))
+    links = Links(doc)
+
+    assert [jump.address for jump in links.unresolved] == ["lost", "/nowhere"]
+    with pytest.raises(BadAddress, match="(?s)lost.*/nowhere"):
+        link(doc)
+
+
+def test_duplicate_blocks():
+    doc = parse(NESTED_STORY.replace("name: sibling", "name: start"))
+    with pytest.raises(BadAddress, match="Duplicate block address: /start"):
+        link(doc)
+
+
+STORIES = sorted(Path("tests/stories").glob("*.yaml"))
+
+
+@cases(*[Case(file.name, file) for file in STORIES])
+def test_stories_link(case):
+    assert not link(parse(case.val)).errors
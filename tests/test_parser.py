@@ -1,11 +1,20 @@
+import pickle
+from pathlib import Path
 from typing import NamedTuple
+from unittest.mock import patch
 
 import pytest
-from engine.parser import dump, parse
-from engine.syntax import A, Expression, If, Node, Sequence
+import yaml
+from engine.exceptions import NotRecognized
+from engine.nodes import If, syntax_v1
+from engine.parser import Parser, dump, parse, parse_many
+from engine.syntax import A, Expression, Node, Sequence
 
 from .cases import Case, cases
 
+# The story syntax, and the A test node
+action_syntax = syntax_v1.extend(A)
+
 sample_node_cases = cases(
     Case(
         name="A Node",
@@ -34,13 +43,183 @@ sample_node_cases = cases(
 
 @sample_node_cases
 def test_parse(case):
-    node = parse(case.val)
+    node = Parser(action_syntax).parse(case.val)
     assert node == case.expects
 
 
 @sample_node_cases
 def test_dump(case):
     yaml = dump(case.expects)
-    node = parse(yaml)
+    node = Parser(action_syntax).parse(yaml)
+
+    assert node == case.expects
 
+
+@sample_node_cases
+def test_one_pass_parse(case):
+    node = Parser(action_syntax, one_pass=True).parse(case.val)
     assert node == case.expects
+
+
+@cases(
+    Case("Anchors and aliases", "a: &x action\nif: *x\nthen: []"),
+    Case("Merge keys", "<<: {a: action}"),
+    Case("Explicit tags", "a: !!str 3"),
+    Case("Unknown keys are dropped", "a: action\nvars: [1, 2]"),
+    Case("Bad values of dropped keys", "print: hi\nwait: 5"),
+)
+def test_one_pass_matches_default(case):
+    one_pass = Parser(action_syntax, one_pass=True)
+    assert one_pass.parse(case.val) == Parser(action_syntax).parse(case.val)
+
+
+@cases(
+    Case("Unrecognized map", "bogus: []", NotRecognized),
+    Case("Unrecognized nested map", "choice: c\neffects:\n- bogus: 1", NotRecognized),
+    Case("Mismatched value", "if: x\nthen: 3", TypeError),
+)
+def test_one_pass_errors(case):
+    with pytest.raises(case.expects):
+        Parser(one_pass=True).parse(case.val)
+
+
+# Reparse ------------------------------------------------------------------
+
+STORY = """
+blocks:
+  - name: start
+    content:
+      - print: hello
+      - goto: /end
+  - name: end
+    content:
+      - print: goodbye
+"""
+
+
+def test_reparse_reuses_unchanged_blocks():
+    """Given a parsed story,
+    When one block is edited and the story reparsed,
+    Then only that block is rebuilt"""
+    parser = Parser()
+    old_doc = parser.parse(STORY)
+    new_doc = parser.reparse(old_doc, STORY.replace("goodbye", "farewell"))
+
+    old_blocks, new_blocks = old_doc["blocks"], new_doc["blocks"]
+    assert new_doc == parse(STORY.replace("goodbye", "farewell"))
+    assert new_blocks[0] is old_blocks[0]
+    assert new_blocks[1] is not old_blocks[1]
+
+
+def test_reparse_chain():
+    new_block = "  - name: new\n    content: []\n"
+    parser = Parser()
+    doc_1 = parser.parse(STORY)
+    doc_2 = parser.reparse(doc_1, STORY.replace("hello", "hi"))
+    doc_3 = parser.reparse(doc_2, STORY.replace("hello", "hi") + new_block)
+
+    assert doc_3 == parse(STORY.replace("hello", "hi") + new_block)
+    assert doc_3["blocks"][0] is doc_2["blocks"][0]
+    assert doc_3["blocks"][1] is doc_1["blocks"][1]
+
+
+def test_reparse_indexes_a_document_once():
+    """Given an interning parser,
+    When a story is reparsed unchanged, again and again,
+    Then the document it returns each time is indexed once"""
+    parser = Parser(intern=True)
+    doc = parser.parse(STORY)
+    with patch("engine.parser.weakref.finalize") as finalize:
+        for _ in range(3):
+            assert parser.reparse(doc, STORY) is doc
+    assert finalize.call_count == 1
+    assert list(parser._indexes) == [id(doc)]
+
+
+def test_reparse_non_doc():
+    parser = Parser(action_syntax)
+    node = parser.reparse(parser.parse(STORY), "a: action")
+    assert node == A({"a": Expression("action")})
+
+
+# Interning ------------------------------------------------------------------
+
+REPEATED = """
+blocks:
+  - name: start
+    content:
+      - print: hello
+      - choice: wait
+        effects: [{print: hello}, {goto: /end}]
+  - name: end
+    content:
+      - print: hello
+      - choice: wait
+        effects: [{print: hello}, {goto: /end}]
+"""
+
+
+def test_interning_shares_equal_subtrees():
+    """Given a story that repeats the same commands,
+    When it is parsed by an interning parser,
+    Then every repeat is one shared instance, and the AST is unchanged"""
+    parser = Parser(intern=True)
+    doc = parser.parse(REPEATED)
+    start, end = doc["blocks"][0], doc["blocks"][1]
+
+    assert doc == parse(REPEATED)
+    assert start["content"] is end["content"]
+    assert start["content"][0] is start["content"][1]["effects"][0]
+    assert parser.parse(REPEATED) is doc
+    assert parser.reparse(doc, REPEATED) is doc
+
+
+def test_interned_equality():
+    parser = Parser(intern=True)
+    doc, edited = parser.parse(REPEATED), parser.parse(STORY)
+    assert doc != edited and doc._hash != edited._hash
+    assert doc == parse(REPEATED) and parse(REPEATED) == doc
+
+    # Equal data of other types hashes the same, but is not shared
+    true = parser.parse("name: x\ntype: number\nvalue: true")
+    one = parser.parse("name: x\ntype: number\nvalue: 1")
+    assert true is not one and true == one
+
+
+def test_interned_nodes_pickle_without_hash():
+    doc = Parser(intern=True).parse(REPEATED)
+    loaded = pickle.loads(pickle.dumps(doc))
+    assert loaded == doc and loaded._hash is None
+
+
+# Parallel parsing -----------------------------------------------------------
+
+
+@cases(Case("In process", 1), Case("Pool", 2))
+def test_parse_many(case, tmp_path):
+    """Given story files, four of them bad,
+    When they are parsed together,
+    Then every good file is parsed, and every bad one reports its error"""
+    paths = sorted(Path("tests/stories").glob("*.yaml"))
+    (tmp_path / "unknown.yaml").write_text("blocks: [{nothing: here}]\n")
+    (tmp_path / "broken.yaml").write_text("blocks: [\n")
+    (tmp_path / "binary.yaml").write_bytes(b"print: \x81\n")  # Not UTF-8 or cp1252
+    bad = [tmp_path / name for name in ("unknown", "broken", "binary", "missing")]
+    bad = [path.with_suffix(".yaml") for path in bad]
+
+    results = {parsed.path: parsed for parsed in parse_many(bad + paths, case.val)}
+    assert set(results) == set(bad + paths)
+    for path in paths:
+        assert results[path].error is None
+        assert results[path].node == parse(path)
+    assert isinstance(results[bad[0]].error, NotRecognized)
+    assert isinstance(results[bad[1]].error, yaml.YAMLError)
+    assert isinstance(results[bad[2]].error, UnicodeDecodeError)
+    assert isinstance(results[bad[3]].error, FileNotFoundError)
+
+
+def test_parse_many_interns():
+    parser = Parser(intern=True)
+    paths = [Path("tests/stories/hello_world.yaml")] * 2
+    first, second = parser.parse_many(paths, workers=2)
+    assert first.node is second.node is parser.parse(paths[0])
@@ -0,0 +1,112 @@
+import csv
+import pstats
+from pathlib import Path
+
+from engine.compiler import compile_story
+from engine.parser import parse
+from engine.runner import ScriptedInterpreter
+from engine.sessions import SessionManager, StoryLibrary
+
+from tests.test_sessions import request, serve
+
+STORIES = Path("tests/stories")
+
+
+def interpreter(name: str) -> ScriptedInterpreter:
+    return ScriptedInterpreter(compile_story(parse(STORIES / f"{name}.yaml")))
+
+
+def test_profile_gosub():
+    """Given a story with a gosub,
+    When it is played with profiling on,
+    Then every instruction, block visit and stack depth is counted"""
+    story = interpreter("simple_gosub")
+    profiler = story.profile()
+    story.run()
+
+    assert profiler.ops["PRINT"][0] == 4
+    assert profiler.ops["CALL"][0] == 1
+    assert sum(count for count, _ in profiler.blocks.values()) == sum(
+        count for count, _ in profiler.ops.values()
+    )
+    assert profiler.visits == {"/subroutine": 1}
+    assert profiler.depths == {1: 1}
+    assert profiler.callers["<story>", "/subroutine"] == {"/start": 1}
+
+
+def test_profile_conditions_and_choices():
+    story = interpreter("simple_vars")
+    profiler = story.profile()
+    story.run()
+    assert set(profiler.conditions) == {"test_true", "test_false"}
+    assert all(count == 1 for count, _ in profiler.conditions.values())
+
+    story = interpreter("simple_choice")
+    story.profile(profiler)
+    story.run()
+    story.choose("continue")
+    story.run()
+    assert sum(sum(ids.values()) for ids in profiler.choices.values()) == 1
+
+
+def test_unprofile():
+    story = interpreter("simple_gosub")
+    handlers = story._ops
+    profiler = story.profile()
+    assert story._ops is not handlers
+
+    assert story.unprofile() is profiler
+    assert story._ops is handlers
+    story.run()
+    assert profiler.ops["PRINT"][0] == 0
+
+
+def test_restarts_count_as_visits():
+    story = interpreter("hello_world")
+    profiler = story.profile()
+    for _ in range(2):
+        story.reset()
+        story.run()
+    assert sum(profiler.visits.values()) == 2
+
+
+def test_dump(tmp_path):
+    story = interpreter("simple_vars")
+    profiler = story.profile()
+    story.reset()
+    story.run()
+
+    profiler.dump(tmp_path / "profile.tsv")
+    with (tmp_path / "profile.tsv").open() as file:
+        rows = list(csv.DictReader(file, delimiter="\t"))
+    assert {row["kind"] for row in rows} == {"op", "block", "visit", "condition"}
+    assert {"kind": "visit", "name": "/start", "count": "1", "seconds": ""} in rows
+
+
+def test_dump_stats(tmp_path):
+    story = interpreter("simple_gosub")
+    profiler = story.profile()
+    story.run()
+
+    profiler.dump_stats(tmp_path / "profile.prof")
+    stats = pstats.Stats(str(tmp_path / "profile.prof")).stats
+    calls, _, _, _, callers = stats["<story>", 0, "/subroutine"]
+    assert calls == 1
+    assert list(callers) == [("<story>", 0, "/start")]
+    assert pstats.Stats(profiler).stats == stats
+
+
+def test_profiled_sessions(tmp_path):
+    (tmp_path / "simple_gosub.yaml").write_bytes(
+        (STORIES / "simple_gosub.yaml").read_bytes()
+    )
+    sessions = SessionManager(StoryLibrary(tmp_path, profile=True))
+
+    async def client(port):
+        for _ in range(2):
+            await request(port, "POST", "/sessions", {"story": "simple_gosub"})
+        return await request(port, "GET", "/profile")
+
+    status, profiles = serve(sessions, client)
+    assert status == 200
+    assert profiles["simple_gosub"]["visits"] == {"/start": 2, "/subroutine": 2}
@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+
+import pytest
+from engine.compiler import compile_story
+from engine.exceptions import BadRecording
+from engine.interpreter import Interpreter, Status
+from engine.main import main
+from engine.parser import parse
+from engine.replay import Recording, fast_forward, replay
+from engine.runner import ScriptedInterpreter
+
+from tests.cases import Case, cases
+
+STORIES = Path("tests/stories")
+
+LOOP = """
+blocks:
+  - name: start
+    content:
+      - print: Again?
+      - choice: again
+        effects:
+          - print: Once more.
+          - goto: /start
+      - choice: stop
+        effects:
+          - print: Done.
+"""
+SCRIPT = ["again"] * 9 + ["stop"]
+
+
+def record(program, script):
+    interpreter = ScriptedInterpreter(program)
+    recording = interpreter.record()
+    for choice in script:
+        interpreter.run()
+        interpreter.choose(choice)
+    return interpreter, recording
+
+
+@cases(*(Case(f"Until {until}", until) for until in (None, 0, 4, 10, 99)))
+def test_replay_plays_the_same(case):
+    """Given a recorded session,
+    When it is replayed, fast-forwarding part of the way,
+    Then it reaches the same state, and shows the text after the target step"""
+    program = compile_story(parse(LOOP))
+    played, recording = record(program, SCRIPT)
+    assert recording.choices == SCRIPT
+
+    replayed = replay(program, Recording.loads(recording.dumps()), case.val)
+    assert replayed.state == played.state
+    until = len(SCRIPT) if case.val is None else min(case.val, len(SCRIPT))
+    # The story prints a line, then two lines after each choice of again
+    expected = played.transcript[max(2 * until - 1, 0) :]
+    assert replayed.transcript == expected
+
+
+def test_fast_forward_long_session():
+    program = compile_story(parse(LOOP))
+    interpreter = fast_forward(program, ["again"] * 10_000)
+    assert interpreter.run() is Status.WAITING
+    assert list(interpreter.choices) == ["again", "stop"]
+
+
+def test_rewind_and_reset_update_the_recording():
+    interpreter = Interpreter(compile_story(parse(LOOP)), undo=5)
+    recording = interpreter.record()
+    for _ in range(3):
+        interpreter.run()
+        interpreter.choose("again")
+    interpreter.rewind(2)
+    assert recording.choices == ["again"]
+
+    interpreter.reset()
+    assert recording.choices == []
+
+
+@cases(
+    Case("Another story", ("story", "0" * 64), "different story"),
+    Case("Not on offer", ("choices", ["again", "nope"]), "choice 1 \\(nope\\)"),
+    Case("Made already", ("choices", ["stop", "stop"]), "choice 1 \\(stop\\)"),
+)
+def test_bad_replay(case):
+    program = compile_story(parse(LOOP))
+    recording = Recording(program.fingerprint)
+    setattr(recording, *case.val)
+    with pytest.raises(BadRecording, match=case.expects):
+        replay(program, recording)
+
+
+@cases(
+    Case("Not JSON", "nope"),
+    Case("Not a map", "[]"),
+    Case("Old version", json.dumps({"story": "x", "version": 0})),
+    Case("Not choice ids", json.dumps({"story": "x", "choices": [1], "version": 1})),
+)
+def test_bad_recording(case):
+    with pytest.raises(BadRecording):
+        Recording.loads(case.val)
+
+
+def test_main_records_and_replays(tmp_path, monkeypatch, capsys):
+    story, recorded = STORIES / "simple_choice_goto.yaml", tmp_path / "session.json"
+    monkeypatch.setattr("builtins.input", iter(["good"]).__next__)
+    with pytest.raises(SystemExit):
+        main(["--record", str(recorded), str(story)])
+    assert Recording.loads(recorded.read_text()).choices == ["good"]
+    capsys.readouterr()
+
+    main(["--async", "--replay", str(recorded), str(story)])
+    output = capsys.readouterr().out
+    assert "This is the start" not in output
+    assert "You're in the good block." in output
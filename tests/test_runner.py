@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+from engine.compiler import compile_story
+from engine.parser import parse
+from engine.runner import main, play, run_scripts
+
+from tests.cases import Case, cases
+
+STORIES = Path("tests/stories")
+
+LOOP = """
+blocks:
+  - name: start
+    content:
+      - goto: start
+"""
+
+
+@cases(
+    Case("Ends", ["continue"], ("ended", 1)),
+    Case("Script runs out", [], ("waiting", 0)),
+    Case("Bad choice", ["nope"], ("error", 0)),
+)
+def test_play(case):
+    program = compile_story(parse(STORIES / "simple_choice.yaml"))
+    playthrough = play(program, case.val)
+    assert (playthrough.status, playthrough.choices) == case.expects
+
+
+def test_play_error():
+    program = compile_story(parse(STORIES / "error.yaml"))
+    playthrough = play(program, [])
+    assert playthrough.status == "error"
+    assert playthrough.error.startswith("StoryError")
+    assert playthrough.transcript == ["This is the start of the program.\n"]
+
+
+def test_play_end_state():
+    """Given scripts that take a story down different paths,
+    When they are played,
+    Then each playthrough keeps where it stopped and its variables"""
+    program = compile_story(parse(STORIES / "simple_choice_goto.yaml"))
+    good, waiting = play(program, ["good"]), play(program, [])
+    assert (good.block, waiting.block) == ("/good", "/start")
+
+    vars_program = compile_story(parse(STORIES / "simple_vars.yaml"))
+    assert play(vars_program, []).variables == {"test_true": True, "test_false": False}
+
+
+def test_step_limit():
+    playthrough = play(compile_story(parse(LOOP)), [], limit=100)
+    assert playthrough.status == "running"
+
+
+def test_workers_match_in_process():
+    scripts = [["good"], ["bad"], ["good", "bad"], []] * 4
+    story = STORIES / "simple_choice_goto.yaml"
+
+    serial = run_scripts(story, scripts, workers=1)
+    parallel = run_scripts(story, scripts, workers=2)
+
+    assert parallel.workers == 2
+    assert parallel.playthroughs == serial.playthroughs
+    assert serial.rate > 0
+
+
+def test_main(tmp_path, capsys):
+    scripts = tmp_path / "scripts.json"
+    scripts.write_text(json.dumps([["continue"], []]))
+    output = tmp_path / "report.json"
+
+    main([str(STORIES / "simple_choice.yaml"), str(scripts), "--output", str(output)])
+
+    assert "2 playthroughs: 1 ended, 1 waiting" in capsys.readouterr().out
+    assert [run["status"] for run in json.loads(output.read_text())] == [
+        "ended",
+        "waiting",
+    ]
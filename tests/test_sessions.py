@@ -0,0 +1,224 @@
+import asyncio
+import base64
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from engine.exceptions import BadChoice, BadSession, BadStory
+from engine.replay import replay
+from engine.server import Server, encode_frame
+from engine.sessions import SessionManager, StoryLibrary
+
+STORIES = Path("tests/stories")
+
+BROKEN = {
+    "unlinked": "blocks:\n  - name: start\n    content:\n      - goto: nowhere\n",
+    "raising": (
+        "vars:\n  - name: gold\n    type: bool\n    value: true\n"
+        "blocks:\n  - name: start\n    content:\n      - if: gold < 'a'\n"
+        "        then:\n          - print: Rich\n"
+    ),
+}
+
+
+@pytest.fixture
+def library(tmp_path):
+    for name in ("simple_choice", "simple_choice_goto", "error"):
+        shutil.copy(STORIES / f"{name}.yaml", tmp_path)
+    for name, story in BROKEN.items():
+        (tmp_path / f"{name}.yaml").write_text(story)
+    return StoryLibrary(tmp_path, max_stories=2)
+
+
+@pytest.fixture
+def sessions(library):
+    return SessionManager(library)
+
+
+class TestSessionManager:
+    def test_sessions_are_independent(self, sessions):
+        """Given two sessions of one story,
+        When one makes a choice,
+        Then the other is still waiting at its first choice"""
+        first = sessions.start("simple_choice_goto")
+        second = sessions.start("simple_choice_goto")
+        assert list(first["choices"]) == ["good", "bad"]
+
+        turn = sessions.choose(first["session"], "good")
+        assert turn["status"] == "ended"
+        assert turn["text"][-1].strip() == "The program should end now. Goodbye!"
+
+        turn = sessions.choose(second["session"], "bad")
+        assert turn["status"] == "ended"
+        assert len(sessions) == 0
+
+    def test_sessions_share_one_program(self, sessions):
+        first = sessions.start("simple_choice")["session"]
+        second = sessions.start("simple_choice")["session"]
+        assert sessions.sessions[first].story is sessions.sessions[second].story
+
+    def test_bad_choice(self, sessions):
+        session = sessions.start("simple_choice")["session"]
+        with pytest.raises(BadChoice):
+            sessions.choose(session, "nope")
+        assert sessions.choose(session, "continue")["status"] == "ended"
+
+    def test_story_error(self, sessions):
+        turn = sessions.start("error")
+        assert turn["status"] == "error"
+        assert "error" in turn
+        assert turn["recording"]["choices"] == []
+
+    def test_recording(self, sessions):
+        """Given a session that tried a choice not on offer,
+        When its recording is replayed,
+        Then the story is where the session is"""
+        session = sessions.start("simple_choice")["session"]
+        with pytest.raises(BadChoice):
+            sessions.choose(session, "nope")
+        recording = sessions.recording(session)
+        assert recording.choices == []
+
+        story = sessions.sessions[session].story
+        interpreter = replay(story.program, recording)
+        interpreter.run()
+        assert interpreter.state == sessions.sessions[session].state
+
+    @pytest.mark.parametrize("name", ["missing", "../stories/hello_world"])
+    def test_unknown_story(self, sessions, name):
+        with pytest.raises(BadSession, match="No story named"):
+            sessions.start(name)
+
+    def test_story_that_does_not_compile(self, sessions):
+        with pytest.raises(BadStory, match="Cannot compile story unlinked"):
+            sessions.start("unlinked")
+        assert len(sessions) == 0
+
+    def test_story_that_raises(self, sessions):
+        """Given a story whose condition raises,
+        When a session of it starts,
+        Then the error propagates and the session is not kept"""
+        with pytest.raises(TypeError):
+            sessions.start("raising")
+        assert len(sessions) == 0
+
+    def test_unknown_session(self, sessions):
+        with pytest.raises(BadSession, match="No session nope"):
+            sessions.choose("nope", "continue")
+
+    def test_sessions_are_bounded(self, library):
+        sessions = SessionManager(library, max_sessions=2)
+        first = sessions.start("simple_choice")["session"]
+        sessions.start("simple_choice")
+        sessions.start("simple_choice")
+        assert len(sessions) == 2
+        assert first not in sessions.sessions
+
+
+class TestStoryLibrary:
+    def test_stories_are_evicted_lru(self, library):
+        library.load("simple_choice")
+        library.load("error")
+        library.load("simple_choice")
+        library.load("simple_choice_goto")
+        assert list(library.stories) == ["simple_choice", "simple_choice_goto"]
+
+    def test_changed_stories_are_recompiled(self, library):
+        story = library.load("simple_choice")
+        path = library.root / "simple_choice.yaml"
+        os.utime(path, (0, 0))
+        assert library.load("simple_choice") is not story
+
+
+async def request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n"
+        "Connection: close\r\n\r\n".encode()
+        + data
+    )
+    head, _, payload = (await reader.read()).partition(b"\r\n\r\n")
+    writer.close()
+    return int(head.split()[1]), json.loads(payload)
+
+
+def serve(sessions, client):
+    async def run():
+        listener = await Server(sessions).start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return await client(port)
+
+    return asyncio.run(run())
+
+
+def test_http(sessions):
+    async def client(port):
+        status, turn = await request(
+            port, "POST", "/sessions", {"story": "simple_choice"}
+        )
+        assert (status, list(turn["choices"])) == (200, ["continue"])
+        path = f"/sessions/{turn['session']}"
+
+        assert (await request(port, "POST", path + "/choices", {"choice": "no"}))[
+            0
+        ] == 409
+        assert (await request(port, "POST", "/sessions", {}))[0] == 400
+        assert (await request(port, "GET", "/nowhere"))[0] == 404
+        status, recording = await request(port, "GET", path + "/recording")
+        assert (status, recording["choices"]) == (200, [])
+        assert (await request(port, "DELETE", path))[0] == 200
+        assert (await request(port, "DELETE", path))[0] == 404
+
+    serve(sessions, client)
+
+
+def test_http_story_failures(sessions):
+    async def client(port):
+        statuses = []
+        for story in ("unlinked", "raising"):
+            status, reply = await request(port, "POST", "/sessions", {"story": story})
+            statuses.append((status, list(reply)))
+        return statuses
+
+    assert serve(sessions, client) == [(422, ["error"]), (500, ["error"])]
+    assert len(sessions) == 0
+
+
+def test_websocket(sessions):
+    def message(body):
+        data = json.dumps(body).encode()
+        mask = b"\x01\x02\x03\x04"
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(data))
+        return bytes([0x81, 0x80 | len(data)]) + mask + masked
+
+    async def receive(reader):
+        _, length = await reader.readexactly(2)
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2))
+        return json.loads(await reader.readexactly(length))
+
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        key = base64.b64encode(b"0123456789abcdef").decode()
+        writer.write(
+            "GET /ws HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n\r\n".encode()
+        )
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 101")
+
+        writer.write(message({"start": "unlinked"}))
+        assert (await receive(reader))["error"].startswith("Cannot compile story")
+        writer.write(message({"start": "simple_choice"}))
+        turn = await receive(reader)
+        writer.write(message({"session": turn["session"], "choice": "continue"}))
+        turn = await receive(reader)
+        writer.write(encode_frame(0x8, b""))
+        writer.close()
+        return turn
+
+    assert serve(sessions, client)["status"] == "ended"
@@ -0,0 +1,127 @@
+import pytest
+from engine.compiler import compile_story
+from engine.exceptions import BadSnapshot
+from engine.interpreter import Interpreter, Status
+from engine.parser import parse
+from engine.snapshot import History, Snapshot, apply, delta
+
+from tests.cases import Case, cases
+
+STORY = """
+vars:
+  - name: gold
+    type: number
+    value: 3
+blocks:
+  - name: start
+    content:
+      - choice: first
+        effects: [print: one]
+      - choice: second
+        effects: [print: two]
+      - choice: third
+        effects: [gosub: side]
+      - wait:
+      - print: done
+  - name: side
+    content:
+      - choice: back
+        effects: [print: back]
+"""
+
+
+class Quiet(Interpreter):
+    def connect(self):
+        pass
+
+    def put_text(self, text):
+        pass
+
+    def give_choice(self, choices):
+        pass
+
+
+@pytest.fixture
+def program():
+    return compile_story(parse(STORY))
+
+
+def play(interpreter, *choices):
+    interpreter.run()
+    for choice in choices:
+        interpreter.choose(choice)
+        interpreter.run()
+    return interpreter
+
+
+def test_snapshot_round_trip(program):
+    story = play(Quiet(program), "first", "third")
+    snapshot = story.snapshot()
+    loaded = Snapshot.loads(snapshot.dumps())
+    assert loaded == snapshot
+
+    restored = Quiet(program)
+    restored.restore(loaded)
+    assert restored.state == story.state
+    assert play(restored, "back", "second").run() is Status.ENDED
+
+
+@cases(
+    Case("Not JSON", "{", "Not a snapshot"),
+    Case("Not an object", "[]", "Not a snapshot"),
+    Case("Missing fields", '{"version": 1}', "Not a snapshot"),
+    Case("Other version", '{"version": 99}', "Unsupported snapshot version: 99"),
+)
+def test_bad_snapshots(case):
+    with pytest.raises(BadSnapshot, match=case.expects):
+        Snapshot.loads(case.val)
+
+
+def test_restore_other_story(program):
+    snapshot = Quiet(program).snapshot()
+    other = Quiet(compile_story(parse(STORY.replace("done", "fin"))))
+    with pytest.raises(BadSnapshot, match="different story"):
+        other.restore(snapshot)
+
+
+def test_rewind(program):
+    story = Quiet(program, undo=10)
+    story.run()
+    states = []
+    for choice in ("third", "back", "first"):
+        states.append(story.state)
+        story.choose(choice)
+        story.run()
+
+    story.rewind()
+    assert story.state == states[2]
+    story.rewind(2)
+    assert story.state == states[0]
+    with pytest.raises(BadSnapshot, match="Cannot rewind 1 choices, 0 recorded"):
+        story.rewind()
+
+
+def test_rewind_disabled(program):
+    with pytest.raises(BadSnapshot, match="not enabled"):
+        play(Quiet(program), "first").rewind()
+
+
+def test_history_is_bounded():
+    history = History(3)
+    states = [(pc, (1,) * pc, (pc,), (), 0, "waiting") for pc in range(10)]
+    for state in states:
+        history.push(state)
+
+    assert len(history) == 3
+    assert history.pop(3) == states[-3]
+    assert len(history) == 0
+
+
+@cases(
+    Case("Deeper stack", ((1, (1, 2, 3), (0, "a"), (0,)), (2, (1,), (0, "a"), (0,)))),
+    Case("Other stack", ((1, (1, 2), (0,), ()), (2, (3, 4), (5,), (1,)))),
+    Case("Changed values", ((1, (), (1, True), (1,)), (2, (), (1, 1), (1,)))),
+)
+def test_delta(case):
+    new, old = (state + (0, "waiting") for state in case.val)
+    assert apply(new, delta(new, old)) == old
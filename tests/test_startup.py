@@ -0,0 +1,102 @@
+import ast
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from engine import logs
+from engine.main import main
+from engine.startup import import_times, profile
+
+from tests.cases import Case, cases
+
+STORY = Path("tests/stories/simple_choice.yaml")
+
+
+def loaded_after(module: str, names: list[str]) -> list[str]:
+    """The given modules a fresh interpreter has loaded after importing one."""
+    code = f"import sys, {module}; print([n for n in {names!r} if n in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH="src"),
+    )
+    return ast.literal_eval(result.stdout)
+
+
+@cases(
+    Case("Parser", "engine.parser", ["logging518", "engine.builder", "engine.cache"]),
+    Case("Runner", "engine.runner", ["pydispatch", "asyncio", "concurrent.futures"]),
+    Case("Game", "engine.game", ["pydispatch", "asyncio", "logging518"]),
+    Case("Bundle", "engine.bundle", ["yaml", "engine.parser"]),
+)
+def test_imports_are_deferred(case):
+    assert loaded_after(case.val, case.expects) == []
+
+
+def test_import_does_not_configure_logging():
+    code = "import logging, engine.main; print(len(logging.getLogger().handlers))"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH="src"),
+    )
+    assert result.stdout.strip() == "0"
+
+
+def test_import_times():
+    times = import_times("json")
+    assert [t.module for t in times if t.depth == 0][-1] == "json"
+    assert all(t.cumulative >= t.own >= 0 for t in times)
+
+
+def test_profile():
+    """Given a story,
+    When its startup is profiled,
+    Then every initialization step is timed"""
+    result = profile(STORY)
+    assert "engine.parser" in [t.module for t in result.imports]
+    assert list(result.steps) == [
+        "import engine.game",
+        "parse story",
+        "compile story",
+        "create interpreter",
+        "create view",
+    ]
+    assert "Cold imports" in result.report()
+
+
+def test_startup_profile_option(capsys, monkeypatch):
+    monkeypatch.setattr(logs, "_configured", True)
+    main(["--startup-profile", str(STORY)])
+    assert "Initialization" in capsys.readouterr().out
+
+
+def test_configure_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(logs, "_configured", False)
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+
+    logs.configure(tmp_path / "missing.toml", level="warning")
+    logs.configure(tmp_path / "missing.toml")
+    assert len(root.handlers) == 1
+    assert root.level == logging.WARNING
+
+
+def test_configure_falls_back_on_a_malformed_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(logs, "_configured", False)
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    config = tmp_path / "pyproject.toml"
+    config.write_text("[tool.logging\nversion =", encoding="utf-8")
+
+    logs.configure(config)
+    assert len(root.handlers) == 1
+    assert root.level == logging.INFO
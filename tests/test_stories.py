@@ -17,18 +17,44 @@
 TODO: One for erroneous stories to test "error handling" without a complete crash
 """
 
+import io
 from pathlib import Path
 
 import pytest
-from engine.parser import dump, parse
+import yaml
+from engine.parser import Parser, dump, parse, parser
 
 from tests.cases import Case, cases
 
-TEST_FILES = Path("tests/stories").glob("*.yaml")
+TEST_FILES = sorted(Path("tests/stories").glob("*.yaml"))
+story_cases = cases(*[Case(file.name, file) for file in TEST_FILES])
 
 
-@cases(*[Case(file.name, file) for file in TEST_FILES])
+@story_cases
 def test_story(case):
     ast_1 = parse(case.val)
     ast_2 = parse(dump(ast_1))
     assert ast_1 == ast_2
+
+
+@story_cases
+def test_one_pass_story(case):
+    one_pass = Parser(one_pass=True)
+    ast_1 = one_pass.parse(case.val)
+    ast_2 = one_pass.parse(dump(ast_1))
+    assert ast_1 == ast_2 == parse(case.val)
+
+
+@story_cases
+def test_streaming_dump(case, tmp_path):
+    ast = parse(case.val)
+    text = dump(ast)
+    assert text == yaml.dump(parser._dump(ast))
+
+    stream = io.StringIO()
+    assert dump(ast, stream) is stream
+    assert stream.getvalue() == text
+
+    file = tmp_path / "story.yaml"
+    assert dump(ast, file) == text
+    assert file.read_text() == text
@@ -1,3 +1,5 @@
+from dataclasses import fields
+
 from engine.exceptions import *
 from engine.parser import dump, parse
 from engine.syntax import *
@@ -217,11 +219,12 @@ class TestGetAddr:
         assert result == case.expects
 
     @cases(
-        Case("Required key does not exist", ["vars"]),
+        Case("Key does not exist", ["chapters"]),
         Case("Sequence index Too Big", ["blocks", 2]),
         Case("Sequence index Negative", ["blocks", -1]),
         Case("Sequence index Not Int", ["blocks", "first_block"]),
         Case("Terminal node has no subnodes", ["blocks", 0, "name", "data"]),
+        Case("Address not iterable", None),
     )
     def test_invalid_addresses(self, case, example_complex_node):
         with raises(BadAddress):
@@ -252,4 +255,74 @@ def test_pattern():
 
 # Syntax V1
 def test_v1_syntax_extension():
-    assert Variable in syntax_v1.types
+    assert {Modify, Switch, IfList, GainEffect} <= set(syntax_v1.types)
+    assert Variable not in syntax_v1.types
+
+
+def test_v1_tables_match_its_types():
+    """Given the generated story syntax,
+    When its parse tables are compiled from its node classes,
+    Then they equal the precomputed ones"""
+    assert compile_tables(Syntax(syntax_v1.types)) == syntax_v1.tables
+
+
+# Grammar ------------------------------------------------------------------
+
+
+@cases(
+    Case("Exact keys", {"print": "hi"}, Print),
+    Case("Optional keys", {"choice": "c", "effects": [], "text": "t"}, Choice),
+    Case("Extra keys", {"name": "n", "content": [], "start": True}, Block),
+    Case("First match wins", {"a": "x", "print": "hi"}, A),
+    Case("Most required keys win", {"name": "n", "content": [], "blocks": []}, Block),
+    Case("Unknown keys", {"bogus": []}, None),
+    Case("Root keys", {"vars": []}, Document),
+    Case("Root keys only", {"vars": [], "bogus": []}, None),
+    Case("One of keys", {"name": "n", "blocks": []}, Block),
+    Case("Missing one of keys", {"name": "n"}, None),
+)
+def test_grammar_recognize(case):
+    assert simple_syntax.grammar.recognize(case.val) is case.expects
+
+
+def test_grammar_is_compiled_once():
+    assert simple_syntax.grammar is simple_syntax.grammar
+
+
+def test_grammar_extension_recompiles():
+    extended = initial_syntax.extend(Print)
+    assert extended.grammar is not initial_syntax.grammar
+    assert extended.grammar.recognize({"print": "hi"}) is Print
+    assert initial_syntax.grammar.recognize({"print": "hi"}) is None
+
+
+# Node layout --------------------------------------------------------------
+
+
+@cases(
+    Case("Expression", Expression("x")),
+    Case("Sequence", Sequence([])),
+    Case("Map", A({"a": Expression("x")})),
+    Case("Null", Null()),
+)
+def test_nodes_are_slotted(case):
+    assert not hasattr(case.val, "__dict__")
+
+
+def test_spec_is_class_data():
+    assert "spec" not in [field.name for field in fields(If)]
+    assert If({}).spec is If.spec
+
+
+def test_expressions_are_interned():
+    assert Expression("".join(["a", "b"])).data is Expression("ab").data
+
+
+def test_missing_optional_key():
+    node = If({"if": Expression("x"), "then": Sequence([])})
+    assert node["else"] is None
+
+
+def test_missing_required_key():
+    with raises(BadNode):
+        If({"if": Expression("x")})["then"]
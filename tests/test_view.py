@@ -0,0 +1,114 @@
+import asyncio
+import io
+import socket
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from engine.exceptions import StoryError
+from engine.game import AsyncGame, Game
+from engine.view import (
+    INVALID,
+    PROMPT,
+    AsyncView,
+    ConsoleSink,
+    FileSink,
+    MemorySink,
+    Output,
+    QueueInput,
+    SocketSink,
+    View,
+)
+
+STORIES = Path("tests/stories")
+
+
+def test_view_flushes_once_per_prompt():
+    """Given a View writing to memory,
+    When a story is played through a wrong choice to its end,
+    Then the text is written in one flush per prompt, and one at the exit"""
+    sink = MemorySink()
+    game = Game(STORIES / "simple_choice_goto.yaml", View(sink))
+    with (
+        patch("builtins.input", side_effect=["nope", "good"]),
+        patch("builtins.exit", side_effect=SystemExit),
+        pytest.raises(SystemExit),
+    ):
+        game.run()
+
+    menu = "Your choices are: good, bad\n"
+    first, retry, end = sink.flushes
+    assert first.startswith("This is the start of the program.\n\n")
+    assert first.endswith(f"(this should only appear once).\n\n{menu}{PROMPT}")
+    assert retry == f"{INVALID}{menu}{PROMPT}"
+    assert end.startswith("You're headed to the good block.\n\n")
+    assert end.endswith("The program should end now. Goodbye!\n\n")
+
+
+def test_view_flushes_when_the_story_fails():
+    """Given a story that reaches an error node,
+    When it is played,
+    Then the text before the error is written before the error propagates"""
+    sink = MemorySink()
+    game = Game(STORIES / "error.yaml", View(sink))
+    with pytest.raises(StoryError):
+        game.run()
+    assert sink.flushes == ["This is the start of the program.\n\n"]
+
+
+def test_async_view_flushes_once_per_prompt():
+    """Given an AsyncView writing to memory,
+    When a story is played through a wrong choice to its end,
+    Then the text is written in one flush per prompt, and one at the end"""
+    source, sink = QueueInput(), MemorySink()
+    for choice in ("nope", "good"):
+        source.put(choice)
+    game = AsyncGame(STORIES / "simple_choice_goto.yaml", AsyncView(source, sink))
+    asyncio.run(game.run())
+
+    menu = "Your choices are: good, bad\n"
+    first, retry, end = sink.flushes
+    assert first.startswith("This is the start of the program.\n\n")
+    assert first.endswith(f"(this should only appear once).\n\n{menu}")
+    assert retry == f"{INVALID}{menu}"
+    assert end.endswith("The program should end now. Goodbye!\n\n")
+
+
+def test_async_view_flushes_when_the_story_fails():
+    sink = MemorySink()
+    game = AsyncGame(STORIES / "error.yaml", AsyncView(QueueInput(), sink))
+    with pytest.raises(StoryError):
+        asyncio.run(game.run())
+    assert sink.flushes == ["This is the start of the program.\n\n"]
+
+
+def test_output_flushes_early_when_full():
+    output = Output(MemorySink(), limit=8)
+    for text in ("one ", "two ", "three "):
+        output.write(text)
+    assert output.sink.flushes == ["one two "]
+
+    output.flush()
+    output.flush()
+    assert output.sink.flushes == ["one two ", "three "]
+
+
+def test_console_sink():
+    stream = io.StringIO()
+    ConsoleSink(stream).write("Déjà vu.\n")
+    assert stream.getvalue() == "Déjà vu.\n"
+
+
+def test_file_sink(tmp_path):
+    sink = FileSink(tmp_path / "transcript.txt")
+    sink.write("Déjà vu.\n")
+    sink.write("Bonjour.\n")
+    assert (tmp_path / "transcript.txt").read_text("utf-8") == "Déjà vu.\nBonjour.\n"
+    sink.close()
+
+
+def test_socket_sink():
+    ours, theirs = socket.socketpair()
+    with ours, theirs:
+        SocketSink(ours).write("Déjà vu.\n")
+        assert theirs.recv(64).decode() == "Déjà vu.\n"